@@ -3,17 +3,31 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-from io import StringIO
 import warnings
 import os
 import pathlib
+import hashlib
+import threading
+import functools
+import json
+from collections import OrderedDict, deque
+from tempcore import (
+    station_name, station_label, COMPACT, _TEMP_COLS, _f64, _md_slot,
+    station_partition, parse_csv, CONFLICT_RULES, merge_frames, dedupe_dates, DataStore, IngestWatcher, SOURCE_VERSION,
+    build_dense, build_day_index, suneung_table, TS_CHART_PX, minmax_positions,
+    WINDOW_MAX_DAYS, WINDOW_MIN_COVER, window_compare, percentile_rank,
+    build_rollup, rollup_slice, rollup_mean, ExtremeRules, climate_extremes,
+    PCT_BASE, day_percentiles, pct_exceedance, NORMAL_BASES, ANALOG_MIN_COVER, build_normals, yearly_anomaly,
+    sen_mk, trend_tables, anomaly_trend, anomaly_matrix, analog_years, filter_summary, EXPORT_FORMATS, export_file,
+    span, cache_event, begin_trace, end_trace, run_span, metrics_snapshot,
+)
 warnings.filterwarnings("ignore")
 
 # ═══════════════════════════════════════════════════════
 #  페이지 설정
 # ═══════════════════════════════════════════════════════
 st.set_page_config(
-    page_title="서울 기온 분석",
+    page_title="ASOS 기온 분석",
     page_icon="🌡️",
     layout="wide",
     initial_sidebar_state="expanded",
@@ -72,102 +86,143 @@ html, body, [class*="css"] { font-family: 'Noto Sans KR', sans-serif; }
 """, unsafe_allow_html=True)
 
 # ═══════════════════════════════════════════════════════
-#  수능 날짜 데이터 (시행연도 기준 1993~2025)
+#  성능 계측 (사이드바에서 켤 때만)
 # ═══════════════════════════════════════════════════════
-SUNEUNG = {
-    "1994학년도 1차": ("1993-08-20", "첫 수능 1차 (여름)"),
-    "1994학년도 2차": ("1993-11-16", "첫 수능 2차"),
-    "1995학년도":    ("1994-11-23", ""),
-    "1996학년도":    ("1995-11-22", ""),
-    "1997학년도":    ("1996-11-13", "역대 최악 불수능"),
-    "1998학년도":    ("1997-11-19", "IMF 발표 당일"),
-    "1999학년도":    ("1998-11-18", "최초 만점자 배출"),
-    "2000학년도":    ("1999-11-17", ""),
-    "2001학년도":    ("2000-11-15", "최대 물수능, 만점자 66명"),
-    "2002학년도":    ("2001-11-07", "불수능"),
-    "2003학년도":    ("2002-11-06", ""),
-    "2004학년도":    ("2003-11-05", ""),
-    "2005학년도":    ("2004-11-17", ""),
-    "2006학년도":    ("2005-11-23", ""),
-    "2007학년도":    ("2006-11-16", ""),
-    "2008학년도":    ("2007-11-15", ""),
-    "2009학년도":    ("2008-11-13", ""),
-    "2010학년도":    ("2009-11-12", ""),
-    "2011학년도":    ("2010-11-18", "G20으로 1주 연기"),
-    "2012학년도":    ("2011-11-10", ""),
-    "2013학년도":    ("2012-11-08", "이상 고온"),
-    "2014학년도":    ("2013-11-07", ""),
-    "2015학년도":    ("2014-11-13", ""),
-    "2016학년도":    ("2015-11-12", ""),
-    "2017학년도":    ("2016-11-17", ""),
-    "2018학년도":    ("2017-11-23", "포항 지진으로 1주 연기"),
-    "2019학년도":    ("2018-11-15", ""),
-    "2020학년도":    ("2019-11-14", ""),
-    "2021학년도":    ("2020-12-03", "COVID-19로 12월 연기"),
-    "2022학년도":    ("2021-11-18", ""),
-    "2023학년도":    ("2022-11-17", ""),
-    "2024학년도":    ("2023-11-16", ""),
-    "2025학년도":    ("2024-11-14", "이상 고온"),
-    "2026학년도":    ("2025-11-13", "이상 고온"),
-}
+# 구간·캐시 기록은 tempcore 의 span / cache_event — 여기서는 st.cache 적중 집계, 세션별 최근 실행 보관,
+# 사이드바 패널만 담당한다. TEMP_PROFILE=1 이면 토글 기본값이 켜짐.
+PROFILE_DEFAULT = os.environ.get("TEMP_PROFILE", "").lower() not in ("", "0", "false", "no")
+PROFILE_KEEP = 20           # 세션마다 보관할 최근 실행 기록 수
+
+def profiled_cache(name, cache):
+    """st.cache_* 데코레이터 cache 를 감싸 적중·미스를 세고, 미스일 때 본문을 span 으로 잰다"""
+    def deco(fn):
+        ran = threading.local()
+
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            ran.miss = True
+            with span(f"load.{name}"):
+                return fn(*args, **kwargs)
+        cached = cache(body)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            ran.miss = False
+            out = cached(*args, **kwargs)
+            cache_event(name, not ran.miss)
+            return out
+        call.clear = cached.clear
+        return call
+    return deco
+
+def _keep_run(rec):
+    if rec is not None:
+        st.session_state.setdefault("profile_runs", deque(maxlen=PROFILE_KEEP)).append(rec)
+
+def render_profiler():
+    """사이드바 계측 패널 — 마지막 실행의 구간·캐시, 최근 실행 합계, 프로세스 누적 통계 내보내기"""
+    runs = list(st.session_state.get("profile_runs", ()))
+    with st.expander("🩺 성능 계측", expanded=True):
+        if not runs:
+            st.caption("아직 기록된 실행이 없습니다.")
+            return
+        last = runs[-1]
+        rss = f" · RSS {last['rss_mb']:,.0f}MB" if last["rss_mb"] is not None else ""
+        st.caption(f"마지막 실행 ({last['label']}) {last['total_s'] * 1000:,.0f}ms{rss}")
+        st.dataframe(pd.DataFrame({
+            "구간": ["\u00a0\u00a0" * s["depth"] + s["name"] for s in last["spans"]],
+            "ms": [round(s["seconds"] * 1000, 1) for s in last["spans"]],
+            "ΔRSS MB": [None if s["rss_delta_mb"] is None else round(s["rss_delta_mb"], 1) for s in last["spans"]],
+        }), hide_index=True, use_container_width=True)
+        proc = metrics_snapshot()
+        st.dataframe(pd.DataFrame([
+            {"캐시": k, "이번 적중": last["cache"].get(k, {}).get("hit", 0),
+             "이번 미스": last["cache"].get(k, {}).get("miss", 0), "누적 적중": v["hit"], "누적 미스": v["miss"]}
+            for k, v in sorted(proc["cache"].items())]), hide_index=True, use_container_width=True)
+        fc = figure_cache()
+        st.caption(f"차트 캐시 {len(fc)}개 · {fc.nbytes / 2**20:,.1f}/{fc.max_bytes / 2**20:,.0f}MB")
+        st.dataframe(pd.DataFrame({"실행": [r["label"] for r in runs[::-1]],
+                                   "ms": [round(r["total_s"] * 1000) for r in runs[::-1]]}),
+                     hide_index=True, use_container_width=True)
+        st.download_button("⬇️ 계측 기록 (JSON)", file_name="temp_profile.json", mime="application/json",
+            data=lambda: json.dumps({"runs": runs, "process": proc}, ensure_ascii=False, default=str))
+
+def profiled(label):
+    """탭 렌더 함수용 — 전체 실행 안에서는 구간 하나, fragment 만 다시 실행될 때는 그 자체로 기록 하나"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper():
+            with run_span(label, prof_on, sink=_keep_run, station=int(station)):
+                fn()
+        return wrapper
+    return deco
 
 # ═══════════════════════════════════════════════════════
 #  데이터 로드 함수
 # ═══════════════════════════════════════════════════════
+# 파싱·컬럼 캐시·계산은 tempcore (Streamlit 없이 배치 CLI tempbatch.py 와 공유) — 여기서는
+# 세션 간 캐시와 오류 표시만 붙인다.
 # app.py 가 있는 폴더 기준으로 절대 경로 설정 → Streamlit Cloud에서도 안정적으로 동작
 _HERE = pathlib.Path(__file__).parent.resolve()
 BUILTIN_FILE = _HERE / "20260122_temp.csv"
+# 수집 폴더 — 여기에 떨어진 기상청 추출 CSV 를 백그라운드에서 검증·병합해 새 데이터 버전으로 게시한다.
+# 폴더가 있을 때만 감시 (TEMP_INGEST_DIR 로 위치 변경)
+INGEST_DIR = pathlib.Path(os.environ.get("TEMP_INGEST_DIR", _HERE / "ingest"))
 
-@st.cache_data(show_spinner="📂 기본 데이터 로딩 중…")
-def load_builtin():
-    if not BUILTIN_FILE.exists():
-        st.error(
-            f"⚠️ 기본 데이터 파일을 찾을 수 없습니다.\n\n"
-            f"**찾는 경로:** `{BUILTIN_FILE}`\n\n"
-            f"`20260122_temp.csv` 파일을 `app.py` 와 **같은 폴더**에 넣어 주세요."
-        )
+def _builtin_missing():
+    st.error(
+        f"⚠️ 기본 데이터 파일을 찾을 수 없습니다.\n\n"
+        f"**찾는 경로:** `{BUILTIN_FILE}`\n\n"
+        f"`20260122_temp.csv` 파일을 `app.py` 와 **같은 폴더**에 넣어 주세요."
+    )
+
+@st.cache_resource
+def data_store():
+    """프로세스당 데이터 저장소 하나와 (수집 폴더가 있으면) 감시 스레드"""
+    store, watcher = DataStore(BUILTIN_FILE, COMPACT), None
+    if INGEST_DIR.is_dir():
+        watcher = IngestWatcher(store, INGEST_DIR)
+        watcher.start()
+    return store, watcher
+
+# 아래 두 로더는 데이터 버전을 키로 받는다 — 새 버전이 게시되면 다음 실행부터 새 키로 읽고,
+# 이미 실행 중인 세션은 받은 버전을 끝까지 읽는다 (옛 버전 캐시 파일은 저장소가 몇 개 남겨 둔다)
+@profiled_cache("builtin_stations", st.cache_data(show_spinner="📂 기본 데이터 파싱 중…"))
+def builtin_stations(version):
+    if version == SOURCE_VERSION and not BUILTIN_FILE.exists():
+        return []
+    stations, err = data_store()[0].stations(version)
+    if err:
+        st.error(f"기본 데이터 파일을 읽지 못했습니다 — {err}")
+    return stations
+
+# cache_resource — 프로세스당 지점별 프레임 하나를 모든 세션이 그대로 공유 (cache_data 처럼
+# 매 호출마다 pickle 사본을 만들지 않음). 프레임은 읽기 전용으로 다룬다.
+@profiled_cache("load_builtin", st.cache_resource(max_entries=16, show_spinner="📂 기본 데이터 로딩 중…"))
+def load_builtin(station, version):
+    if version == SOURCE_VERSION and not BUILTIN_FILE.exists():
+        _builtin_missing()
         return None
-    # EUC-KR → UTF-8 순으로 인코딩 시도
-    for enc in ["euc-kr", "cp949", "utf-8", "utf-8-sig"]:
-        try:
-            df = pd.read_csv(
-                BUILTIN_FILE, encoding=enc, header=0,
-                names=["날짜","지점","평균기온","최저기온","최고기온"],
-                skipinitialspace=True,
-            )
-            return _clean(df)
-        except (UnicodeDecodeError, Exception):
-            continue
-    st.error("기본 데이터 파일의 인코딩을 인식할 수 없습니다.")
-    return None
+    df, err = data_store()[0].load(station, version)
+    if err:
+        st.error(f"기본 데이터 파일을 읽지 못했습니다 — {err}")
+    return df
 
 def load_uploaded(file):
-    raw = file.read()
-    text = None
-    for enc in ["euc-kr","utf-8","cp949"]:
-        try:
-            text = raw.decode(enc); break
-        except Exception:
-            pass
-    if text is None:
-        st.error("파일 인코딩을 인식할 수 없습니다."); return None
-    df = pd.read_csv(
-        StringIO(text), header=0,
-        names=["날짜","지점","평균기온","최저기온","최고기온"],
-        skipinitialspace=True,
-    )
-    return _clean(df)
-
-def _clean(df):
-    df["날짜"] = pd.to_datetime(df["날짜"], errors="coerce")
-    df = df.dropna(subset=["날짜"])
-    for c in ["평균기온","최저기온","최고기온"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-    df = df.dropna(subset=["평균기온","최저기온","최고기온"])
-    df["연도"] = df["날짜"].dt.year
-    df["월"]   = df["날짜"].dt.month
-    df["일"]   = df["날짜"].dt.day
-    return df.sort_values("날짜").reset_index(drop=True)
+    # 같은 내용의 파일은 다시 파싱하지 않도록 내용 해시로 캐시
+    df, err = _parse_upload(hashlib.sha256(file.getvalue()).hexdigest(), file)
+    if err:
+        st.error(err); return None
+    return df
+
+@profiled_cache("parse_upload", st.cache_resource(max_entries=16, show_spinner="📂 업로드 파일 읽는 중…"))
+def _parse_upload(digest, _file):
+    return parse_csv(_file, digest[:16], COMPACT)
+
+@profiled_cache("merge_upload", st.cache_resource(max_entries=8, show_spinner=False))
+def merge_upload(base_version, _base, up_version, _up, rule):
+    """정렬된 기존 데이터에 업로드 행을 끼워 넣는다 (tempcore.merge_frames) — 버전 조합별로 세션 간 공유"""
+    return merge_frames(_base, _up, rule, COMPACT)
 
 _DARK = dict(
     plot_bgcolor="#0f1923", paper_bgcolor="#0f1923",
@@ -178,90 +233,254 @@ _DARK = dict(
     margin=dict(t=40, b=20),
 )
 
+# ═══════════════════════════════════════════════════════
+#  차트 캐시
+# ═══════════════════════════════════════════════════════
+# 완성된 Figure 를 (차트, 데이터 버전, 필터, 옵션) 키로 프로세스 전체에서 공유 —
+# 같은 차트를 다시 볼 때는 pandas 집계와 Plotly 검증을 모두 건너뛴다.
+# 데이터 크기 추정치 합이 TEMP_FIG_CACHE_MB 를 넘으면 가장 오래 안 쓴 것부터 버린다.
+FIG_CACHE_BYTES = int(float(os.environ.get("TEMP_FIG_CACHE_MB", 64)) * 2**20)
+# 점이 이만큼 넘는 scatter 트레이스는 WebGL(Scattergl)로 그린다
+WEBGL_POINTS = int(os.environ.get("TEMP_WEBGL_POINTS", 5000))
+
+class FigureCache:
+    def __init__(self, max_bytes):
+        self.max_bytes, self.nbytes = max_bytes, 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._items[key] = (value, nbytes)
+            self.nbytes += nbytes
+            # 방금 넣은 하나는 한도를 넘어도 남긴다
+            while self.nbytes > self.max_bytes and len(self._items) > 1:
+                _, (_, n) = self._items.popitem(last=False)
+                self.nbytes -= n
+
+@st.cache_resource
+def figure_cache():
+    return FigureCache(FIG_CACHE_BYTES)
+
+_FIG_ARRAYS = ("x", "y", "z", "base", "text", "customdata")
+
+def _n_points(tr):
+    for k in ("x", "y"):
+        v = getattr(tr, k, None)
+        if v is not None:
+            return len(v)
+    return 0
+
+def _fig_nbytes(fig):
+    n = 0
+    for tr in fig.data:
+        for k in _FIG_ARRAYS:
+            v = getattr(tr, k, None)
+            if v is not None and not isinstance(v, str):
+                n += np.asarray(v).nbytes
+    return n
+
+def use_webgl(fig, threshold=None):
+    """점이 threshold 개를 넘는 scatter 트레이스를 Scattergl 로 바꾼 Figure (없으면 그대로)."""
+    threshold = WEBGL_POINTS if threshold is None else threshold
+    if not any(tr.type == "scatter" and _n_points(tr) > threshold for tr in fig.data):
+        return fig
+    data = []
+    for tr in fig.data:
+        if tr.type == "scatter" and _n_points(tr) > threshold:
+            spec = tr.to_plotly_json()
+            spec.pop("type")
+            tr = go.Scattergl(spec, skip_invalid=True)
+        data.append(tr)
+    return go.Figure(data=data, layout=fig.layout)
+
+def cached_chart(key, build):
+    """key 가 같으면 저장된 결과를, 아니면 build() 결과를 저장해 돌려준다.
+    build() 는 Figure 또는 (Figure, 부가정보) 를 돌려준다. 돌려받은 Figure 는 공유 객체이므로 수정하지 않는다."""
+    cache = figure_cache()
+    hit = cache.get(key)
+    cache_event("figure", hit is not None)
+    if hit is None:
+        with span(f"chart.{key[0]}"):
+            hit = build()
+        if isinstance(hit, tuple):
+            hit = (use_webgl(hit[0]),) + hit[1:]
+        else:
+            hit = use_webgl(hit)
+        cache.put(key, hit, _fig_nbytes(hit[0] if isinstance(hit, tuple) else hit))
+    return hit
+
 # ═══════════════════════════════════════════════════════
 #  사이드바
 # ═══════════════════════════════════════════════════════
 with st.sidebar:
     st.markdown('<div class="main-title">🌡️ SEOUL<br>TEMP</div>', unsafe_allow_html=True)
-    st.markdown('<div class="sub-title">기상청 ASOS · 지점 108</div>', unsafe_allow_html=True)
+    st.markdown('<div class="sub-title">기상청 ASOS · 일별 기온</div>', unsafe_allow_html=True)
     st.markdown("---")
     uploaded = st.file_uploader("📤 추가 CSV 업로드", type=["csv"],
         help="날짜,지점,평균기온(℃),최저기온(℃),최고기온(℃) 형식")
+    if uploaded is not None:
+        conflict_rule = st.radio("겹치는 날짜 처리", list(CONFLICT_RULES), horizontal=True,
+            help="기본 데이터와 업로드 파일에 같은 (지점, 날짜)가 있을 때 어느 쪽 값을 쓸지")
     st.markdown("---")
+    stn_placeholder = st.empty()
     st.markdown("**📅 기간 필터**")
     yr_placeholder = st.empty()
     month_sel = st.multiselect("월 선택 (전체=미선택)", list(range(1,13)),
         format_func=lambda m: f"{m}월")
+    pct_box = st.expander("📐 평년·백분위 기준")
+    prof_on = st.toggle("🩺 성능 계측", value=PROFILE_DEFAULT,
+        help="구간별 시간·메모리와 캐시 적중을 이 세션에서 기록해 사이드바 아래에 보여 준다")
+
+# 이번 실행의 계측 시작 — 꺼져 있으면 기록하지 않는다 (span 은 빈 컨텍스트)
+_trace = begin_trace("rerun", prof_on)
 
 # ═══════════════════════════════════════════════════════
 #  데이터 병합
 # ═══════════════════════════════════════════════════════
-base_df = load_builtin()
-if base_df is None:
+# 지점 목록은 캐시 헤더만 읽어 구하고, 실제 데이터는 선택한 지점 파티션만 로드
+store, watcher = data_store()
+data_ver = store.version()      # 이번 실행 내내 이 버전을 읽는다
+up_df = load_uploaded(uploaded) if uploaded is not None else None
+base_stations = builtin_stations(data_ver)
+up_stations = [] if up_df is None else [int(x) for x in up_df["지점"].unique()]
+stations = sorted(set(base_stations) | set(up_stations))
+if not stations:
+    if not BUILTIN_FILE.exists():
+        _builtin_missing()
     st.stop()
+with stn_placeholder:
+    station = st.selectbox("📍 관측 지점", stations,
+        index=stations.index(108) if 108 in stations else 0, format_func=station_label)
 
-if uploaded is not None:
-    up_df = load_uploaded(uploaded)
-    if up_df is not None:
-        df = (pd.concat([base_df, up_df])
-              .drop_duplicates("날짜").sort_values("날짜").reset_index(drop=True))
-        df["연도"] = df["날짜"].dt.year
-        df["월"]   = df["날짜"].dt.month
-        df["일"]   = df["날짜"].dt.day
-        st.sidebar.success(f"✅ {len(up_df):,}행 추가됨")
-    else:
-        df = base_df
+if _trace is not None:
+    _trace.meta["station"] = int(station)
+
+base_df = load_builtin(station, data_ver) if station in base_stations else None
+up_part = station_partition(up_df.attrs["version"], up_df, station) if station in up_stations else None
+if base_df is None and up_part is None:
+    st.stop()
+
+if up_part is not None and base_df is not None:
+    df, mstat = merge_upload(base_df.attrs["version"], base_df,
+                             up_part.attrs["version"], up_part, CONFLICT_RULES[conflict_rule])
+    st.sidebar.success(f"✅ {mstat['added']:,}행 추가됨")
+    if mstat["overlap"]:
+        st.sidebar.caption(f"겹치는 날짜 {mstat['overlap']:,}일 중 값이 다른 날 "
+                           f"{mstat['conflicts']:,}일 → {conflict_rule}")
+elif up_part is not None:
+    df, n_dup, n_dup_diff = dedupe_dates(up_part, CONFLICT_RULES[conflict_rule])
+    mstat = {"upload_dups": n_dup, "upload_dup_conflicts": n_dup_diff}
+    st.sidebar.success(f"✅ 업로드 데이터만 사용 ({len(df):,}행)")
 else:
     df = base_df
+if up_part is not None and mstat["upload_dups"]:
+    st.sidebar.caption(f"⚠️ 업로드 파일 안 중복 날짜 {mstat['upload_dups']:,}행 (그중 값이 다른 행 "
+                       f"{mstat['upload_dup_conflicts']:,}행) → {conflict_rule}")
+if up_df is not None:
+    st.sidebar.caption(f"인코딩: {up_df.attrs['encoding']} — {up_df.attrs['encoding_reason']}")
+cur = store.current()
+if cur and cur["version"] == data_ver:
+    st.sidebar.caption(f"🗂️ 데이터 버전 {data_ver} · {cur['created'].replace('T', ' ')} 수집 ({', '.join(cur['files'])})")
+if watcher is not None and watcher.last and (watcher.last.get("rejected") or watcher.last.get("error")):
+    st.sidebar.caption("⚠️ 수집 거부: " + (watcher.last.get("error") or
+        ", ".join(f"{k} ({v})" for k, v in watcher.last["rejected"].items())))
 
-min_yr, max_yr = int(df["연도"].min()), int(df["연도"].max())
+def station_frames():
+    """모든 지점의 프레임(업로드 병합 반영)을 지점 순으로 하나씩 — 전체 내보내기용"""
+    for stn in stations:
+        b = load_builtin(stn, data_ver) if stn in base_stations else None
+        u = station_partition(up_df.attrs["version"], up_df, stn) if stn in up_stations else None
+        if b is not None and u is not None:
+            yield merge_upload(b.attrs["version"], b, u.attrs["version"], u, CONFLICT_RULES[conflict_rule])[0]
+        elif u is not None:
+            yield dedupe_dates(u, CONFLICT_RULES[conflict_rule])[0]
+        else:
+            yield b
+
+dense = build_dense(df.attrs["version"], df)
+min_yr, max_yr = dense.first_date.year, dense.last_date.year
+# 한 해치 자료뿐이면 최솟값 = 최댓값이라 슬라이더를 만들 수 없다 → 그 해로 고정
 with yr_placeholder:
-    yr_range = st.slider("연도 범위", min_yr, max_yr, (max(min_yr, max_yr-30), max_yr))
+    yr_range = (st.slider("연도 범위", min_yr, max_yr, (max(min_yr, max_yr-30), max_yr))
+                if min_yr < max_yr else (min_yr, max_yr))
+with pct_box:
+    bases = [b for b in NORMAL_BASES if b[0] <= max_yr and b[1] >= min_yr] or [(min_yr, max_yr)]
+    normal_base = st.selectbox("평년 기간", bases, index=len(bases) - 1, format_func=lambda b: f"{b[0]}~{b[1]}",
+        help="일별 평년값(연주기 조화 평활)을 구할 30년 — 날짜 비교·기후변화·수능 탭이 같은 평년값을 쓴다")
+    b0, b1 = max(min_yr, PCT_BASE[0]), min(max_yr, PCT_BASE[1])
+    pct_base = (st.slider("기준 기간", min_yr, max_yr, (b0, b1) if b0 <= b1 else (min_yr, max_yr),
+        help="날짜별 백분위수를 구할 표본 기간 (ETCCDI 기본 1981~2010)") if min_yr < max_yr else (min_yr, max_yr))
+    pct_win = st.select_slider("창 (일)", [1,3,5,7,9,11,15], value=5,
+        help="같은 날짜 앞뒤로 함께 표본에 넣을 날 수")
+    pct_p = st.select_slider("백분위", [75,80,90,95,99], value=90,
+        help="고온 판정은 이 백분위 초과, 저온 판정은 (100 - 이 값) 백분위 미만")
+# (기준 기간, 창, 백분위) — 백분위 기준값 캐시 키
+pspec = (tuple(pct_base), pct_win, pct_p)
 
-fdf = df[(df["연도"]>=yr_range[0]) & (df["연도"]<=yr_range[1])]
-if month_sel:
-    fdf = fdf[fdf["월"].isin(month_sel)]
+# (데이터 버전, 연도 범위, 월) — 필터에 의존하는 캐시 키의 공통 부분
+fkey = (df.attrs["version"], tuple(yr_range), tuple(sorted(month_sel)))
+fdf, kpi = filter_summary(df.attrs["version"], df, fkey[1], fkey[2])
+cube = build_rollup(df.attrs["version"], df)
+fcube = rollup_slice(cube, yr_range, month_sel)
 
 # ═══════════════════════════════════════════════════════
 #  헤더 + KPI
 # ═══════════════════════════════════════════════════════
-st.markdown('<div class="main-title">서울 기온 분석 대시보드</div>', unsafe_allow_html=True)
+st.markdown(f'<div class="main-title">{station_name(station)} 기온 분석 대시보드</div>',
+            unsafe_allow_html=True)
 st.markdown(
-    f'<div class="sub-title">기상청 ASOS · 지점 108 · '
-    f'{df["날짜"].min().strftime("%Y.%m.%d")} ~ {df["날짜"].max().strftime("%Y.%m.%d")}</div>',
+    f'<div class="sub-title">기상청 ASOS · {station_label(station)} · '
+    f'{dense.first_date.strftime("%Y.%m.%d")} ~ {dense.last_date.strftime("%Y.%m.%d")}</div>',
     unsafe_allow_html=True
 )
 st.markdown("<hr class='section-divider'>", unsafe_allow_html=True)
 
-idx_hi = fdf["최고기온"].idxmax()
-idx_lo = fdf["최저기온"].idxmin()
-idx_rng= (fdf["최고기온"]-fdf["최저기온"]).idxmax()
+# 필터 결과가 비면 값은 NaN, 날짜는 None
+_kpi_temp = lambda v: f"{v:.1f}℃" if v == v else "—"
+_kpi_date = lambda d: d.strftime('%Y-%m-%d') if d is not None else "—"
+if not kpi["n"]:
+    st.info("선택한 기간·월에 해당하는 자료가 없습니다.")
 
 st.markdown(f"""
 <div class="kpi-grid">
   <div class="kpi-card">
     <div class="kpi-label">📊 평균기온</div>
-    <div class="kpi-value">{fdf['평균기온'].mean():.1f}℃</div>
+    <div class="kpi-value">{_kpi_temp(kpi['avg'])}</div>
     <div class="kpi-sub">{yr_range[0]}~{yr_range[1]}년</div>
   </div>
   <div class="kpi-card">
     <div class="kpi-label">🔴 역대 최고</div>
-    <div class="kpi-value">{fdf['최고기온'].max():.1f}℃</div>
-    <div class="kpi-sub">{fdf.loc[idx_hi,'날짜'].strftime('%Y-%m-%d')}</div>
+    <div class="kpi-value">{_kpi_temp(kpi['hi'])}</div>
+    <div class="kpi-sub">{_kpi_date(kpi['hi_date'])}</div>
   </div>
   <div class="kpi-card">
     <div class="kpi-label">🔵 역대 최저</div>
-    <div class="kpi-value">{fdf['최저기온'].min():.1f}℃</div>
-    <div class="kpi-sub">{fdf.loc[idx_lo,'날짜'].strftime('%Y-%m-%d')}</div>
+    <div class="kpi-value">{_kpi_temp(kpi['lo'])}</div>
+    <div class="kpi-sub">{_kpi_date(kpi['lo_date'])}</div>
   </div>
   <div class="kpi-card">
     <div class="kpi-label">↕️ 최대 일교차</div>
-    <div class="kpi-value">{(fdf['최고기온']-fdf['최저기온']).max():.1f}℃</div>
-    <div class="kpi-sub">{fdf.loc[idx_rng,'날짜'].strftime('%Y-%m-%d')}</div>
+    <div class="kpi-value">{_kpi_temp(kpi['rng'])}</div>
+    <div class="kpi-sub">{_kpi_date(kpi['rng_date'])}</div>
   </div>
   <div class="kpi-card">
     <div class="kpi-label">📅 데이터</div>
-    <div class="kpi-value">{len(fdf):,}</div>
+    <div class="kpi-value">{kpi['n']:,}</div>
     <div class="kpi-sub">일 (필터 후)</div>
   </div>
 </div>
@@ -270,58 +489,105 @@ st.markdown(f"""
 # ═══════════════════════════════════════════════════════
 #  탭
 # ═══════════════════════════════════════════════════════
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "📅 날짜 비교", "📈 시계열", "📊 월별·연별", "🔥 기후변화", "🎓 수능날 기온", "📋 원본"
-])
+# 각 탭은 fragment — 탭 안의 위젯을 바꾸면 그 탭만 다시 실행된다.
+# 탭 전환은 on_change="rerun" 으로 추적해 열린 탭 하나만 계산·렌더링 (맨 아래 참고).
+# 닫힌 탭의 위젯은 그리지 않으므로 Streamlit 이 그 값을 지운다 → 탭 위젯은 모두 key 를 주고
+# 기본값은 _tab_state 로 세션에 넣어 두며 (value= 는 넘기지 않는다), 탭을 그리기 전에 TAB_STATE_KEYS 를
+# 다시 써서 다른 탭이 열려 있는 동안에도 값이 남게 한다.
+TAB_STATE_KEYS = [
+    "compare_date", "compare_ref", "compare_yrs", "compare_pct", "win_mode", "win_range",
+    "ts_resample", "ts_window", "ts_thin",
+    "trend_col", "trend_sig", "analog_date", "analog_cols", "analog_k",
+    "rule_heat", "rule_cold", "rule_tropical", "rule_gdd_base", "rule_frost", "rule_ice", "climate_mode", "climate_ind",
+    "suneung_ref", "raw_year", "raw_scope", "raw_fmt",
+]
 
+def _tab_state(key, default, lo=None, hi=None, options=None):
+    """탭 위젯 값 준비 — 처음이면 default, 남아 있던 값이 지금 선택지 밖이면 default, 범위 밖이면 [lo, hi] 로.
+    (지점·필터가 바뀌면 날짜 범위와 선택지가 달라진다)"""
+    v = st.session_state.get(key)
+    if v is None or (options is not None and not all(x in options for x in (v if isinstance(v, list) else [v]))):
+        st.session_state[key] = default
+    elif lo is not None:
+        clamp = lambda x: min(max(x, lo), hi)
+        st.session_state[key] = tuple(clamp(x) for x in v) if isinstance(v, tuple) else clamp(v)
 # ──────────────────────────────────────────────
 # TAB 1 — 날짜 비교
 # ──────────────────────────────────────────────
-with tab1:
+@st.fragment
+@profiled("tab.compare")
+def render_compare():
     st.subheader("📅 특정 날짜 기온 — 과거 같은 날과 비교")
 
     col_d, col_y = st.columns([1,2])
     with col_d:
-        latest = df["날짜"].max().date()
+        latest = dense.last_date.date()
+        _tab_state("compare_date", latest, dense.first_date.date(), latest)
         sel_date = st.date_input("분석할 날짜",
-            value=latest,
-            min_value=df["날짜"].min().date(),
-            max_value=df["날짜"].max().date(),
+            min_value=dense.first_date.date(),
+            max_value=latest, key="compare_date",
             help="기본값: 데이터상 가장 최근 날짜")
     with col_y:
-        compare_yrs = st.slider("비교 기준 기간 (최근 N년)", 10, 130, 30,
+        _tab_state("compare_ref", "recent", options=["recent", "normals"])
+        use_normals = st.radio("평년 기준", ["recent", "normals"], horizontal=True, key="compare_ref",
+            format_func=lambda o: "최근 N년 같은 날" if o == "recent" else f"평년값 ({normal_base[0]}~{normal_base[1]})",
+            help="평년값: 사이드바 '평년 기간'의 일별 평년값(연주기 조화 평활) — 다른 탭과 같은 기준") == "normals"
+        _tab_state("compare_yrs", 30)
+        compare_yrs = st.slider("비교 기준 기간 (최근 N년)", 10, 130, disabled=use_normals, key="compare_yrs",
             help="선택 날짜와 같은 월·일 데이터 중 최근 몇 년치 평균을 '평년'으로 삼을지")
+    _tab_state("compare_pct", False)
+    use_pct = st.toggle(f"백분위로 판정 (상위 {pct_p} · 하위 {100-pct_p} 백분위)", key="compare_pct",
+        help="±2℃ 대신, 사이드바 '평년·백분위 기준'의 기간·창으로 구한 같은 날짜 평균기온 분포로 따뜻함·추움을 판정")
 
-    t_row = df[df["날짜"]==pd.Timestamp(sel_date)]
+    t_row = dense.get(sel_date)
 
-    if t_row.empty:
+    if t_row is None:
         st.warning(f"⚠️ {sel_date} 날짜의 데이터가 없습니다.")
     else:
-        r = t_row.iloc[0]
-        t_avg, t_hi, t_lo = r["평균기온"], r["최고기온"], r["최저기온"]
-
-        cutoff_yr = sel_date.year - compare_yrs
-        same_md = df[
-            (df["월"]==sel_date.month) & (df["일"]==sel_date.day) &
-            (df["날짜"] < pd.Timestamp(sel_date)) & (df["연도"] >= cutoff_yr)
-        ]
-        all_same = df[
-            (df["월"]==sel_date.month) & (df["일"]==sel_date.day)
-        ].sort_values("연도")
-
-        if same_md.empty:
+        t_avg, t_hi, t_lo = t_row["평균기온"], t_row["최고기온"], t_row["최저기온"]
+
+        # 평년 표본 연도 [ref_from, ref_to) 와 분포 상자그림에 쓸 연도 [box_from, box_to)
+        if use_normals:
+            ref_from, ref_to = normal_base[0], normal_base[1] + 1
+            box_from, box_to = ref_from, ref_to
+        else:
+            ref_from, ref_to = sel_date.year - compare_yrs, sel_date.year
+            box_from, box_to = ref_from, 9999
+        didx = build_day_index(df.attrs["version"], df)
+        i0, i1 = didx.span(sel_date.month, sel_date.day, ref_from, ref_to)
+        a0, a1 = didx.span(sel_date.month, sel_date.day)
+        all_yrs, all_avg = didx.year[a0:a1], didx.vals["평균기온"][a0:a1]
+
+        if i1 == i0:
             st.info("선택한 기간 내 같은 날짜의 과거 데이터가 없습니다.")
         else:
-            ref_avg = same_md["평균기온"].mean()
-            ref_hi  = same_md["최고기온"].mean()
-            ref_lo  = same_md["최저기온"].mean()
-            n_ref   = len(same_md)
+            n_ref = i1 - i0
+            slot = int(_md_slot(sel_date.month, sel_date.day))
+            if use_normals:
+                nm = build_normals(df.attrs["version"], df, normal_base)
+                ref_avg, ref_hi, ref_lo = (nm.at(c, slot) for c in ["평균기온","최고기온","최저기온"])
+                ref_label = f"평년값({ref_from}~{ref_to-1})"
+                basis = f"{ref_from}~{ref_to-1}년 일별 평년값 (조화 평활, 같은 날 {n_ref}개년)"
+            else:
+                ref_avg = didx.mean("평균기온", i0, i1)
+                ref_hi  = didx.mean("최고기온", i0, i1)
+                ref_lo  = didx.mean("최저기온", i0, i1)
+                ref_label = f"평년({ref_from}~{ref_to-1})"
+                basis = f"{ref_from}~{ref_to-1}년 같은 날({n_ref}개년) 평균"
             diff_avg = t_avg - ref_avg
 
-            if diff_avg >= 2:
+            if use_pct:
+                hot_thr  = day_percentiles(df.attrs["version"], df, "평균기온", pct_p, pspec[0], pct_win)[slot]
+                cold_thr = day_percentiles(df.attrs["version"], df, "평균기온", 100-pct_p, pspec[0], pct_win)[slot]
+                basis += (f" · 판정: {pspec[0][0]}~{pspec[0][1]}년 같은 날 ±{pct_win//2}일 평균기온의 "
+                          f"하위 {100-pct_p} · 상위 {pct_p} 백분위 {cold_thr:.1f}℃ / {hot_thr:.1f}℃")
+            else:
+                hot_thr, cold_thr = ref_avg + 2, ref_avg - 2
+
+            if t_avg >= hot_thr:
                 cls = "compare-hot"; emoji = "🔴"
                 verdict = f"평년보다 {abs(diff_avg):.1f}℃ 더 따뜻한 날"
-            elif diff_avg <= -2:
+            elif t_avg <= cold_thr:
                 cls = "compare-cold"; emoji = "🔵"
                 verdict = f"평년보다 {abs(diff_avg):.1f}℃ 더 추운 날"
             else:
@@ -334,7 +600,7 @@ with tab1:
                 {emoji} {sel_date.strftime('%Y년 %m월 %d일')} — {verdict}
               </div>
               <div style="color:#8a9bb0;font-size:0.76rem;">
-                비교 기준: {cutoff_yr}~{sel_date.year-1}년 같은 날({n_ref}개년) 평균
+                비교 기준: {basis}
               </div>
             </div>
             """, unsafe_allow_html=True)
@@ -353,194 +619,454 @@ with tab1:
 
             # 같은 월·일 전체 연도 추이
             st.markdown(f"#### 📈 {sel_date.month}월 {sel_date.day}일 — 연도별 평균기온")
-            bar_colors = [
-                "#e74c3c" if v >= ref_avg+2 else ("#3498db" if v <= ref_avg-2 else "#7fb3d3")
-                for v in all_same["평균기온"]
-            ]
-            fig1 = go.Figure()
-            fig1.add_trace(go.Bar(
-                x=all_same["연도"], y=all_same["평균기온"],
-                marker_color=bar_colors, name="평균기온",
-                text=[f"{v:.1f}" for v in all_same["평균기온"]],
-                textposition="outside", textfont=dict(size=8, color="#8a9bb0"),
-                hovertemplate="<b>%{x}년</b><br>평균기온: %{y:.1f}℃<extra></extra>",
-            ))
-            fig1.add_hline(y=ref_avg, line_dash="dot", line_color="#f39c12",
-                annotation_text=f"평년({cutoff_yr}~{sel_date.year-1}) {ref_avg:.1f}℃",
-                annotation_font_color="#f39c12")
-            if sel_date.year in all_same["연도"].values:
-                fig1.add_vline(x=sel_date.year, line_width=2.5, line_color="#e8d5b7",
-                    annotation_text=f"{sel_date.year}년", annotation_font_color="#e8d5b7")
-            fig1.update_layout(height=360, hovermode="x unified", **_DARK)
-            fig1.update_layout(xaxis=dict(showgrid=False), yaxis_title="평균기온 (℃)")
-            st.plotly_chart(fig1, use_container_width=True)
+            ckey = (df.attrs["version"], sel_date, normal_base if use_normals else compare_yrs,
+                    pspec if use_pct else None)
 
-            # 월 분포 박스플롯
-            st.markdown(f"#### 📦 {sel_date.month}월 기온 분포 (최근 {compare_yrs}년)")
-            recent_month = df[
-                (df["월"]==sel_date.month) & (df["연도"]>=cutoff_yr)
-            ]
-            fig2 = go.Figure()
-            for cn, color, name in [
-                ("최고기온","#e74c3c","최고기온"),
-                ("평균기온","#f39c12","평균기온"),
-                ("최저기온","#3498db","최저기온"),
-            ]:
-                fig2.add_trace(go.Box(y=recent_month[cn], name=name,
-                    marker_color=color, boxmean=True, line=dict(width=1.5)))
-            for cn, val in [("최고기온",t_hi),("평균기온",t_avg),("최저기온",t_lo)]:
-                fig2.add_trace(go.Scatter(
-                    x=[cn], y=[val], mode="markers",
-                    marker=dict(color="#e8d5b7",size=13,symbol="star"),
-                    showlegend=False, name=f"선택날 {cn}",
+            def build_fig1():
+                bar_colors = np.where(all_avg >= hot_thr, "#e74c3c",
+                                      np.where(all_avg <= cold_thr, "#3498db", "#7fb3d3"))
+                fig1 = go.Figure()
+                fig1.add_trace(go.Bar(
+                    x=all_yrs, y=all_avg,
+                    marker_color=bar_colors, name="평균기온",
+                    text=[f"{v:.1f}" for v in all_avg],
+                    textposition="outside", textfont=dict(size=8, color="#8a9bb0"),
+                    hovertemplate="<b>%{x}년</b><br>평균기온: %{y:.1f}℃<extra></extra>",
                 ))
-            fig2.update_layout(height=340, boxmode="group", **_DARK)
-            fig2.update_layout(xaxis=dict(showgrid=False), yaxis_title="기온 (℃)")
-            st.plotly_chart(fig2, use_container_width=True)
+                fig1.add_hline(y=ref_avg, line_dash="dot", line_color="#f39c12",
+                    annotation_text=f"{ref_label} {ref_avg:.1f}℃",
+                    annotation_font_color="#f39c12")
+                if sel_date.year in all_yrs:
+                    fig1.add_vline(x=sel_date.year, line_width=2.5, line_color="#e8d5b7",
+                        annotation_text=f"{sel_date.year}년", annotation_font_color="#e8d5b7")
+                fig1.update_layout(height=360, hovermode="x unified", **_DARK)
+                fig1.update_layout(xaxis=dict(showgrid=False), yaxis_title="평균기온 (℃)")
+                return fig1
+            st.plotly_chart(cached_chart(("fig1",) + ckey, build_fig1), use_container_width=True)
+
+            # 월 분포 박스플롯
+            box_label = f"{box_from}~{box_to-1}년" if use_normals else f"최근 {compare_yrs}년"
+            st.markdown(f"#### 📦 {sel_date.month}월 기온 분포 ({box_label})")
+
+            def build_fig2():
+                # 해당 월은 인덱스에서 연속 구간 → 그 안에서 연도만 거른다
+                m0, m1 = didx.month_span(sel_date.month)
+                in_win = (didx.year[m0:m1] >= box_from) & (didx.year[m0:m1] < box_to)
+                recent_month = {c: didx.vals[c][m0:m1][in_win] for c in _TEMP_COLS}
+                fig2 = go.Figure()
+                for cn, color, name in [
+                    ("최고기온","#e74c3c","최고기온"),
+                    ("평균기온","#f39c12","평균기온"),
+                    ("최저기온","#3498db","최저기온"),
+                ]:
+                    fig2.add_trace(go.Box(y=recent_month[cn], name=name,
+                        marker_color=color, boxmean=True, line=dict(width=1.5)))
+                for cn, val in [("최고기온",t_hi),("평균기온",t_avg),("최저기온",t_lo)]:
+                    fig2.add_trace(go.Scatter(
+                        x=[cn], y=[val], mode="markers",
+                        marker=dict(color="#e8d5b7",size=13,symbol="star"),
+                        showlegend=False, name=f"선택날 {cn}",
+                    ))
+                fig2.update_layout(height=340, boxmode="group", **_DARK)
+                fig2.update_layout(xaxis=dict(showgrid=False), yaxis_title="기온 (℃)")
+                return fig2
+            st.plotly_chart(cached_chart(("fig2",) + ckey, build_fig2), use_container_width=True)
             st.caption("⭐ 별 마커 = 선택 날짜 실제 기온  |  🔴따뜻  🔵추움  🟤평년근처")
 
+    # 여러 날 구간 — 하루보다 덜 들쭉날쭉한 비교 (구간 평균·극값을 과거 같은 구간과)
+    st.markdown("<hr class='section-divider'>", unsafe_allow_html=True)
+    st.markdown("#### 🗓️ 여러 날 구간 — 과거 같은 구간과 비교")
+    cw, cr = st.columns([1,2])
+    with cw:
+        w_opts = ["선택 날짜까지 7일", "선택 날짜까지 30일", "직접 지정"]
+        _tab_state("win_mode", w_opts[0], options=w_opts)
+        w_mode = st.radio("구간", w_opts, horizontal=True, key="win_mode")
+    if w_mode == "직접 지정":
+        with cr:
+            # 기본 2주 — 첫 관측일 근처에서도 min_value 아래로 내려가지 않게 자른다
+            d_lo, d_hi = dense.first_date.date(), dense.last_date.date()
+            _tab_state("win_range", (max(d_lo, (pd.Timestamp(sel_date) - pd.Timedelta(days=13)).date()),
+                                     min(d_hi, sel_date)), d_lo, d_hi)
+            rng = st.date_input("기간",
+                min_value=d_lo, max_value=d_hi, key="win_range",
+                help=f"최대 {WINDOW_MAX_DAYS}일 · 연말~연초처럼 해를 넘는 구간도 된다")
+        if len(rng) < 2:
+            st.info("끝 날짜도 선택하세요.")
+            return
+        w_start, w_end = rng
+    else:
+        w_end = sel_date
+        w_start = (pd.Timestamp(sel_date) - pd.Timedelta(days=(7 if "7일" in w_mode else 30) - 1)).date()
+    if (w_end - w_start).days + 1 > WINDOW_MAX_DAYS:
+        st.warning(f"⚠️ 구간은 {WINDOW_MAX_DAYS}일 이하로 선택하세요.")
+        return
+
+    win = window_compare(df.attrs["version"], df, w_start, w_end)
+    cur = win[win["연도"] == w_end.year]
+    if cur.empty:
+        st.warning(f"⚠️ {w_start} ~ {w_end} 구간의 데이터가 없습니다.")
+        return
+    cur = cur.iloc[0]
+    rf, rt = (normal_base[0], normal_base[1] + 1) if use_normals else (w_end.year - compare_yrs, w_end.year)
+    ref = win[(win["연도"] >= rf) & (win["연도"] < rt) & (win["연도"] != w_end.year)]
+    if ref.empty:
+        st.info("비교 기간 안에 같은 구간의 과거 데이터가 없습니다.")
+        return
+    w_days = (w_end - w_start).days + 1
+    rank = percentile_rank(ref["평균기온"], cur["평균기온"])
+    ref_avg = ref["평균기온"].mean()
+    hot_thr, cold_thr = np.percentile(ref["평균기온"], [pct_p, 100 - pct_p])
+    cls, emoji, word = (("compare-hot", "🔴", "따뜻한") if rank >= pct_p else
+                        ("compare-cold", "🔵", "추운") if rank <= 100 - pct_p else ("compare-norm", "🟢", "평범한"))
+    st.markdown(f"""
+    <div class="compare-card {cls}">
+      <div style="font-size:1.1rem;font-weight:700;color:#e8d5b7;margin-bottom:6px;">
+        {emoji} {w_start.strftime('%Y.%m.%d')} ~ {w_end.strftime('%Y.%m.%d')} ({w_days}일) — 과거 {len(ref)}개년 중 백분위 {rank:.0f}, {word} 구간
+      </div>
+      <div style="color:#8a9bb0;font-size:0.76rem;">
+        비교 기준: {rf}~{rt-1}년 같은 월·일 구간 (관측 {WINDOW_MIN_COVER:.0%} 이상인 해) · 판정: 상위 {pct_p} · 하위 {100-pct_p} 백분위
+      </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    c1, c2, c3, c4 = st.columns(4)
+    for col_w, label, col in [(c1,"구간 평균기온","평균기온"), (c2,"평균 최고기온","최고기온"),
+                              (c3,"최고 극값","최고 극값"), (c4,"최저 극값","최저 극값")]:
+        d = cur[col] - ref[col].mean()
+        col_w.metric(label, f"{cur[col]:.1f}℃",
+            delta=f"{'▲' if d>0 else '▼' if d<0 else '—'} {abs(d):.1f}℃ (백분위 {percentile_rank(ref[col], cur[col]):.0f})")
+    if cur["관측일수"] < w_days:
+        st.caption(f"선택 구간 {w_days}일 중 {int(cur['관측일수'])}일만 관측됨")
+
+    def build_fig1w():
+        bar_colors = np.where(win["평균기온"] >= hot_thr, "#e74c3c",
+                              np.where(win["평균기온"] <= cold_thr, "#3498db", "#7fb3d3"))
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=win["연도"], y=win["평균기온"],
+            marker_color=bar_colors, name="구간 평균기온",
+            customdata=np.column_stack([win["시작"].dt.strftime("%Y-%m-%d"), win["끝"].dt.strftime("%Y-%m-%d"),
+                                        win["최고 극값"], win["최저 극값"]]),
+            hovertemplate="<b>%{customdata[0]} ~ %{customdata[1]}</b><br>평균기온: %{y:.1f}℃<br>"
+                          "최고 %{customdata[2]:.1f}℃ · 최저 %{customdata[3]:.1f}℃<extra></extra>",
+        ))
+        fig.add_hline(y=ref_avg, line_dash="dot", line_color="#f39c12",
+            annotation_text=f"{rf}~{rt-1} 평균 {ref_avg:.1f}℃", annotation_font_color="#f39c12")
+        fig.add_vline(x=w_end.year, line_width=2.5, line_color="#e8d5b7",
+            annotation_text=f"{w_end.year}년", annotation_font_color="#e8d5b7")
+        fig.update_layout(height=360, hovermode="x unified", **_DARK)
+        fig.update_layout(xaxis=dict(showgrid=False), yaxis_title="구간 평균기온 (℃)")
+        return fig
+    wkey = (df.attrs["version"], w_start, w_end, rf, rt, pct_p)
+    st.plotly_chart(cached_chart(("fig1w",) + wkey, build_fig1w), use_container_width=True)
+    st.caption(f"막대 = 해마다 같은 월·일 {w_days}일 구간 평균 (해를 넘는 구간은 끝 날짜의 연도) · "
+               f"🔴 기준 기간 상위 {pct_p} · 🔵 하위 {100-pct_p} 백분위")
+
 # ──────────────────────────────────────────────
 # TAB 2 — 시계열
 # ──────────────────────────────────────────────
-with tab2:
+@st.fragment
+@profiled("tab.timeseries")
+def render_timeseries():
     st.subheader("📈 기온 시계열")
-    resample_opt = st.radio("집계 단위", ["일","월","연"], horizontal=True)
-    rule = {"일":"D","월":"ME","연":"YE"}[resample_opt]
-    ts = fdf.set_index("날짜")[["평균기온","최저기온","최고기온"]].resample(rule).mean()
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=ts.index, y=ts["최고기온"], name="최고기온",
-        line=dict(color="#e74c3c",width=1.2)))
-    fig.add_trace(go.Scatter(x=ts.index, y=ts["최저기온"], name="최저기온",
-        line=dict(color="#3498db",width=1.2),
-        fill="tonexty", fillcolor="rgba(52,152,219,0.07)"))
-    fig.add_trace(go.Scatter(x=ts.index, y=ts["평균기온"], name="평균기온",
-        line=dict(color="#f39c12",width=2.5)))
-    fig.update_layout(height=460, hovermode="x unified", **_DARK)
-    fig.update_layout(yaxis_title="기온 (℃)")
+    _tab_state("ts_resample", "일", options=["일","월","연"])
+    resample_opt = st.radio("집계 단위", ["일","월","연"], horizontal=True, key="ts_resample")
+
+    win, thin = None, False
+    if resample_opt == "일" and len(fdf):
+        # 브라우저가 확대를 알려 주지 않으므로 구간 슬라이더로 좁히면 그 구간을 원해상도로 다시 그린다
+        d0, d1 = fdf["날짜"].iloc[0].date(), fdf["날짜"].iloc[-1].date()
+        cz, cd = st.columns([4,1])
+        with cz:
+            if d0 < d1:
+                _tab_state("ts_window", (d0, d1), d0, d1)
+                win = st.slider("표시 구간", d0, d1, format="YYYY-MM-DD", key="ts_window")
+            else:
+                win = (d0, d1)
+        with cd:
+            _tab_state("ts_thin", True)
+            thin = st.toggle("최소·최대 샘플링", key="ts_thin",
+                help=f"구간이 {TS_CHART_PX:,}일보다 길면 약 {TS_CHART_PX // 2:,}개 구간의 최소·최대만 표시")
+
+    def build():
+        note = None
+        if resample_opt == "일":
+            ts = pd.DataFrame({c: _f64(fdf[c]) for c in ["평균기온","최저기온","최고기온"]},
+                              index=fdf["날짜"]).resample("D").mean()
+            if win is not None:
+                ts = ts.loc[pd.Timestamp(win[0]):pd.Timestamp(win[1])]
+            if thin and len(ts) > TS_CHART_PX:
+                keep = minmax_positions([ts[c].to_numpy() for c in ts.columns], TS_CHART_PX // 2)
+                note = f"{len(ts):,}일 → {len(keep):,}점 (구간별 최소·최대 유지)"
+                ts = ts.iloc[keep]
+        else:
+            # 월·연 평균은 큐브에서 — 필터로 빠진 기간은 빈 칸으로 채워 선이 끊기게 한다
+            by = ["연도","월"] if resample_opt == "월" else "연도"
+            ts = rollup_mean(fcube, by)
+            if resample_opt == "월":
+                yrs, ms = ts.index.get_level_values(0), ts.index.get_level_values(1)
+            else:
+                yrs, ms = ts.index, np.full(len(ts), 12)
+            ts.index = pd.to_datetime(pd.DataFrame({"year": yrs, "month": ms, "day": 1})) + pd.offsets.MonthEnd(0)
+            if len(ts):
+                ts = ts.reindex(pd.date_range(ts.index[0], ts.index[-1],
+                                              freq="ME" if resample_opt == "월" else "YE"))
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=ts.index, y=ts["최고기온"], name="최고기온",
+            line=dict(color="#e74c3c",width=1.2)))
+        fig.add_trace(go.Scatter(x=ts.index, y=ts["최저기온"], name="최저기온",
+            line=dict(color="#3498db",width=1.2),
+            fill="tonexty", fillcolor="rgba(52,152,219,0.07)"))
+        fig.add_trace(go.Scatter(x=ts.index, y=ts["평균기온"], name="평균기온",
+            line=dict(color="#f39c12",width=2.5)))
+        fig.update_layout(height=460, hovermode="x unified", **_DARK)
+        fig.update_layout(yaxis_title="기온 (℃)")
+        return fig, note
+
+    fig, note = cached_chart(("ts",) + fkey + (resample_opt, win, thin), build)
+    if note:
+        st.caption(note)
     st.plotly_chart(fig, use_container_width=True)
 
 # ──────────────────────────────────────────────
 # TAB 3 — 월별·연별
 # ──────────────────────────────────────────────
-with tab3:
+@st.fragment
+@profiled("tab.monthly")
+def render_monthly():
     cl, cr = st.columns(2)
     with cl:
         st.markdown("#### 월별 기온 범위")
-        monthly = fdf.groupby("월").agg(
-            평균기온=("평균기온","mean"),최저기온=("최저기온","mean"),최고기온=("최고기온","mean")
-        ).reset_index()
-        monthly["월명"] = monthly["월"].apply(lambda m: f"{m}월")
-        fig3 = go.Figure()
-        fig3.add_trace(go.Bar(x=monthly["월명"],
-            y=monthly["최고기온"]-monthly["최저기온"],
-            base=monthly["최저기온"],name="범위",
-            marker_color="rgba(52,152,219,0.3)"))
-        fig3.add_trace(go.Scatter(x=monthly["월명"],y=monthly["평균기온"],
-            name="평균기온",mode="lines+markers",
-            line=dict(color="#f39c12",width=3),marker=dict(size=8)))
-        fig3.update_layout(height=340,**_DARK)
-        fig3.update_layout(xaxis=dict(showgrid=False),yaxis_title="기온 (℃)")
-        st.plotly_chart(fig3,use_container_width=True)
+        def build_fig3():
+            monthly = rollup_mean(fcube, "월").reset_index()
+            monthly["월명"] = monthly["월"].apply(lambda m: f"{m}월")
+            fig3 = go.Figure()
+            fig3.add_trace(go.Bar(x=monthly["월명"],
+                y=monthly["최고기온"]-monthly["최저기온"],
+                base=monthly["최저기온"],name="범위",
+                marker_color="rgba(52,152,219,0.3)"))
+            fig3.add_trace(go.Scatter(x=monthly["월명"],y=monthly["평균기온"],
+                name="평균기온",mode="lines+markers",
+                line=dict(color="#f39c12",width=3),marker=dict(size=8)))
+            fig3.update_layout(height=340,**_DARK)
+            fig3.update_layout(xaxis=dict(showgrid=False),yaxis_title="기온 (℃)")
+            return fig3
+        st.plotly_chart(cached_chart(("fig3",) + fkey, build_fig3), use_container_width=True)
 
     with cr:
         st.markdown("#### 연도별 평균기온 + 추세선")
-        yearly = fdf.groupby("연도")["평균기온"].mean().reset_index()
-        z = np.polyfit(yearly["연도"],yearly["평균기온"],1)
-        p = np.poly1d(z)
-        fig4 = go.Figure()
-        fig4.add_trace(go.Scatter(x=yearly["연도"],y=yearly["평균기온"],
-            mode="lines+markers",name="평균기온",
-            line=dict(color="#3498db",width=1.5),marker=dict(size=4)))
-        fig4.add_trace(go.Scatter(x=yearly["연도"],y=p(yearly["연도"]),
-            mode="lines",name="추세선",
-            line=dict(color="#e74c3c",dash="dash",width=2)))
-        fig4.update_layout(height=340,**_DARK)
-        fig4.update_layout(xaxis=dict(showgrid=False),yaxis_title="기온 (℃)")
-        st.plotly_chart(fig4,use_container_width=True)
+        def build_fig4():
+            yearly = rollup_mean(fcube, "연도")[["평균기온"]].reset_index()
+            tr = sen_mk(yearly["연도"], yearly["평균기온"])
+            fig4 = go.Figure()
+            fig4.add_trace(go.Scatter(x=yearly["연도"],y=yearly["평균기온"],
+                mode="lines+markers",name="평균기온",
+                line=dict(color="#3498db",width=1.5),marker=dict(size=4)))
+            fig4.add_trace(go.Scatter(x=yearly["연도"],y=tr["intercept"] + tr["slope"]*yearly["연도"],
+                mode="lines",name="추세선 (Sen)",
+                line=dict(color="#e74c3c",dash="dash",width=2)))
+            fig4.update_layout(height=340,**_DARK)
+            fig4.update_layout(xaxis=dict(showgrid=False),yaxis_title="기온 (℃)")
+            return fig4, (f"Sen 기울기 {tr['slope']*10:+.2f}℃/10년 · Mann-Kendall p = {tr['p']:.3g} "
+                          f"({tr['n']}개년)")
+        fig4, note = cached_chart(("fig4",) + fkey, build_fig4)
+        st.plotly_chart(fig4, use_container_width=True)
+        st.caption(note)
 
     st.markdown("#### 연도×월 평균기온 히트맵")
-    pivot = fdf.groupby(["연도","월"])["평균기온"].mean().unstack()
-    pivot.columns = [f"{m}월" for m in pivot.columns]
-    fig5 = px.imshow(pivot.T,color_continuous_scale="RdBu_r",aspect="auto",
-        labels=dict(x="연도",y="월",color="평균기온(℃)"))
-    fig5.update_layout(height=380,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
-        font=dict(color="#8a9bb0"))
-    st.plotly_chart(fig5,use_container_width=True)
+    def build_fig5():
+        pivot = rollup_mean(fcube, ["연도","월"])["평균기온"].unstack()
+        pivot.columns = [f"{m}월" for m in pivot.columns]
+        fig5 = px.imshow(pivot.T,color_continuous_scale="RdBu_r",aspect="auto",
+            labels=dict(x="연도",y="월",color="평균기온(℃)"))
+        fig5.update_layout(height=380,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
+            font=dict(color="#8a9bb0"))
+        return fig5
+    st.plotly_chart(cached_chart(("fig5",) + fkey, build_fig5), use_container_width=True)
+
+    st.markdown("#### 🌡️ 월·일별 온난화 속도 (Sen 기울기, ℃/10년)")
+    cc, cs = st.columns([1,1])
+    with cc:
+        _tab_state("trend_col", "평균기온", options=_TEMP_COLS)
+        t_col = st.radio("기온", ["평균기온","최고기온","최저기온"], horizontal=True, key="trend_col")
+    with cs:
+        _tab_state("trend_sig", False)
+        sig_only = st.toggle("유의한 값만 (MK p < 0.05)", key="trend_sig")
+    tm, td = trend_tables(df.attrs["version"], df, t_col, tuple(yr_range))
+
+    def build_trend_fig():
+        z = np.full((12, 31), np.nan)
+        pv = np.full((12, 31), np.nan)
+        z[td["월"] - 1, td["일"] - 1] = td["기울기"].where((td["p"] < 0.05) | (not sig_only))
+        pv[td["월"] - 1, td["일"] - 1] = td["p"]
+        lim = np.nanmax(np.abs(td["기울기"])) if td["기울기"].notna().any() else 1
+        fig = go.Figure(go.Heatmap(z=z, x=np.arange(1, 32), y=[f"{m}월" for m in range(1, 13)],
+            customdata=pv, colorscale="RdBu_r", zmin=-lim, zmax=lim,
+            colorbar=dict(title="℃/10년"),
+            hovertemplate="%{y} %{x}일<br>%{z:+.2f}℃/10년<br>p = %{customdata:.3g}<extra></extra>"))
+        fig.update_layout(height=380, **_DARK)
+        fig.update_layout(xaxis=dict(showgrid=False, title="일"), yaxis=dict(showgrid=False, autorange="reversed"))
+        return fig
+
+    def build_trend_month_fig():
+        sig = tm["p"] < 0.05
+        fig = go.Figure(go.Bar(x=[f"{m}월" for m in tm["월"]], y=tm["기울기"],
+            marker_color=np.where(tm["기울기"] >= 0, "#e74c3c", "#3498db"),
+            marker_opacity=np.where(sig, 1.0, 0.35),
+            customdata=np.column_stack([tm["p"], tm["n"]]),
+            hovertemplate="%{x}<br>%{y:+.2f}℃/10년<br>p = %{customdata[0]:.3g} (%{customdata[1]}개년)<extra></extra>"))
+        fig.update_layout(height=280, **_DARK)
+        fig.update_layout(xaxis=dict(showgrid=False), yaxis_title="℃/10년")
+        return fig
+
+    tkey = (df.attrs["version"], t_col, tuple(yr_range))
+    st.plotly_chart(cached_chart(("trend_day",) + tkey + (sig_only,), build_trend_fig), use_container_width=True)
+    st.plotly_chart(cached_chart(("trend_month",) + tkey, build_trend_month_fig), use_container_width=True)
+    atr = anomaly_trend(df.attrs["version"], df, t_col, normal_base, tuple(yr_range))
+    st.caption(f"{yr_range[0]}~{yr_range[1]}년 · 연 계열마다 Theil–Sen 기울기와 Mann-Kendall 검정 (흐린 막대 = p ≥ 0.05) · "
+               f"일별 평년 편차 전체({atr['n']:,}일) 기울기 {atr['slope']:+.2f}℃/10년, p = {atr['p']:.3g}")
+
+    st.markdown("#### 🔎 비슷한 해 찾기 (일별 평년 편차 궤적)")
+    ca, cb, ck = st.columns([1,2,1])
+    with ca:
+        _tab_state("analog_date", dense.last_date.date(), dense.first_date.date(), dense.last_date.date())
+        a_date = st.date_input("기준일",
+            min_value=dense.first_date.date(), max_value=dense.last_date.date(), key="analog_date",
+            help="그해 1월 1일부터 이 날까지의 편차 궤적을 비교 — 12월 31일이면 한 해 전체")
+    with cb:
+        _tab_state("analog_cols", ["평균기온"], options=_TEMP_COLS)
+        a_cols = st.multiselect("비교 기온", ["평균기온","최고기온","최저기온"], key="analog_cols") or ["평균기온"]
+    with ck:
+        _tab_state("analog_k", 5)
+        a_k = st.slider("찾을 연도 수", 1, 10, key="analog_k")
+    a_upto = int(_md_slot(a_date.month, a_date.day))
+    akey = (df.attrs["version"], a_date.year, tuple(a_cols), normal_base, fkey[2], a_upto, a_k)
+    ana = analog_years(df.attrs["version"], df, a_date.year, tuple(a_cols), normal_base, fkey[2], a_upto, a_k)
+    if ana.empty:
+        st.info("비교할 만큼 겹치는 연도가 없습니다.")
+    else:
+        def build_analog_fig():
+            # 윤년 달력(2000년)에 슬롯을 펼쳐 x 축을 월·일로, 7일 이동평균으로 잡음을 줄여 그린다
+            years, A = anomaly_matrix(df.attrs["version"], df, a_cols[0], normal_base)
+            x = pd.Timestamp("2000-01-01") + pd.to_timedelta(np.arange(366), "D")
+            smooth = lambda y: pd.Series(y).rolling(7, center=True, min_periods=1).mean()
+            fig = go.Figure()
+            for y in ana["연도"]:
+                fig.add_trace(go.Scatter(x=x, y=smooth(A[y - years[0]]), mode="lines", name=f"{y}년",
+                    line=dict(width=1.2), opacity=0.7,
+                    hovertemplate=f"{y}년 %{{x|%m-%d}}<br>%{{y:+.1f}}℃<extra></extra>"))
+            cur = np.where(np.arange(366) <= a_upto, A[a_date.year - years[0]], np.nan)
+            fig.add_trace(go.Scatter(x=x, y=smooth(cur).where(~np.isnan(cur)), mode="lines",
+                name=f"{a_date.year}년", line=dict(color="#e8d5b7", width=3),
+                hovertemplate=f"{a_date.year}년 %{{x|%m-%d}}<br>%{{y:+.1f}}℃<extra></extra>"))
+            fig.add_hline(y=0, line_dash="dot", line_color="#8a9bb0")
+            fig.update_layout(height=360, **_DARK)
+            fig.update_layout(xaxis=dict(showgrid=False, tickformat="%m월"), yaxis_title=f"{a_cols[0]} 편차 (℃)")
+            return fig
+        st.plotly_chart(cached_chart(("analog",) + akey, build_analog_fig), use_container_width=True)
+        st.dataframe(ana.round(2), use_container_width=True, hide_index=True)
+        scope = f"{', '.join(f'{m}월' for m in fkey[2])} · " if fkey[2] else ""
+        st.caption(f"{a_date.year}년 1월 1일~{a_date.month}월 {a_date.day}일 {scope}{'·'.join(a_cols)} "
+                   f"{ana.attrs['days']}일 (편차 평균 {ana.attrs['mean']:+.2f}℃)과 같은 날들의 "
+                   f"{normal_base[0]}~{normal_base[1]} 평년 편차 RMSE가 작은 순 · 전체 연도 중 비교일 "
+                   f"{ANALOG_MIN_COVER:.0%} 이상 겹치는 해만 · 굵은 선 = 선택 연도, 7일 이동평균")
 
 # ──────────────────────────────────────────────
 # TAB 4 — 기후변화
 # ──────────────────────────────────────────────
-with tab4:
+@st.fragment
+@profiled("tab.climate")
+def render_climate():
     st.subheader("🔥 기후변화 지표")
-    ca, cb = st.columns(2)
-    with ca:
-        st.markdown("**폭염일수 (최고기온 ≥ 33℃)**")
-        heat = fdf[fdf["최고기온"]>=33].groupby("연도").size().reset_index(name="폭염일수")
-        fig6 = px.bar(heat,x="연도",y="폭염일수",color="폭염일수",color_continuous_scale="Reds")
-        fig6.update_layout(height=300,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
-            font=dict(color="#8a9bb0"),coloraxis_showscale=False,
-            xaxis=dict(showgrid=False),yaxis=dict(showgrid=True,gridcolor="#1e2e3e"))
-        st.plotly_chart(fig6,use_container_width=True)
-    with cb:
-        st.markdown("**한파일수 (최저기온 ≤ -12℃)**")
-        cold = fdf[fdf["최저기온"]<=-12].groupby("연도").size().reset_index(name="한파일수")
-        fig7 = px.bar(cold,x="연도",y="한파일수",color="한파일수",color_continuous_scale="Blues_r")
-        fig7.update_layout(height=300,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
+    with st.expander("⚙️ 지표 기준값 (℃)"):
+        e1, e2, e3 = st.columns(3)
+        d = ExtremeRules()
+        for f in ["heat", "cold", "tropical", "gdd_base", "frost", "ice"]:
+            _tab_state(f"rule_{f}", float(getattr(d, f)))
+        rules = ExtremeRules(
+            heat=e1.number_input("폭염: 최고기온 ≥", step=0.5, key="rule_heat"),
+            cold=e1.number_input("한파: 최저기온 ≤", step=0.5, key="rule_cold"),
+            tropical=e2.number_input("열대야: 최저기온 ≥", step=0.5, key="rule_tropical"),
+            gdd_base=e2.number_input("생장도일 기준 평균기온", step=0.5, key="rule_gdd_base"),
+            frost=e3.number_input("서리일: 최저기온 <", step=0.5, key="rule_frost"),
+            ice=e3.number_input("결빙일: 최고기온 <", step=0.5, key="rule_ice"),
+        )
+    # 연도별 지표는 데이터 버전·기준값·월 필터마다 한 번 계산, 연도 범위는 잘라서만 쓴다
+    ext = climate_extremes(df.attrs["version"], df, rules, fkey[2]).loc[yr_range[0]:yr_range[1]]
+    ekey = fkey + (rules,)
+
+    def bar_fig(tbl, col, scale):
+        fig = px.bar(tbl.reset_index(),x="연도",y=col,color=col,color_continuous_scale=scale)
+        fig.update_layout(height=300,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
             font=dict(color="#8a9bb0"),coloraxis_showscale=False,
             xaxis=dict(showgrid=False),yaxis=dict(showgrid=True,gridcolor="#1e2e3e"))
-        st.plotly_chart(fig7,use_container_width=True)
-
-    st.markdown("**기온 편차 (1981~2010 평균 대비)**")
-    bm = df[(df["연도"]>=1981)&(df["연도"]<=2010)]["평균기온"].mean()
-    y2 = fdf.groupby("연도")["평균기온"].mean().reset_index()
-    y2["편차"] = y2["평균기온"] - bm
-    fig8 = go.Figure(go.Bar(x=y2["연도"],y=y2["편차"],
-        marker_color=y2["편차"].apply(lambda x:"#e74c3c" if x>=0 else "#3498db")))
-    fig8.add_hline(y=0,line_dash="dot",line_color="#e8d5b7")
-    fig8.add_annotation(x=0.02,y=0.97,xref="paper",yref="paper",
-        text=f"기준(1981–2010 평균): {bm:.2f}℃",showarrow=False,
-        bgcolor="#1a2332",font=dict(color="#e8d5b7",size=11))
-    fig8.update_layout(height=340,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
-        font=dict(color="#8a9bb0"),
-        xaxis=dict(showgrid=False),yaxis=dict(showgrid=True,gridcolor="#1e2e3e",title="편차 (℃)"))
-    st.plotly_chart(fig8,use_container_width=True)
+        return fig
+
+    _tab_state("climate_mode", "고정 기준값", options=["고정 기준값", "백분위 기준"])
+    mode = st.radio("고온·저온일 판정", ["고정 기준값", "백분위 기준"], horizontal=True, key="climate_mode",
+        help="백분위 기준: 사이드바 '평년·백분위 기준'의 기간·창으로 구한 날짜별 백분위수와 비교 (TX90p / TN10p 방식)")
+    if mode == "고정 기준값":
+        tbl, pkey = ext, ekey
+        panels = [("폭염일수", f"폭염일수 (최고기온 ≥ {rules.heat:g}℃)", "Reds"),
+                  ("한파일수", f"한파일수 (최저기온 ≤ {rules.cold:g}℃)", "Blues_r")]
+    else:
+        tbl = pct_exceedance(df.attrs["version"], df, pct_p, pspec[0], pct_win, fkey[2]).loc[yr_range[0]:yr_range[1]]
+        pkey = fkey + pspec
+        panels = [(f"TX{pct_p}p", f"고온일 TX{pct_p}p (최고기온 > 날짜별 {pct_p} 백분위)", "Reds"),
+                  (f"TN{100-pct_p}p", f"저온일 TN{100-pct_p}p (최저기온 < 날짜별 {100-pct_p} 백분위)", "Blues_r")]
+    for col_w, (col, title, scale) in zip(st.columns(2), panels):
+        with col_w:
+            st.markdown(f"**{title}**")
+            st.plotly_chart(cached_chart(("fig67", col) + pkey, lambda: bar_fig(tbl, col, scale)),
+                            use_container_width=True)
+
+    st.markdown("**연도별 극값 지표**")
+    inds = [c for c in ext.columns if c not in ("유효일수","폭염일수","한파일수")]
+    _tab_state("climate_ind", inds[0], options=inds)
+    ind = st.selectbox("지표", inds, label_visibility="collapsed", key="climate_ind")
+    st.plotly_chart(cached_chart(("ext", ind) + ekey, lambda: bar_fig(ext, ind, "Viridis")),
+                    use_container_width=True)
+    with st.expander("📋 지표 표"):
+        st.dataframe(ext.sort_index(ascending=False), use_container_width=True, height=300)
+        st.caption("연속 일수는 결측일·해 바뀜에서 끊김 · 월 필터가 있으면 선택한 달만 셈")
+
+    st.markdown(f"**기온 편차 ({normal_base[0]}~{normal_base[1]} 일별 평년값 대비)**")
+    def build_fig8():
+        # 날마다 그날의 평년값을 뺀 편차의 연평균 — 월 필터가 있어도 계절 구성이 섞이지 않는다
+        y2 = yearly_anomaly(df.attrs["version"], df, "평균기온", normal_base, fkey[2])
+        y2 = y2.loc[yr_range[0]:yr_range[1]].reset_index()
+        fig8 = go.Figure(go.Bar(x=y2["연도"],y=y2["편차"],
+            marker_color=np.where(y2["편차"] >= 0, "#e74c3c", "#3498db")))
+        fig8.add_hline(y=0,line_dash="dot",line_color="#e8d5b7")
+        fig8.add_annotation(x=0.02,y=0.97,xref="paper",yref="paper",
+            text=f"기준: {normal_base[0]}–{normal_base[1]} 일별 평년값 (연주기 조화 평활)",showarrow=False,
+            bgcolor="#1a2332",font=dict(color="#e8d5b7",size=11))
+        fig8.update_layout(height=340,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
+            font=dict(color="#8a9bb0"),
+            xaxis=dict(showgrid=False),yaxis=dict(showgrid=True,gridcolor="#1e2e3e",title="편차 (℃)"))
+        return fig8
+    st.plotly_chart(cached_chart(("fig8",) + fkey + (normal_base,), build_fig8), use_container_width=True)
 
 # ──────────────────────────────────────────────
 # TAB 5 — 수능날 기온
 # ──────────────────────────────────────────────
-with tab5:
-    st.subheader("🎓 수능 시험날 서울 기온 분석 (1993~2025년 시행)")
-
-    # 수능 데이터 구성
-    records = []
-    for 학년도, (ds, note) in SUNEUNG.items():
-        dt = pd.to_datetime(ds)
-        row = df[df["날짜"]==dt]
-        yr = dt.year
-        same_ref = df[
-            (df["월"]==dt.month) & (df["일"]==dt.day) &
-            (df["연도"]>=yr-30) & (df["연도"]<yr)
-        ]
-        ref_avg = same_ref["평균기온"].mean() if not same_ref.empty else None
-        if not row.empty:
-            r = row.iloc[0]
-            records.append({
-                "학년도": 학년도, "날짜": ds, "시행연도": yr,
-                "평균기온": r["평균기온"], "최저기온": r["최저기온"], "최고기온": r["최고기온"],
-                "일교차": r["최고기온"]-r["최저기온"],
-                "평년대비": round(r["평균기온"]-ref_avg,1) if ref_avg is not None else None,
-                "비고": note,
-            })
-        else:
-            records.append({
-                "학년도": 학년도, "날짜": ds, "시행연도": yr,
-                "평균기온": None, "최저기온": None, "최고기온": None,
-                "일교차": None, "평년대비": None, "비고": note,
-            })
+@st.fragment
+@profiled("tab.suneung")
+def render_suneung():
+    st.subheader(f"🎓 수능 시험날 {station_name(station)} 기온 분석 (1993~2025년 시행)")
+
+    _tab_state("suneung_ref", "recent", options=["recent", "normals"])
+    use_normals = st.radio("평년 기준", ["recent", "normals"], horizontal=True, key="suneung_ref",
+        format_func=lambda o: "직전 30년 같은 날" if o == "recent" else f"평년값 ({normal_base[0]}~{normal_base[1]})",
+        help="평년값: 사이드바 '평년 기간'의 일별 평년값(연주기 조화 평활)") == "normals"
+    ref_text = (f"{normal_base[0]}~{normal_base[1]} 일별 평년값" if use_normals else "직전 30년 같은 날 평균")
 
-    sdf = pd.DataFrame(records).dropna(subset=["평균기온"])
-    sdf["시행연도"] = sdf["시행연도"].astype(int)
+    # 수능 데이터 구성 — 평년 대비
+    sdf = suneung_table(df.attrs["version"], df, normal_base if use_normals else None)
+    if sdf.empty:
+        st.info(f"{station_label(station)} 자료에는 수능 시험날 관측이 없습니다.")
+        return
 
     # KPI
     ci = sdf["평균기온"].idxmin(); hi = sdf["평균기온"].idxmax()
@@ -577,55 +1103,59 @@ with tab5:
 
     # 차트 1: 연도별 기온 범위 + 평균기온
     st.markdown("#### 📊 연도별 수능 당일 기온")
-    mcolors = []
-    for v in sdf["평년대비"]:
-        if v is None: mcolors.append("#7f8c8d")
-        elif v >= 3:  mcolors.append("#e74c3c")
-        elif v <= -3: mcolors.append("#3498db")
-        else:         mcolors.append("#f39c12")
-
-    fig_s = go.Figure()
-    fig_s.add_trace(go.Bar(
-        x=sdf["시행연도"], y=sdf["최고기온"]-sdf["최저기온"], base=sdf["최저기온"],
-        name="최저~최고 범위", marker_color="rgba(100,120,200,0.2)",
-        hovertemplate="<b>%{customdata}</b><br>최저: %{base:.1f}℃ / 최고: %{y:.1f}℃<extra></extra>",
-        customdata=sdf["학년도"],
-    ))
-    fig_s.add_trace(go.Scatter(
-        x=sdf["시행연도"], y=sdf["평균기온"], mode="markers+lines", name="평균기온",
-        marker=dict(size=11, color=mcolors, line=dict(color="#e8d5b7",width=1.5)),
-        line=dict(color="#e8d5b7",width=1,dash="dot"),
-        hovertemplate="<b>%{customdata[0]}</b><br>평균기온: %{y:.1f}℃<br>평년대비: %{customdata[1]}<extra></extra>",
-        customdata=[[r["학년도"], f"{r['평년대비']:+.1f}℃" if r["평년대비"] is not None else "—"]
-                    for _,r in sdf.iterrows()],
-    ))
-    fig_s.add_hline(y=sdf["평균기온"].mean(), line_dash="dash", line_color="#f39c12",
-        annotation_text=f"수능 평균 {sdf['평균기온'].mean():.1f}℃",
-        annotation_font_color="#f39c12")
-    fig_s.add_hline(y=0, line_dash="dot", line_color="#5a7a9a", line_width=1)
-    fig_s.update_layout(height=440, hovermode="x unified", **_DARK)
-    fig_s.update_layout(xaxis=dict(showgrid=False, title="시행연도"), yaxis_title="기온 (℃)")
-    st.plotly_chart(fig_s, use_container_width=True)
+    def build_fig_s():
+        mcolors = []
+        for v in sdf["평년대비"]:
+            if pd.isna(v): mcolors.append("#7f8c8d")
+            elif v >= 3:  mcolors.append("#e74c3c")
+            elif v <= -3: mcolors.append("#3498db")
+            else:         mcolors.append("#f39c12")
+
+        fig_s = go.Figure()
+        fig_s.add_trace(go.Bar(
+            x=sdf["시행연도"], y=sdf["최고기온"]-sdf["최저기온"], base=sdf["최저기온"],
+            name="최저~최고 범위", marker_color="rgba(100,120,200,0.2)",
+            hovertemplate="<b>%{customdata}</b><br>최저: %{base:.1f}℃ / 최고: %{y:.1f}℃<extra></extra>",
+            customdata=sdf["학년도"],
+        ))
+        fig_s.add_trace(go.Scatter(
+            x=sdf["시행연도"], y=sdf["평균기온"], mode="markers+lines", name="평균기온",
+            marker=dict(size=11, color=mcolors, line=dict(color="#e8d5b7",width=1.5)),
+            line=dict(color="#e8d5b7",width=1,dash="dot"),
+            hovertemplate="<b>%{customdata[0]}</b><br>평균기온: %{y:.1f}℃<br>평년대비: %{customdata[1]}<extra></extra>",
+            customdata=np.column_stack([
+                sdf["학년도"], [f"{v:+.1f}℃" if pd.notna(v) else "—" for v in sdf["평년대비"]]]),
+        ))
+        fig_s.add_hline(y=sdf["평균기온"].mean(), line_dash="dash", line_color="#f39c12",
+            annotation_text=f"수능 평균 {sdf['평균기온'].mean():.1f}℃",
+            annotation_font_color="#f39c12")
+        fig_s.add_hline(y=0, line_dash="dot", line_color="#5a7a9a", line_width=1)
+        fig_s.update_layout(height=440, hovermode="x unified", **_DARK)
+        fig_s.update_layout(xaxis=dict(showgrid=False, title="시행연도"), yaxis_title="기온 (℃)")
+        return fig_s
+    st.plotly_chart(cached_chart(("fig_s", df.attrs["version"], use_normals and normal_base), build_fig_s), use_container_width=True)
     st.caption("마커 색상: 🔴 평년보다 3℃+ 따뜻  🟡 평년과 유사  🔵 평년보다 3℃+ 추움  │ 범위 막대 = 최저~최고기온")
 
     # 차트 2: 평년 대비 편차
-    st.markdown("#### 📉 수능 당일 평년 대비 기온 편차 (직전 30년 같은 날 평균 기준)")
-    sdf_nn = sdf.dropna(subset=["평년대비"])
-    fig_s2 = go.Figure(go.Bar(
-        x=sdf_nn["시행연도"], y=sdf_nn["평년대비"],
-        marker_color=["#e74c3c" if v>=0 else "#3498db" for v in sdf_nn["평년대비"]],
-        text=[f"{v:+.1f}℃" for v in sdf_nn["평년대비"]],
-        textposition="outside", textfont=dict(size=9,color="#e8d5b7"),
-        hovertemplate="<b>%{customdata}</b><br>편차: %{y:+.1f}℃<extra></extra>",
-        customdata=sdf_nn["학년도"],
-    ))
-    fig_s2.add_hline(y=0,line_dash="dot",line_color="#e8d5b7")
-    fig_s2.update_layout(height=330,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
-        font=dict(color="#8a9bb0"),
-        xaxis=dict(showgrid=False,title="시행연도"),
-        yaxis=dict(showgrid=True,gridcolor="#1e2e3e",title="편차 (℃)"),
-        margin=dict(t=40,b=20))
-    st.plotly_chart(fig_s2, use_container_width=True)
+    st.markdown(f"#### 📉 수능 당일 평년 대비 기온 편차 ({ref_text} 기준)")
+    def build_fig_s2():
+        sdf_nn = sdf.dropna(subset=["평년대비"])
+        fig_s2 = go.Figure(go.Bar(
+            x=sdf_nn["시행연도"], y=sdf_nn["평년대비"],
+            marker_color=["#e74c3c" if v>=0 else "#3498db" for v in sdf_nn["평년대비"]],
+            text=[f"{v:+.1f}℃" for v in sdf_nn["평년대비"]],
+            textposition="outside", textfont=dict(size=9,color="#e8d5b7"),
+            hovertemplate="<b>%{customdata}</b><br>편차: %{y:+.1f}℃<extra></extra>",
+            customdata=sdf_nn["학년도"],
+        ))
+        fig_s2.add_hline(y=0,line_dash="dot",line_color="#e8d5b7")
+        fig_s2.update_layout(height=330,plot_bgcolor="#0f1923",paper_bgcolor="#0f1923",
+            font=dict(color="#8a9bb0"),
+            xaxis=dict(showgrid=False,title="시행연도"),
+            yaxis=dict(showgrid=True,gridcolor="#1e2e3e",title="편차 (℃)"),
+            margin=dict(t=40,b=20))
+        return fig_s2
+    st.plotly_chart(cached_chart(("fig_s2", df.attrs["version"], use_normals and normal_base), build_fig_s2), use_container_width=True)
 
     # 표
     st.markdown("#### 📋 수능 날짜별 상세 기온")
@@ -647,17 +1177,76 @@ with tab5:
         use_container_width=True, height=620,
     )
     st.caption("🔵 파란 행: 평균기온 3℃ 미만(수능 한파)  🔴 붉은 행: 평균기온 15℃ 이상(이상 고온)")
-    csv_s = disp.to_csv(index=False, encoding="utf-8-sig")
-    st.download_button("⬇️ 수능 기온 데이터 다운로드", data=csv_s,
+    st.download_button("⬇️ 수능 기온 데이터 다운로드", data=export_file(lambda: [disp], "CSV"),
         file_name="suneung_temp.csv", mime="text/csv")
 
 # ──────────────────────────────────────────────
 # TAB 6 — 원본
 # ──────────────────────────────────────────────
-with tab6:
+@st.fragment
+@profiled("tab.raw")
+def render_raw():
     st.subheader("📋 원본 데이터")
-    yr_sel = st.selectbox("연도", sorted(fdf["연도"].unique(), reverse=True))
+    if df.attrs.get("encoding"):
+        st.caption(f"원본 인코딩: {df.attrs['encoding']} — {df.attrs['encoding_reason']}")
+    st.caption(f"메모리: {df.memory_usage(deep=True).sum() / 2**20:.1f} MiB"
+               f"{' (압축 스키마)' if df.attrs.get('compact') else ''}")
+
+    gaps = dense.gaps()
+    n_missing = int(gaps["일수"].sum())
+    with st.expander(f"🕳️ 결측일 보고서 — {len(dense.present):,}일 중 {n_missing:,}일 없음 ({len(gaps):,}개 구간)"):
+        st.caption(f"값이 비어 제외된 행 {len(dense.dropped):,}개 · 날짜를 읽을 수 없어 제외된 행 "
+                   f"{df.attrs.get('dropped_bad_date', 0):,}개 (원본 파일 전체 기준)")
+        st.dataframe(gaps.sort_values("일수", ascending=False).reset_index(drop=True),
+                     use_container_width=True, height=300)
+    years = [int(y) for y in sorted(fdf["연도"].unique(), reverse=True)]
+    if years:
+        _tab_state("raw_year", years[0], options=years)
+    yr_sel = st.selectbox("연도", years, key="raw_year")
     vdf = fdf[fdf["연도"]==yr_sel][["날짜","지점","평균기온","최저기온","최고기온"]]
+    vdf = vdf.assign(**{c: _f64(vdf[c]) for c in _TEMP_COLS})
     st.dataframe(vdf.reset_index(drop=True), use_container_width=True, height=500)
-    st.download_button("⬇️ 다운로드", vdf.to_csv(index=False,encoding="utf-8-sig"),
-        file_name=f"temp_{yr_sel}.csv", mime="text/csv")
+
+    # 내보내기 — 범위·형식만 고르고, 파일은 버튼을 누를 때 만든다
+    cols = ["날짜","지점",*_TEMP_COLS]
+    ce1, ce2 = st.columns([3,1])
+    scopes = ["연도", "필터 적용 구간", "이 지점 전체", "모든 지점"]
+    _tab_state("raw_scope", scopes[0], options=scopes)
+    scope = ce1.radio("내보낼 범위", scopes, horizontal=True, key="raw_scope",
+        format_func=lambda o: f"{yr_sel}년" if o == "연도" else o,
+        help="모든 지점: 기본 데이터와 업로드의 전 지점 (업로드 병합 규칙 적용)")
+    _tab_state("raw_fmt", next(iter(EXPORT_FORMATS)), options=list(EXPORT_FORMATS))
+    fmt = ce2.selectbox("형식", list(EXPORT_FORMATS), key="raw_fmt",
+        help=None if "Parquet" in EXPORT_FORMATS else "Parquet·Arrow 는 pyarrow 설치 시 사용 가능")
+    frames_fn, tag = {
+        "연도":           (lambda: [vdf], f"{station}_{yr_sel}"),
+        "필터 적용 구간": (lambda: [fdf[cols]], f"{station}_{yr_range[0]}-{yr_range[1]}"),
+        "이 지점 전체":   (lambda: [df[cols]], f"{station}"),
+        "모든 지점":      (lambda: (f[cols] for f in station_frames()), "all"),
+    }[scope]
+    ext, mime = EXPORT_FORMATS[fmt]
+    st.download_button("⬇️ 다운로드", data=export_file(frames_fn, fmt),
+        file_name=f"temp_{tag}.{ext}", mime=mime)
+
+# ═══════════════════════════════════════════════════════
+#  탭 렌더링 — 열린 탭만
+# ═══════════════════════════════════════════════════════
+for _k in TAB_STATE_KEYS:
+    if _k in st.session_state:
+        st.session_state[_k] = st.session_state[_k]
+tabs = st.tabs([
+    "📅 날짜 비교", "📈 시계열", "📊 월별·연별", "🔥 기후변화", "🎓 수능날 기온", "📋 원본"
+], key="active_tab", on_change="rerun")
+for tab, render in zip(tabs, [render_compare, render_timeseries, render_monthly,
+                              render_climate, render_suneung, render_raw]):
+    if tab.open:
+        with tab:
+            render()
+
+# ═══════════════════════════════════════════════════════
+#  계측 마무리
+# ═══════════════════════════════════════════════════════
+_keep_run(end_trace(_trace))
+if prof_on:
+    with st.sidebar:
+        render_profiler()
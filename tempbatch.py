@@ -0,0 +1,214 @@
+"""ASOS 기온 배치 작업 — 대시보드(Streamlit) 없이 tempcore 로 돌린다.
+
+  python tempbatch.py precompute data/*.csv                 # 컬럼 캐시 미리 만들기
+  python tempbatch.py suneung 20260122_temp.csv -o suneung.csv
+  python tempbatch.py indicators data/*.csv --out reports -j 8
+  python tempbatch.py ingest 20260122_temp.csv drops/*.csv     # 새 데이터 버전 게시
+  python tempbatch.py watch 20260122_temp.csv ingest/           # 수집 폴더 감시 (대시보드 밖에서)
+
+파일·지점 단위 작업은 프로세스 풀에서 병렬로 돈다 (-j, 기본 CPU 수).
+"""
+import argparse
+import logging
+import os
+import pathlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from tempcore import (
+    COMPACT, NORMAL_BASES, PCT_BASE, EXPORT_FORMATS, ExtremeRules,
+    cache_path, file_stations, load_station, suneung_table,
+    climate_extremes, pct_exceedance, yearly_anomaly, write_export, DataStore, IngestWatcher, INGEST_POLL_S,
+)
+
+def _years(s):
+    """"1991-2020" → (1991, 2020)"""
+    a, b = (int(x) for x in s.split("-"))
+    return (a, b)
+
+def _months(s):
+    return tuple(sorted({int(x) for x in s.split(",")})) if s else ()
+
+def _log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+# ═══════════════════════════════════════════════════════
+#  작업 (작업자 프로세스에서 실행 — 인자·반환값은 pickle 가능해야 한다)
+# ═══════════════════════════════════════════════════════
+def _stations_job(path, compact, force):
+    """파일 하나의 컬럼 캐시를 보장하고 지점 목록을 돌려준다 (캐시가 유효하면 헤더만 읽음)"""
+    if not path.is_file():
+        return [], "파일이 없습니다", False, 0.0
+    cp = cache_path(path, compact)
+    if force:
+        cp.unlink(missing_ok=True)
+    fresh = not cp.exists()
+    t0 = time.perf_counter()
+    stations, err = file_stations(path, compact)
+    return stations, err, fresh and cp.exists(), time.perf_counter() - t0
+
+def indicator_table(df, rules, pct, pct_base, window, normal_base, months=()):
+    """연도별 지표 보고서 — 극값 지표 + 백분위 초과일수 + 평균기온 편차"""
+    v = df.attrs["version"]
+    ext = climate_extremes(v, df, rules, months)
+    pex = pct_exceedance(v, df, pct, pct_base, window, months).drop(columns="유효일수")
+    anom = yearly_anomaly(v, df, "평균기온", normal_base, months).round(2)
+    anom.name = f"평균기온 편차 ({normal_base[0]}~{normal_base[1]})"
+    return pd.concat([ext, pex, anom], axis=1).reset_index()
+
+def _indicator_job(path, station, compact, out_dir, fmt, rules, pct, pct_base, window, normal_base, months):
+    df, err = load_station(path, station, compact)
+    if df is None:
+        return None, err or f"지점 {station} 없음"
+    tbl = indicator_table(df, rules, pct, pct_base, window, normal_base, months)
+    tbl.insert(0, "지점", station)
+    out = out_dir / f"{pathlib.Path(path).stem}_{station}_indicators.{EXPORT_FORMATS[fmt][0]}"
+    with open(out, "wb") as f:
+        write_export([tbl], fmt, f)
+    return str(out), None
+
+# ═══════════════════════════════════════════════════════
+#  명령
+# ═══════════════════════════════════════════════════════
+def _file_stations(pool, files, compact, force=False):
+    """파일별 캐시를 풀에서 병렬로 준비 → {경로: 지점 목록}. 실패한 파일은 로그만 남기고 뺀다."""
+    futs = {pool.submit(_stations_job, f, compact, force): f for f in files}
+    res = {}
+    for fut in as_completed(futs):
+        f = futs[fut]
+        stations, err, fresh, sec = fut.result()
+        if err:
+            _log(f"✗ {f}: {err}")
+            continue
+        _log(f"{'●' if fresh else '○'} {f}: 지점 {len(stations)}개 ({'캐시 생성' if fresh else '캐시 유효'}, {sec:.1f}s)")
+        res[f] = stations
+    return {f: res[f] for f in files if f in res}
+
+def cmd_precompute(args, pool):
+    ok = _file_stations(pool, args.files, args.compact, args.force)
+    return 0 if len(ok) == len(args.files) else 1
+
+def cmd_suneung(args, pool):
+    stations, err = file_stations(args.file, args.compact) if args.file.is_file() else ([], "파일이 없습니다")
+    if not stations:
+        _log(f"✗ {args.file}: {err}")
+        return 1
+    station = args.station if args.station is not None else (108 if 108 in stations else stations[0])
+    df, err = load_station(args.file, station, args.compact)
+    if df is None:
+        _log(f"✗ {args.file}: {err or f'지점 {station} 없음'}")
+        return 1
+    sdf = suneung_table(df.attrs["version"], df, args.normal_base).round(2)
+    sdf.insert(0, "지점", station)
+    if args.output == "-":
+        sdf.to_csv(sys.stdout, index=False)
+    else:
+        with open(args.output, "wb") as f:
+            write_export([sdf], "CSV", f)
+        _log(f"● {args.output}: 수능 {len(sdf)}회 (지점 {station})")
+    return 0
+
+def cmd_indicators(args, pool):
+    out_dir = pathlib.Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rules = ExtremeRules(heat=args.heat, cold=args.cold, tropical=args.tropical,
+                         frost=args.frost, ice=args.ice, gdd_base=args.gdd_base)
+    files = _file_stations(pool, args.files, args.compact)
+    futs = {pool.submit(_indicator_job, f, s, args.compact, out_dir, args.format, rules,
+                        args.pct, args.pct_base, args.window, args.normal_base, args.months): (f, s)
+            for f, stations in files.items() for s in stations
+            if not args.station or s in args.station}
+    n_err = len(args.files) - len(files)
+    for fut in as_completed(futs):
+        f, s = futs[fut]
+        out, err = fut.result()
+        if err:
+            n_err += 1
+            _log(f"✗ {f} 지점 {s}: {err}")
+        else:
+            _log(f"● {out}")
+    return 1 if n_err else 0
+
+def cmd_ingest(args, pool):
+    store = DataStore(args.source, args.compact, args.store)
+    ver, results = store.ingest(args.files)
+    for f, err in results:
+        _log(f"✗ {f}: {err}" if err else f"● {f}")
+    _log(f"→ 데이터 버전 {ver}" if ver else "→ 게시할 파일 없음 (현재 버전 유지)")
+    return 1 if any(err for _, err in results) else 0
+
+def cmd_watch(args, pool):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    w = IngestWatcher(DataStore(args.source, args.compact, args.store), args.dir, args.interval)
+    _log(f"수집 폴더 감시: {args.dir} ({args.interval:g}초 간격, Ctrl+C 로 종료)")
+    w.start()
+    try:
+        while w.is_alive():
+            w.join(1)
+    except KeyboardInterrupt:
+        w.stop()
+    return 0
+
+# ═══════════════════════════════════════════════════════
+#  인자
+# ═══════════════════════════════════════════════════════
+def build_parser():
+    p = argparse.ArgumentParser(prog="tempbatch", description="ASOS 기온 배치 작업 (Streamlit 없이 실행)")
+    p.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="작업자 프로세스 수 (기본: CPU 수)")
+    p.add_argument("--compact", action=argparse.BooleanOptionalAction, default=COMPACT,
+                   help="압축 스키마 캐시 사용 (기본: TEMP_COMPACT 환경변수)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    s = sub.add_parser("precompute", help="CSV 옆에 컬럼 캐시(.cache)를 미리 만든다")
+    s.add_argument("files", nargs="+", type=pathlib.Path)
+    s.add_argument("--force", action="store_true", help="유효한 캐시도 지우고 다시 만든다")
+    s.set_defaults(run=cmd_precompute)
+
+    s = sub.add_parser("suneung", help="수능일 기온·평년 대비 표를 CSV 로")
+    s.add_argument("file", type=pathlib.Path)
+    s.add_argument("--station", type=int, help="지점 번호 (기본: 108 서울, 없으면 첫 지점)")
+    s.add_argument("--normal-base", type=_years, default=None,
+                   help="평년값 기간 예: 1991-2020 (기본: 직전 30년 같은 날 평균)")
+    s.add_argument("-o", "--output", default="-", help="출력 파일 (기본: 표준 출력)")
+    s.set_defaults(run=cmd_suneung)
+
+    s = sub.add_parser("indicators", help="파일·지점마다 연도별 지표 보고서를 만든다")
+    s.add_argument("files", nargs="+", type=pathlib.Path)
+    s.add_argument("--out", default=".", help="출력 폴더")
+    s.add_argument("--format", default="CSV", choices=list(EXPORT_FORMATS))
+    s.add_argument("--station", type=int, action="append", help="이 지점만 (여러 번 지정 가능)")
+    s.add_argument("--months", type=_months, default=(), help="월 필터 예: 6,7,8")
+    d = ExtremeRules()
+    for name, help_ in [("heat", "폭염 최고기온 ≥"), ("cold", "한파 최저기온 ≤"), ("tropical", "열대야 최저기온 ≥"),
+                        ("frost", "서리 최저기온 <"), ("ice", "결빙 최고기온 <"), ("gdd-base", "생장도일 기준온도")]:
+        attr = name.replace("-", "_")
+        s.add_argument(f"--{name}", type=float, default=getattr(d, attr), help=f"{help_} (기본 {getattr(d, attr)})")
+    s.add_argument("--pct", type=int, default=90, help="백분위 (TX{p}p · TN{100-p}p, 기본 90)")
+    s.add_argument("--pct-base", type=_years, default=PCT_BASE, help="백분위 기준 기간 (기본 %d-%d)" % PCT_BASE)
+    s.add_argument("--window", type=int, default=5, help="백분위 표본 창 일수 (기본 5)")
+    s.add_argument("--normal-base", type=_years, default=NORMAL_BASES[-1],
+                   help="편차 평년값 기간 (기본 %d-%d)" % NORMAL_BASES[-1])
+    s.set_defaults(run=cmd_indicators)
+
+    s = sub.add_parser("ingest", help="수집 파일을 검증·병합해 새 데이터 버전을 게시한다")
+    s.add_argument("source", type=pathlib.Path, help="원본 CSV (저장소 기준)")
+    s.add_argument("files", nargs="+", type=pathlib.Path)
+    s.add_argument("--store", type=pathlib.Path, help="저장소 폴더 (기본: <원본>.store)")
+    s.set_defaults(run=cmd_ingest)
+
+    s = sub.add_parser("watch", help="수집 폴더를 감시하며 새 파일을 계속 게시한다")
+    s.add_argument("source", type=pathlib.Path)
+    s.add_argument("dir", type=pathlib.Path)
+    s.add_argument("--store", type=pathlib.Path)
+    s.add_argument("--interval", type=float, default=INGEST_POLL_S, help="폴더 확인 간격 (초)")
+    s.set_defaults(run=cmd_watch)
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        return args.run(args, pool)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""ASOS 기온 파이프라인 벤치마크 — 합성 데이터 생성기 + 단계별 시간·메모리 측정 + 기준 비교.
+
+  python tempbench.py generate synth.csv --stations 10 --years 120
+  python tempbench.py run --sizes quick --out bench.json
+  python tempbench.py run --sizes full --out bench.json --baseline baseline.json --threshold 0.2
+  python tempbench.py compare baseline.json bench.json --threshold 0.2
+
+크기(지점 수 × 연수)마다 새 프로세스에서 측정한다 — memo·페이지 캐시 이외의 상태가 섞이지 않고,
+프로세스 최대 RSS 를 크기별로 따로 잰다. 단계 시간은 --repeat 회 중앙값 (매 회 계산 캐시를 비움),
+단계 메모리는 별도의 한 회를 tracemalloc 으로 돌린 Python·NumPy 힙 최대치다.
+"""
+import argparse
+import json
+import os
+import pathlib
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import tempcore
+from tempcore import (
+    ASOS_STATIONS, NORMAL_BASES, ExtremeRules, TS_CHART_PX, _SNIFF_BYTES, _sniff_encoding, _read_asos_csv,
+    _clean, _f64, cache_path, file_stations, load_station, parse_csv, merge_frames,
+    filter_summary, build_dense, build_day_index, day_percentiles, minmax_positions, build_rollup,
+    rollup_slice, rollup_mean, trend_tables, climate_extremes, pct_exceedance, build_normals,
+    yearly_anomaly, anomaly_trend, suneung_table, write_export,
+)
+
+# ═══════════════════════════════════════════════════════
+#  합성 ASOS 데이터
+# ═══════════════════════════════════════════════════════
+# 기상청 ASOS 일자료 CSV 와 같은 모양 — 한글 헤더, 날짜 앞 탭, CRLF, 지점별 날짜순 블록.
+# 지점·시드가 같으면 항상 같은 바이트가 나온다 (지점마다 독립 난수열).
+HEADER = "날짜,지점,평균기온(℃),최저기온(℃),최고기온(℃)"
+
+def synth_stations(n):
+    """실제 ASOS 지점 번호부터, 모자라면 300 이후 번호를 붙인다"""
+    real = sorted(ASOS_STATIONS)
+    return real[:n] + list(range(300, 300 + max(0, n - len(real))))
+
+def synth_station(stn, start, years, seed=0, gap_rate=0.002, bad_rate=0.0005):
+    """지점 하나의 CSV 본문 (헤더 없음). 반환: (텍스트, 행 수)
+
+    기온 = 지점 기후 + 연주기 + 100년당 1.5℃ 추세 + AR(1) 잡음. 결측은 세 종류로 넣는다 —
+    통째로 빠진 날(연속 구간), 값이 빈 행(",,,"), 값이 "-" 인 행. 날짜를 읽을 수 없는 행도 섞는다."""
+    rng = np.random.default_rng([seed, stn])
+    y0 = start + int(rng.integers(0, max(1, years // 10)))     # 지점마다 관측 시작이 조금씩 다르다
+    d0 = np.datetime64(f"{y0:04d}-01-01")
+    days = np.arange(d0, np.datetime64(f"{start + years:04d}-01-01"))
+    n = len(days)
+    t = (days - np.datetime64("1900-01-01")).astype(np.float64)
+    phase = 2 * np.pi * (t / 365.2425)
+    # AR(1) 잡음 (φ=0.7) — 0.7^40 이후 항은 무시할 만하므로 유한 임펄스 응답 합성곱으로 한 번에
+    noise = np.convolve(rng.normal(0, 1.6, n), 0.7 ** np.arange(40))[:n]
+    clim = float(np.clip(rng.normal(12.5, 2.0), 5, 17))
+    amp = rng.normal(13.0, 2.5)
+    avg = clim - amp * np.cos(phase - 0.35) + 1.5 * t / 36524.25 + noise
+    rngday = 8.5 + 2.0 * np.sin(phase - 1.2) + np.abs(rng.normal(0, 1.5, n))
+    lo, hi = avg - 0.45 * rngday, avg + 0.55 * rngday
+
+    # 빠진 날 — 평균 10일짜리 구간, 드물게 수년 단위 장기 결측
+    miss = np.zeros(n, dtype=bool)
+    for s in rng.integers(0, n, rng.poisson(n * gap_rate / 10)):
+        miss[s:s + int(rng.geometric(1 / 10))] = True
+    if years >= 50 and rng.random() < 0.3:
+        s = int(rng.integers(0, n - 1100))
+        miss[s:s + int(rng.integers(365, 1100))] = True
+    blank = miss & (rng.random(n) < 0.3)        # 빠진 날 일부는 날짜만 있고 값이 빈 행으로
+    dash = blank & (rng.random(n) < 0.1)        # 그중 일부는 "-" 로
+
+    ok = ~miss
+    body = pd.DataFrame({"날짜": np.char.add("\t", np.datetime_as_string(days[ok])),
+                         "지점": stn, "평균": np.round(avg[ok], 1),
+                         "최저": np.round(lo[ok], 1), "최고": np.round(hi[ok], 1)})
+    text = body.to_csv(header=False, index=False, lineterminator="\r\n", float_format="%.1f")
+    extra = [f"\t{d},{stn},{'-' if x else ''},{'-' if x else ''},{'-' if x else ''}\r\n"
+             for d, x in zip(np.datetime_as_string(days[blank]), dash[blank])]
+    bad_dates = ["2001-02-30", "19990101x", "----", "2010/13/01", ""]
+    extra += [f"\t{bad_dates[i % len(bad_dates)]},{stn},1.0,0.0,2.0\r\n"
+              for i in range(rng.binomial(n, bad_rate))]
+    return text + "".join(extra), int(ok.sum()) + len(extra)
+
+def generate(path, n_stations, years, start=1920, seed=0, encoding="cp949", gap_rate=0.002, bad_rate=0.0005):
+    """합성 ASOS CSV 를 path 에 쓴다 (지점별로 스트리밍). 반환: 데이터 행 수"""
+    rows = 0
+    tmp = pathlib.Path(path).with_name(pathlib.Path(path).name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write((HEADER + "\r\n").encode(encoding))     # utf-8-sig 는 BOM 이 함께 붙는다
+        for stn in synth_stations(n_stations):
+            text, n = synth_station(stn, start, years, seed, gap_rate, bad_rate)
+            f.write(text.encode("ascii"))
+            rows += n
+    os.replace(tmp, path)
+    return rows
+
+# ═══════════════════════════════════════════════════════
+#  단계별 측정
+# ═══════════════════════════════════════════════════════
+def _clear_memos():
+    for v in vars(tempcore).values():
+        if callable(getattr(v, "clear", None)) and hasattr(v, "__wrapped__"):
+            v.clear()
+
+def _stages(path, upload):
+    """(단계 이름, 함수) 목록 — 앞 단계 결과를 뒤 단계가 쓰므로 순서대로 실행한다.
+    계산 단계는 대시보드처럼 첫 지점 하나를 대상으로, 앞 단계가 채운 계산 캐시를 그대로 이어 쓴다."""
+    ctx = {}
+    cp = cache_path(path)
+
+    def read_csv():
+        with open(path, "rb") as f:
+            enc, _ = _sniff_encoding(f.read(_SNIFF_BYTES))
+        ctx["raw"] = _read_asos_csv(path, enc)
+
+    def load_cold():
+        cp.unlink(missing_ok=True)
+        ctx["stations"], _ = file_stations(path)
+
+    def load_station_():
+        ctx["df"], _ = load_station(path, ctx["stations"][0])
+
+    def load_all():
+        for s in ctx["stations"]:
+            load_station(path, s)
+
+    def parse_upload():
+        ctx["up"], _ = parse_csv(upload, "upload")
+
+    def merge():
+        ctx["df"], ctx["merge"] = merge_frames(ctx["df"], ctx["up"], "upload")
+
+    def ver():
+        return ctx["df"].attrs["version"]
+
+    def years():
+        return (int(ctx["df"]["연도"].iloc[0]), int(ctx["df"]["연도"].iloc[-1]))
+
+    def filter_():
+        y1 = int(ctx["df"]["연도"].iloc[-1])
+        ctx["fdf"], _ = filter_summary(ver(), ctx["df"], (y1 - 29, y1), (6, 7, 8))
+
+    def downsample():
+        f = ctx["df"]
+        minmax_positions([_f64(f[c]) for c in ("평균기온", "최저기온", "최고기온")], TS_CHART_PX // 2)
+
+    def rollup():
+        cube = build_rollup(ver(), ctx["df"])
+        sub = rollup_slice(cube, years(), None)
+        for by in ("월", "연도", ["연도", "월"]):
+            rollup_mean(sub, by)
+
+    def export():
+        with tempfile.TemporaryFile() as f:
+            write_export([ctx["df"]], "CSV", f)
+
+    return [
+        ("parse.read_csv",          read_csv),
+        ("parse.clean",             lambda: _clean(ctx["raw"].copy(deep=False))),
+        ("load.cold",               load_cold),
+        ("load.stations_warm",      lambda: file_stations(path)),
+        ("load.station_warm",       load_station_),
+        ("load.all_stations_warm",  load_all),
+        ("merge.parse_upload",      parse_upload),
+        ("merge.frames",            merge),
+        ("filter.summary",          filter_),
+        ("dense.build",             lambda: build_dense(ver(), ctx["df"])),
+        ("tab.compare.day_index",   lambda: build_day_index(ver(), ctx["df"])),
+        ("tab.compare.percentiles", lambda: [day_percentiles(ver(), ctx["df"], c, p)
+                                             for c, p in (("최고기온", 90), ("최저기온", 10))]),
+        ("tab.timeseries.downsample", downsample),
+        ("tab.monthly.rollup",      rollup),
+        ("tab.monthly.trend",       lambda: trend_tables(ver(), ctx["df"], "평균기온", years())),
+        ("tab.climate.extremes",    lambda: climate_extremes(ver(), ctx["df"], ExtremeRules())),
+        ("tab.climate.pct_exceedance", lambda: pct_exceedance(ver(), ctx["df"], 90)),
+        ("tab.climate.normals",     lambda: build_normals(ver(), ctx["df"], NORMAL_BASES[-1])),
+        ("tab.climate.anomaly",     lambda: yearly_anomaly(ver(), ctx["df"], "평균기온", NORMAL_BASES[-1])),
+        ("tab.climate.anomaly_trend", lambda: anomaly_trend(ver(), ctx["df"], "평균기온", NORMAL_BASES[-1], years())),
+        ("tab.suneung.table",       lambda: suneung_table(ver(), ctx["df"])),
+        ("tab.raw.export_csv",      export),
+    ]
+
+def _measure(path, upload, repeat):
+    """작업자 프로세스에서 실행 — {단계: {seconds, min, peak_mb}}, 최대 RSS(MB)"""
+    times = {}
+    for _ in range(repeat):
+        _clear_memos()
+        for name, fn in _stages(path, upload):
+            t0 = time.perf_counter()
+            fn()
+            times.setdefault(name, []).append(time.perf_counter() - t0)
+    peaks = {}
+    _clear_memos()
+    tracemalloc.start()
+    for name, fn in _stages(path, upload):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        peaks[name] = (tracemalloc.get_traced_memory()[1] - base) / 2**20
+    tracemalloc.stop()
+    stages = {k: {"seconds": float(np.median(v)), "min": float(min(v)), "peak_mb": round(peaks[k], 2)}
+              for k, v in times.items()}
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    return stages, round(rss, 1)
+
+# ═══════════════════════════════════════════════════════
+#  실행 · 비교
+# ═══════════════════════════════════════════════════════
+SIZE_PRESETS = {
+    "quick": "1x100,10x100",
+    "full":  "1x100,10x100,100x100,500x100",
+}
+
+def _sizes(s):
+    return [tuple(int(v) for v in x.split("x")) for x in SIZE_PRESETS.get(s, s).split(",")]
+
+def run(sizes, workdir, repeat=3, seed=0, encoding="cp949", log=print):
+    """크기마다 데이터를 (없으면) 만들고 새 프로세스에서 측정 → 결과 dict"""
+    workdir = pathlib.Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    for n_st, n_yr in sizes:
+        tag = f"s{n_st}_y{n_yr}_seed{seed}_{encoding}"
+        path, upload = workdir / f"{tag}.csv", workdir / f"{tag}_upload.csv"
+        if not path.exists():
+            t0 = time.perf_counter()
+            rows = generate(path, n_st, n_yr, seed=seed, encoding=encoding)
+            log(f"  생성 {path.name}: {rows:,}행 ({time.perf_counter() - t0:.1f}s)")
+        if not upload.exists():
+            # 업로드 — 첫 지점의 마지막 5년과 그 뒤 1년 (겹침·새 날짜 모두 생김), 다른 시드, 결측 없음
+            generate(upload, 1, 6, start=1920 + n_yr - 5, seed=seed + 1, encoding=encoding, gap_rate=0, bad_rate=0)
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            stages, rss = pool.submit(_measure, path, upload, repeat).result()
+        results.append({"stations": n_st, "years": n_yr, "file_mb": round(path.stat().st_size / 2**20, 1),
+                        "max_rss_mb": rss, "stages": stages})
+        log(f"  {n_st}지점 × {n_yr}년: 최대 RSS {rss:,.0f}MB")
+    return {
+        "meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "numpy": np.__version__, "pandas": pd.__version__, "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "repeat": repeat, "seed": seed, "encoding": encoding},
+        "results": results,
+    }
+
+def compare(base, cur, threshold=0.2, min_seconds=0.005, min_mb=1.0):
+    """같은 크기·단계끼리 비교 → 회귀 목록 [(크기, 단계, 지표, 기준, 현재, 비율)].
+    기준 대비 threshold 넘게 느려지거나 커진 것만 — 아주 작은 값은 잡음이라 절대 하한으로 거른다."""
+    idx = {(r["stations"], r["years"]): r for r in base["results"]}
+    out = []
+    for r in cur["results"]:
+        b = idx.get((r["stations"], r["years"]))
+        if b is None:
+            continue
+        size = f"{r['stations']}x{r['years']}"
+        pairs = [(k, "seconds", v["seconds"], b["stages"][k]["seconds"], min_seconds)
+                 for k, v in r["stages"].items() if k in b["stages"]]
+        pairs += [(k, "peak_mb", v["peak_mb"], b["stages"][k]["peak_mb"], min_mb)
+                  for k, v in r["stages"].items() if k in b["stages"]]
+        pairs.append(("(process)", "max_rss_mb", r["max_rss_mb"], b["max_rss_mb"], min_mb))
+        for stage, metric, now, was, floor in pairs:
+            if now > was * (1 + threshold) and now - was > floor:
+                out.append((size, stage, metric, was, now, now / was if was else float("inf")))
+    return out
+
+def _report(regs, threshold):
+    if not regs:
+        print(f"회귀 없음 (기준 대비 +{threshold:.0%} 이내)")
+        return 0
+    print(f"회귀 {len(regs)}건 (기준 대비 +{threshold:.0%} 초과):")
+    for size, stage, metric, was, now, ratio in regs:
+        print(f"  {size:>8}  {stage:<28} {metric:<10} {was:10.4f} → {now:10.4f}  ×{ratio:.2f}")
+    return 1
+
+def _print_table(res):
+    for r in res["results"]:
+        print(f"\n{r['stations']}지점 × {r['years']}년  (CSV {r['file_mb']}MB, 최대 RSS {r['max_rss_mb']}MB)")
+        for k, v in r["stages"].items():
+            print(f"  {k:<28} {v['seconds'] * 1000:10.1f} ms   {v['peak_mb']:8.1f} MB")
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="tempbench", description="ASOS 기온 파이프라인 벤치마크")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    s = sub.add_parser("generate", help="합성 ASOS CSV 생성")
+    s.add_argument("out", type=pathlib.Path)
+    s.add_argument("--stations", type=int, default=1)
+    s.add_argument("--years", type=int, default=100)
+    s.add_argument("--start", type=int, default=1920)
+    s.add_argument("--seed", type=int, default=0)
+    s.add_argument("--encoding", default="cp949", choices=["cp949", "euc-kr", "utf-8", "utf-8-sig"])
+    s.add_argument("--gap-rate", type=float, default=0.002, help="결측일 비율 (대략)")
+    s.add_argument("--bad-rate", type=float, default=0.0005, help="날짜를 읽을 수 없는 행 비율")
+
+    s = sub.add_parser("run", help="크기별 단계 시간·메모리 측정")
+    s.add_argument("--sizes", default="quick",
+                   help="지점x연수 목록 (예: 1x100,50x120) 또는 " + "/".join(SIZE_PRESETS))
+    s.add_argument("--repeat", type=int, default=3)
+    s.add_argument("--seed", type=int, default=0)
+    s.add_argument("--encoding", default="cp949", choices=["cp949", "euc-kr", "utf-8", "utf-8-sig"])
+    s.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "tempbench"),
+                   help="합성 데이터 폴더 (같은 크기·시드면 다시 쓴다)")
+    s.add_argument("--out", default="bench.json")
+    s.add_argument("--baseline", help="이 결과와 비교해 회귀가 있으면 종료 코드 1")
+    s.add_argument("--threshold", type=float, default=0.2)
+
+    s = sub.add_parser("compare", help="두 결과 파일 비교")
+    s.add_argument("baseline")
+    s.add_argument("current")
+    s.add_argument("--threshold", type=float, default=0.2)
+
+    args = p.parse_args(argv)
+    if args.cmd == "generate":
+        rows = generate(args.out, args.stations, args.years, args.start, args.seed, args.encoding,
+                        args.gap_rate, args.bad_rate)
+        print(f"{args.out}: {rows:,}행")
+        return 0
+    if args.cmd == "run":
+        res = run(_sizes(args.sizes), args.workdir, args.repeat, args.seed, args.encoding)
+        pathlib.Path(args.out).write_text(json.dumps(res, ensure_ascii=False, indent=1), encoding="utf-8")
+        _print_table(res)
+        print(f"\n→ {args.out}")
+        if args.baseline:
+            base = json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8"))
+            return _report(compare(base, res, args.threshold), args.threshold)
+        return 0
+    base, cur = (json.loads(pathlib.Path(f).read_text(encoding="utf-8")) for f in (args.baseline, args.current))
+    return _report(compare(base, cur, args.threshold), args.threshold)
+
+if __name__ == "__main__":
+    sys.exit(main())
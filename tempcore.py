@@ -0,0 +1,1741 @@
+"""ASOS 기온 데이터 로드·계산 계층 — Streamlit·Plotly 없이 import 해서 쓴다.
+
+main.py(대시보드)와 tempbatch.py(배치 CLI)가 함께 쓴다. 계산 결과는 memo 로 프로세스 안에서 공유된다.
+"""
+import pandas as pd
+import numpy as np
+import codecs
+import os
+import pathlib
+import json
+import hashlib
+import math
+import struct
+import tempfile
+import shutil
+import gzip
+import threading
+import inspect
+import functools
+import copy
+import contextlib
+import contextvars
+import time
+import io
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:        # Parquet / Arrow 내보내기는 pyarrow 가 있을 때만
+    pa = pq = None
+try:
+    import fcntl
+except ImportError:        # Windows — 프로세스 간 수집 잠금 없이 (스레드 잠금만)
+    fcntl = None
+
+# 캐시된 데이터프레임은 모든 사용자가 같은 객체를 읽기만 한다 — pandas 2.x 에서도 Copy-on-Write 로
+# (3.x 는 항상 켜져 있음) 호출한 쪽의 변경은 항상 사본에만 일어나게 한다
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# ═══════════════════════════════════════════════════════
+#  계측 (선택)
+# ═══════════════════════════════════════════════════════
+# 이름 붙은 구간(span)의 시간·RSS 변화와 캐시 적중을 실행(rerun) 단위 Trace 에 모은다.
+# 기록 중인 Trace 가 없으면 span() 은 미리 만든 빈 컨텍스트를 돌려줄 뿐이라, 꺼져 있을 때의
+# 비용은 ContextVar 조회 한 번이다. 캐시 적중 수(CACHE_STATS)는 켜짐과 무관하게 프로세스 누적으로 센다.
+# TEMP_PROFILE_LOG 를 지정하면 닫힌 Trace 마다 JSON 한 줄을 그 파일에 덧붙인다 (세션 간 집계용).
+PROFILE_LOG = os.environ.get("TEMP_PROFILE_LOG")
+
+_active = contextvars.ContextVar("temp_trace", default=None)
+_NULL = contextlib.nullcontext()
+_stats_lock = threading.Lock()
+CACHE_STATS = {}       # 캐시 이름 → [적중, 미스]   (프로세스 누적)
+SPAN_STATS = {}        # 구간 이름 → [횟수, 합계 s, 최대 s]
+try:
+    _PAGE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE = None
+
+def _rss_mb():
+    # 현재 RSS — /proc 이 없는 환경에서는 None (RSS 변화 없이 시간만 기록)
+    if _PAGE is None:
+        return None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE / 2**20
+    except OSError:
+        return None
+
+class Trace:
+    """실행 하나의 계측 기록. spans: [이름, 깊이, 시작 s, 소요 s, RSS 변화 MB] (시작 순)"""
+    def __init__(self, label, meta=None):
+        self.label, self.meta = label, dict(meta or {})
+        self.spans, self.cache, self.depth = [], {}, 0
+        self.total = None
+        self.rss0 = _rss_mb()
+        self.t0 = time.perf_counter()
+
+    def to_dict(self):
+        rss = _rss_mb()
+        return {"label": self.label, "time": time.time(), "total_s": self.total, **self.meta,
+                "rss_mb": rss, "rss_delta_mb": None if rss is None or self.rss0 is None else rss - self.rss0,
+                "spans": [dict(zip(("name", "depth", "start_s", "seconds", "rss_delta_mb"), s)) for s in self.spans],
+                "cache": {k: {"hit": h, "miss": m} for k, (h, m) in self.cache.items()}}
+
+class _Span:
+    __slots__ = ("tr", "name", "i", "t0", "rss0")
+
+    def __init__(self, tr, name):
+        self.tr, self.name = tr, name
+
+    def __enter__(self):
+        tr = self.tr
+        self.i = len(tr.spans)
+        tr.spans.append(None)          # 자리만 잡아 두고 끝날 때 채운다 — 목록이 시작 순서가 되게
+        tr.depth += 1
+        self.rss0 = _rss_mb()
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter()
+        tr = self.tr
+        tr.depth -= 1
+        rss = _rss_mb()
+        tr.spans[self.i] = [self.name, tr.depth, self.t0 - tr.t0, t1 - self.t0,
+                            None if rss is None or self.rss0 is None else rss - self.rss0]
+        return False
+
+def span(name):
+    """with span("이름"): … — 기록 중일 때만 시간·RSS 를 잰다"""
+    tr = _active.get()
+    return _NULL if tr is None else _Span(tr, name)
+
+def cache_event(name, hit):
+    with _stats_lock:
+        s = CACHE_STATS.setdefault(name, [0, 0])
+        s[0 if hit else 1] += 1
+    tr = _active.get()
+    if tr is not None:
+        s = tr.cache.setdefault(name, [0, 0])
+        s[0 if hit else 1] += 1
+
+def begin_trace(label, enabled=True, **meta):
+    """이 스레드(세션 실행)의 기록 시작 → Trace, enabled 가 거짓이면 None (이전 기록도 끊는다)"""
+    tr = Trace(label, meta) if enabled else None
+    _active.set(tr)
+    return tr
+
+def end_trace(tr):
+    """기록을 닫고 프로세스 누적 통계·로그 파일에 반영 → dict (tr 이 None 이면 None)"""
+    if tr is None:
+        return None
+    if _active.get() is tr:
+        _active.set(None)
+    tr.total = time.perf_counter() - tr.t0
+    rec = tr.to_dict()
+    with _stats_lock:
+        for name, _, _, dt, _ in [[tr.label, 0, 0, tr.total, None]] + [s for s in tr.spans if s]:
+            s = SPAN_STATS.setdefault(name, [0, 0.0, 0.0])
+            s[0] += 1; s[1] += dt; s[2] = max(s[2], dt)
+        if PROFILE_LOG:
+            try:
+                with open(PROFILE_LOG, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+    return rec
+
+@contextlib.contextmanager
+def run_span(label, enabled=True, sink=None, **meta):
+    """기록 중인 실행 안에서는 span, 단독 실행(예: fragment 만 다시 실행)에서는 그 자체로 Trace 하나.
+    단독 Trace 가 닫히면 sink(dict) 를 부른다."""
+    if _active.get() is not None:
+        with span(label):
+            yield
+        return
+    tr = begin_trace(label, enabled, **meta)
+    try:
+        yield
+    finally:
+        rec = end_trace(tr)
+        if rec is not None and sink is not None:
+            sink(rec)
+
+def metrics_snapshot():
+    """프로세스 누적 캐시 적중·구간 통계 (내보내기용 dict)"""
+    with _stats_lock:
+        return {"cache": {k: {"hit": h, "miss": m} for k, (h, m) in CACHE_STATS.items()},
+                "spans": {k: {"count": n, "total_s": t, "max_s": mx} for k, (n, t, mx) in SPAN_STATS.items()}}
+
+# ═══════════════════════════════════════════════════════
+#  계산 결과 캐시
+# ═══════════════════════════════════════════════════════
+# st.cache_* 와 같은 규칙 — 이름이 _ 로 시작하는 인자(프레임 등)는 키에서 빼고, 함께 넘기는
+# 데이터 버전 문자열이 그 자리를 대신한다. 프로세스 하나 안에서 LRU 로 공유된다
+# (대시보드에서는 모든 세션, 배치 CLI 에서는 작업자 프로세스 하나).
+# shared=True 결과는 공유 객체이므로 읽기만 하고 (st.cache_resource), False 면 호출마다 사본 (st.cache_data).
+_MISS = object()
+
+def memo(maxsize, shared=True):
+    def deco(fn):
+        sig = inspect.signature(fn)
+        store, lock = OrderedDict(), threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple((k, v) for k, v in bound.arguments.items() if not k.startswith("_"))
+            with lock:
+                hit = store.get(key, _MISS)
+                if hit is not _MISS:
+                    store.move_to_end(key)
+            cache_event(fn.__name__, hit is not _MISS)
+            if hit is _MISS:
+                # 계산은 잠금 밖에서 — 같은 키가 동시에 들어오면 두 번 계산될 뿐 결과는 같다
+                with span(f"calc.{fn.__name__}"):
+                    hit = fn(*args, **kwargs)
+                with lock:
+                    store[key] = hit
+                    while len(store) > maxsize:
+                        store.popitem(last=False)
+            return hit if shared else copy.deepcopy(hit)
+
+        def clear():
+            with lock:
+                store.clear()
+        wrapper.clear = clear
+        return wrapper
+    return deco
+
+# ═══════════════════════════════════════════════════════
+#  수능 날짜 데이터 (시행연도 기준 1993~2025)
+# ═══════════════════════════════════════════════════════
+SUNEUNG = {
+    "1994학년도 1차": ("1993-08-20", "첫 수능 1차 (여름)"),
+    "1994학년도 2차": ("1993-11-16", "첫 수능 2차"),
+    "1995학년도":    ("1994-11-23", ""),
+    "1996학년도":    ("1995-11-22", ""),
+    "1997학년도":    ("1996-11-13", "역대 최악 불수능"),
+    "1998학년도":    ("1997-11-19", "IMF 발표 당일"),
+    "1999학년도":    ("1998-11-18", "최초 만점자 배출"),
+    "2000학년도":    ("1999-11-17", ""),
+    "2001학년도":    ("2000-11-15", "최대 물수능, 만점자 66명"),
+    "2002학년도":    ("2001-11-07", "불수능"),
+    "2003학년도":    ("2002-11-06", ""),
+    "2004학년도":    ("2003-11-05", ""),
+    "2005학년도":    ("2004-11-17", ""),
+    "2006학년도":    ("2005-11-23", ""),
+    "2007학년도":    ("2006-11-16", ""),
+    "2008학년도":    ("2007-11-15", ""),
+    "2009학년도":    ("2008-11-13", ""),
+    "2010학년도":    ("2009-11-12", ""),
+    "2011학년도":    ("2010-11-18", "G20으로 1주 연기"),
+    "2012학년도":    ("2011-11-10", ""),
+    "2013학년도":    ("2012-11-08", "이상 고온"),
+    "2014학년도":    ("2013-11-07", ""),
+    "2015학년도":    ("2014-11-13", ""),
+    "2016학년도":    ("2015-11-12", ""),
+    "2017학년도":    ("2016-11-17", ""),
+    "2018학년도":    ("2017-11-23", "포항 지진으로 1주 연기"),
+    "2019학년도":    ("2018-11-15", ""),
+    "2020학년도":    ("2019-11-14", ""),
+    "2021학년도":    ("2020-12-03", "COVID-19로 12월 연기"),
+    "2022학년도":    ("2021-11-18", ""),
+    "2023학년도":    ("2022-11-17", ""),
+    "2024학년도":    ("2023-11-16", ""),
+    "2025학년도":    ("2024-11-14", "이상 고온"),
+    "2026학년도":    ("2025-11-13", "이상 고온"),
+}
+
+# ═══════════════════════════════════════════════════════
+#  ASOS 지점 (지점번호 → 이름)
+# ═══════════════════════════════════════════════════════
+ASOS_STATIONS = {
+    90: "속초", 93: "북춘천", 95: "철원", 98: "동두천", 99: "파주", 100: "대관령", 101: "춘천",
+    102: "백령도", 104: "북강릉", 105: "강릉", 106: "동해", 108: "서울", 112: "인천", 114: "원주",
+    115: "울릉도", 119: "수원", 121: "영월", 127: "충주", 129: "서산", 130: "울진", 131: "청주",
+    133: "대전", 135: "추풍령", 136: "안동", 137: "상주", 138: "포항", 140: "군산", 143: "대구",
+    146: "전주", 152: "울산", 155: "창원", 156: "광주", 159: "부산", 162: "통영", 165: "목포",
+    168: "여수", 169: "흑산도", 170: "완도", 172: "고창", 174: "순천", 177: "홍성", 184: "제주",
+    185: "고산", 188: "성산", 189: "서귀포", 192: "진주", 201: "강화", 202: "양평", 203: "이천",
+    211: "인제", 212: "홍천", 216: "태백", 217: "정선군", 221: "제천", 226: "보은", 232: "천안",
+    235: "보령", 236: "부여", 238: "금산", 239: "세종", 243: "부안", 244: "임실", 245: "정읍",
+    247: "남원", 248: "장수", 251: "고창군", 252: "영광군", 253: "김해시", 254: "순창군",
+    255: "북창원", 257: "양산시", 258: "보성군", 259: "강진군", 260: "장흥", 261: "해남",
+    262: "고흥", 263: "의령군", 264: "함양군", 266: "광양시", 268: "진도군", 271: "봉화",
+    272: "영주", 273: "문경", 276: "청송군", 277: "영덕", 278: "의성", 279: "구미", 281: "영천",
+    283: "경주시", 284: "거창", 285: "합천", 288: "밀양", 289: "산청", 294: "거제", 295: "남해",
+}
+
+def station_name(stn):
+    return ASOS_STATIONS.get(int(stn), f"지점 {stn}")
+
+def station_label(stn):
+    return f"{station_name(stn)} ({stn})"
+# ═══════════════════════════════════════════════════════
+#  데이터 로드
+# ═══════════════════════════════════════════════════════
+# 압축 스키마 기본값 (아래 "압축 스키마" 절) — 캐시 파일도 스키마별로 따로 둔다
+COMPACT = os.environ.get("TEMP_COMPACT", "").lower() not in ("", "0", "false", "no")
+
+# 컬럼형 바이너리 캐시 — CSV 옆에 저장, 원본의 크기·mtime·해시가 같으면 재파싱 없이 memmap 으로 로드.
+# 컬럼을 메모리상 dtype 그대로 저장하므로 프레임이 memmap 위에 복사 없이 올라가고,
+# 같은 호스트의 모든 워커 프로세스가 OS 페이지 캐시의 같은 페이지를 공유한다.
+_CACHE_MAGIC  = b"TEMPCOL\0"
+_CACHE_FORMAT = 5          # 레이아웃이 바뀌면 올려서 기존 캐시를 무효화
+_CACHE_ALIGN  = 64
+_TEMP_COLS    = ["평균기온","최저기온","최고기온"]
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _source_key(path):
+    stt = path.stat()
+    return {"size": stt.st_size, "mtime_ns": stt.st_mtime_ns, "sha256": _file_sha256(path)}
+
+def _aligned(n):
+    return -(-n // _CACHE_ALIGN) * _CACHE_ALIGN
+
+def _write_column_cache(df, path, source):
+    # df 는 (지점, 날짜) 순 정렬 — 지점별 행이 연속 구간(파티션)이 되고, 헤더에 지점 → [시작, 끝) 기록.
+    # 컬럼은 프레임의 dtype 그대로 (category 는 코드 배열 + 헤더의 범주 목록)
+    stn = np.asarray(df["지점"])
+    uniq, starts = np.unique(stn, return_index=True)
+    bounds = np.r_[starts, len(df)]
+    parts = {str(int(s)): [int(bounds[i]), int(bounds[i + 1])] for i, s in enumerate(uniq)}
+
+    cols = []
+    for name in df.columns:
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            cols.append((name, df[name].cat.codes.to_numpy(), df[name].cat.categories.tolist()))
+        else:
+            cols.append((name, df[name].to_numpy(), None))
+
+    # 각 컬럼 오프셋은 헤더 뒤 (64바이트 정렬된) 데이터 영역 시작 기준
+    meta, offset = [], 0
+    for name, arr, categories in cols:
+        meta.append({"name": name, "dtype": arr.dtype.str, "offset": offset, "categories": categories})
+        offset += _aligned(arr.nbytes)
+    header = json.dumps({
+        "format": _CACHE_FORMAT, "source": source, "rows": len(df), "partitions": parts,
+        "compact": bool(df.attrs.get("compact")), "columns": meta,
+        "encoding": df.attrs.get("encoding"), "encoding_reason": df.attrs.get("encoding_reason"),
+        "dropped_days": df.attrs.get("dropped_days", {}),
+        "dropped_bad_date": df.attrs.get("dropped_bad_date", 0),
+    }).encode("utf-8")
+    head_len = len(_CACHE_MAGIC) + 4 + len(header)
+
+    # 같은 폴더에 임시 파일로 쓴 뒤 교체 → 읽는 쪽은 항상 완전한 파일만 본다
+    try:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    except OSError:
+        return      # 읽기 전용 배포 환경 등 — 캐시 없이도 동작해야 하므로 조용히 넘어간다
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_CACHE_MAGIC + struct.pack("<I", len(header)) + header)
+            f.write(b"\0" * (_aligned(head_len) - head_len))
+            for _, arr, _ in cols:
+                f.write(np.ascontiguousarray(arr).tobytes())
+                f.write(b"\0" * (_aligned(arr.nbytes) - arr.nbytes))
+        os.replace(tmp, path)
+    except OSError:
+        pathlib.Path(tmp).unlink(missing_ok=True)
+
+def _cache_header(path, source_path, compact=COMPACT):
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+                return None
+            (hlen,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(hlen).decode("utf-8"))
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get("format") != _CACHE_FORMAT or not header["rows"]:
+        return None
+    if compact is not None and header["compact"] != compact:
+        return None
+
+    # 크기·mtime 이 같으면 바로 사용, mtime 만 바뀐 경우(복사·체크아웃)는 해시로 확인.
+    # source_path 가 None 이면 원본이 없는 불변 캐시 (수집 저장소의 데이터 버전) — 확인 없이 사용
+    if source_path is not None:
+        src, stt = header["source"], source_path.stat()
+        if src["size"] != stt.st_size:
+            return None
+        if src["mtime_ns"] != stt.st_mtime_ns:
+            if src["sha256"] != _file_sha256(source_path):
+                return None
+            # 내용은 같다 — 헤더의 mtime 을 갱신해 두지 않으면 매번 전체 파일을 다시 해시한다
+            header["source"] = {**src, "mtime_ns": stt.st_mtime_ns}
+            hlen = _rewrite_cache_header(path, header, hlen)
+    header["data_start"] = _aligned(len(_CACHE_MAGIC) + 4 + hlen)
+    return header
+
+def _rewrite_cache_header(path, header, old_hlen):
+    """헤더만 바꾼 캐시를 임시 파일로 쓰고 교체한다. 컬럼 오프셋은 데이터 영역 기준이라
+    헤더 길이가 달라져도 데이터는 그대로 복사하면 된다. 새(실패하면 기존) 헤더 길이를 돌려준다."""
+    new = json.dumps(header).encode("utf-8")
+    # 짧으면 공백으로 채워 길이를 유지 — 이전 헤더로 data_start 를 계산한 다른 워커도 그대로 읽는다
+    new += b" " * max(old_hlen - len(new), 0)
+    head_len = len(_CACHE_MAGIC) + 4 + len(new)
+    try:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    except OSError:
+        return old_hlen
+    try:
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as f:
+            src.seek(_aligned(len(_CACHE_MAGIC) + 4 + old_hlen))
+            f.write(_CACHE_MAGIC + struct.pack("<I", len(new)) + new)
+            f.write(b"\0" * (_aligned(head_len) - head_len))
+            shutil.copyfileobj(src, f, 1 << 20)
+        os.replace(tmp, path)
+    except OSError:
+        pathlib.Path(tmp).unlink(missing_ok=True)
+        return old_hlen
+    return len(new)
+
+def _read_column_cache(path, source_path, station, compact=COMPACT):
+    header = _cache_header(path, source_path, compact)
+    if header is None or str(station) not in header["partitions"]:
+        return None
+    # 선택한 지점의 구간만 memmap — 다른 지점 데이터는 읽지 않고, 읽는 부분도 복사하지 않는다
+    i0, i1 = header["partitions"][str(station)]
+    cols = {}
+    for m in header["columns"]:
+        dt = np.dtype(m["dtype"])
+        arr = np.memmap(path, dtype=dt, mode="r",
+                        offset=header["data_start"] + m["offset"] + i0 * dt.itemsize, shape=(i1 - i0,))
+        cols[m["name"]] = (arr if m["categories"] is None
+                           else pd.Categorical.from_codes(arr, categories=m["categories"]))
+    df = pd.DataFrame(cols, copy=False)
+    df.attrs["version"]  = _part_version(header["source"]["sha256"][:16], station)
+    df.attrs["encoding"] = header.get("encoding")
+    df.attrs["encoding_reason"] = header.get("encoding_reason")
+    df.attrs["dropped_days"] = {str(station): header["dropped_days"].get(str(station), [])}
+    df.attrs["dropped_bad_date"] = header["dropped_bad_date"]
+    if header["compact"]:
+        df.attrs["compact"] = True
+    return df
+
+def _part_version(version, station):
+    return f"{version}-{station}"
+
+
+def cache_path(path, compact=COMPACT):
+    """원본 CSV 옆 컬럼 캐시 경로 — 압축 스키마는 파일을 따로 둔다"""
+    path = pathlib.Path(path)
+    return path.with_name(path.name + (".compact" if compact else "") + ".cache")
+
+def parse_csv(src, version, compact=COMPACT):
+    """ASOS CSV(경로 또는 바이너리 파일 객체) 전체 파싱 → (프레임, None) 또는 (None, 오류 메시지)"""
+    if hasattr(src, "read"):
+        src.seek(0)
+        prefix = src.read(_SNIFF_BYTES)
+        src.seek(0)
+    else:
+        with open(src, "rb") as f:
+            prefix = f.read(_SNIFF_BYTES)
+    enc, reason = _sniff_encoding(prefix)
+    if enc is None:
+        return None, f"파일 인코딩을 인식할 수 없습니다. ({reason})"
+    try:
+        with span("csv.read"):
+            raw = _read_asos_csv(src, enc)
+        with span("csv.clean"):
+            df = _clean(raw)
+    except (UnicodeDecodeError, pd.errors.ParserError) as e:
+        return None, f"CSV를 읽지 못했습니다 — 인코딩 {enc} ({reason}): {e}"
+    df.attrs["encoding"], df.attrs["encoding_reason"] = enc, reason
+    df.attrs["version"] = version
+    return (compact_frame(df) if compact else df), None
+
+def parse_file(path, compact=COMPACT):
+    # 캐시가 없거나 원본이 바뀐 경우에만 CSV 전체 파싱 (파싱 전에 원본 키를 잡아 둔다).
+    # 전체 프레임은 붙잡아 두지 않는다 — 캐시를 쓸 수 없는 환경에서만 지점마다 한 번씩 다시 파싱.
+    path = pathlib.Path(path)
+    with span("cache.source_key"):
+        source = _source_key(path)
+    df, err = parse_csv(path, source["sha256"][:16], compact)
+    if df is not None:
+        with span("cache.write"):
+            _write_column_cache(df, cache_path(path, compact), source)
+    return df, err
+
+def file_stations(path, compact=COMPACT):
+    """파일의 지점 목록 — 캐시가 유효하면 헤더만 읽고, 아니면 파싱하면서 캐시를 만든다. (목록, 오류)"""
+    path = pathlib.Path(path)
+    header = _cache_header(cache_path(path, compact), path, compact)
+    if header is not None:
+        return sorted(int(s) for s in header["partitions"]), None
+    df, err = parse_file(path, compact)
+    return ([], err) if df is None else (sorted(int(s) for s in df["지점"].unique()), None)
+
+def load_station(path, station, compact=COMPACT):
+    """한 지점 프레임 — 캐시 파티션을 memmap 하고, 캐시를 쓸 수 없으면 전체를 파싱해 잘라 낸다. (프레임, 오류)"""
+    path = pathlib.Path(path)
+    with span("cache.read"):
+        df = _read_column_cache(cache_path(path, compact), path, station, compact)
+    if df is not None:
+        return df, None
+    full, err = parse_file(path, compact)
+    if full is None or station not in full["지점"].values:
+        return None, err
+    return station_partition(full.attrs["version"], full, station), None
+
+def station_partition(version, df, station):
+    # (지점, 날짜) 순 정렬된 프레임에서 한 지점의 연속 구간만 잘라 낸다
+    stn = df["지점"].to_numpy()
+    i0, i1 = np.searchsorted(stn, station), np.searchsorted(stn, station, side="right")
+    part = df.iloc[i0:i1].reset_index(drop=True)
+    part.attrs = {**df.attrs, "version": _part_version(version, station),
+                  "dropped_days": {str(station): df.attrs.get("dropped_days", {}).get(str(station), [])}}
+    return part
+
+# 인코딩은 앞부분 일부 바이트만 보고 한 번에 결정 → 파일 전체는 pandas 가 스트리밍 디코딩하며 한 번만 파싱
+_SNIFF_BYTES = 64 * 1024
+
+def _sniff_encoding(prefix):
+    if prefix.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig", "UTF-8 BOM"
+    if prefix.isascii():
+        return "utf-8", f"앞 {len(prefix):,}바이트가 모두 ASCII"
+    # 잘린 멀티바이트 문자가 끝에 걸려도 실패하지 않도록 final=False 로 점진 디코딩
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8", f"앞 {len(prefix):,}바이트가 UTF-8 로 유효"
+    except UnicodeDecodeError as e:
+        utf8_err = e.start
+    # CP949 는 EUC-KR 의 상위 집합 — 기상청 자료 기본 인코딩
+    try:
+        codecs.getincrementaldecoder("cp949")().decode(prefix, final=False)
+        return "cp949", f"UTF-8 아님(오프셋 {utf8_err}), 앞 {len(prefix):,}바이트가 CP949/EUC-KR 로 유효"
+    except UnicodeDecodeError as e:
+        return None, f"UTF-8(오프셋 {utf8_err})·CP949(오프셋 {e.start}) 모두 디코딩 실패"
+
+def _read_asos_csv(src, enc):
+    return pd.read_csv(
+        src, encoding=enc, header=0,
+        names=["날짜","지점","평균기온","최저기온","최고기온"],
+        skipinitialspace=True,
+    )
+
+
+# 겹치는 날짜 처리 규칙 — 예전 concat+drop_duplicates 는 암묵적으로 "기존 데이터 우선"이었다
+CONFLICT_RULES = {"기존 데이터 우선": "base", "업로드 데이터 우선": "upload"}
+
+def dedupe_dates(up, rule):
+    """한 업로드 안에서 같은 날짜가 여러 번 나오면 rule 로 하나만 남긴다 — "upload" 는 파일에서
+    나중 행(정정분), "base" 는 먼저 나온 행. (프레임, 중복 행 수, 그중 값이 다른 행 수)를 돌려준다."""
+    extra = up["날짜"].duplicated(keep="last" if rule == "upload" else "first").to_numpy()
+    if not extra.any():
+        return up, 0, 0
+    vals = np.column_stack([_f64(up[c]) for c in _TEMP_COLS])
+    # 같은 날짜 묶음 안에서 남는 행과 값이 다른 버려진 행 — _clean 이 안정 정렬이라 파일 순서가 유지된다
+    keep_vals = pd.DataFrame(vals[~extra], index=up["날짜"].to_numpy()[~extra])
+    n_diff = int((keep_vals.loc[up["날짜"].to_numpy()[extra]].to_numpy() != vals[extra]).any(axis=1).sum())
+    out = up[~extra].reset_index(drop=True)
+    out.attrs = {**up.attrs, "version": hashlib.sha256(
+        f"{up.attrs.get('version')}:dedupe:{rule}".encode()).hexdigest()[:16]}
+    return out, int(extra.sum()), n_diff
+
+def merge_frames(base, up, rule, compact=COMPACT):
+    """정렬된 기존 데이터에 업로드 행을 끼워 넣는다. 새 날짜만 searchsorted 위치에 삽입하고
+    (연도·월·일은 업로드 파싱 때 만든 것을 그대로 사용), 겹치는 날짜는 rule 에 따라 처리.
+    업로드 안의 중복 날짜도 같은 rule 로 먼저 정리한다(dedupe_dates)."""
+    up, n_up_dup, n_up_diff = dedupe_dates(up, rule)
+    b_dates = base["날짜"].to_numpy()
+    u_dates = up["날짜"].to_numpy().astype(b_dates.dtype)
+    pos = np.searchsorted(b_dates, u_dates)
+    dup = np.zeros(len(up), dtype=bool)
+    inb = pos < len(b_dates)
+    dup[inb] = b_dates[pos[inb]] == u_dates[inb]
+    b_vals = np.column_stack([_f64(base[c]) for c in _TEMP_COLS])
+    u_vals = np.column_stack([_f64(up[c]) for c in _TEMP_COLS])
+    n_diff = int((b_vals[pos[dup]] != u_vals[dup]).any(axis=1).sum())
+
+    cols = {}
+    for c in base.columns:
+        b = base[c].to_numpy()
+        u = up[c].to_numpy().astype(b.dtype)
+        if rule == "upload" and dup.any():
+            b = b.copy()
+            b[pos[dup]] = u[dup]
+        cols[c] = np.insert(b, pos[~dup], u[~dup])
+    df = pd.DataFrame(cols)
+    b_drop, u_drop = base.attrs.get("dropped_days", {}), up.attrs.get("dropped_days", {})
+    df.attrs = {**base.attrs, "version": hashlib.sha256(
+        f"{base.attrs['version']}:{up.attrs['version']}:{rule}".encode()).hexdigest()[:16],
+        "dropped_days": {k: sorted(set(b_drop.get(k, [])) | set(u_drop.get(k, [])))
+                         for k in b_drop.keys() | u_drop.keys()}}
+    if compact:
+        df = compact_frame(df)
+    return df, {"added": int((~dup).sum()), "overlap": int(dup.sum()), "conflicts": n_diff,
+                "upload_dups": n_up_dup, "upload_dup_conflicts": n_up_diff}
+
+def _clean(df):
+    df["날짜"] = pd.to_datetime(df["날짜"], errors="coerce")
+    n_bad_date = int(df["날짜"].isna().sum())
+    df = df.dropna(subset=["날짜"])
+    for c in ["지점","평균기온","최저기온","최고기온"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    bad = df[["지점","평균기온","최저기온","최고기온"]].isna().any(axis=1)
+    # 날짜는 있지만 값이 비어 빠지는 날 — 결측일 보고서에서 "원본에는 있던 날"로 구분하려고 남겨 둔다
+    gone = df.loc[bad, ["지점","날짜"]].dropna(subset=["지점"])
+    dropped = {str(int(s)): sorted(_ordinals(g["날짜"]).tolist()) for s, g in gone.groupby("지점")}
+    df = df[~bad]
+    df["지점"] = df["지점"].astype(np.int64)
+    df["연도"], df["월"], df["일"] = _calendar(df["날짜"].to_numpy(), np.int32)
+    # (지점, 날짜) 순 — 지점별 행이 연속 구간이 되어 station_partition 으로 바로 잘린다
+    df = df.sort_values(["지점","날짜"], kind="stable").reset_index(drop=True)
+    df.attrs["dropped_days"] = dropped
+    df.attrs["dropped_bad_date"] = n_bad_date
+    return df
+
+def _ordinals(dates):
+    # 날짜 → 1970-01-01 기준 일 서수
+    return np.asarray(dates).astype("datetime64[D]").astype(np.int64)
+
+def _calendar(days, dtype):
+    # 일 서수(datetime64[D]로 해석 가능한 값) 하나에서 연·월·일을 바로 뽑는다 — .dt 접근자 불필요
+    days = np.asarray(days).astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]")
+    return ((years.astype(np.int64) + 1970).astype(dtype),
+            (months - years).astype(np.int64).astype(dtype) + 1,
+            (days - months).astype(np.int64).astype(dtype) + 1)
+
+# ═══════════════════════════════════════════════════════
+#  압축 스키마 (선택) — 프로세스당 메모리 절감
+# ═══════════════════════════════════════════════════════
+# TEMP_COMPACT=1 이면 기온 float32 · 연도 int16 · 월/일 int8 · 지점 category 로 보관 (COMPACT, 위쪽 정의)
+# 날짜(datetime64)와 연·월·일은 일 서수 하나에서 지연 계산하지 않고 그대로 둔다 — 컬럼 캐시 memmap,
+# 병합, 내보내기, 원본 탭 필터가 모두 평범한 DataFrame 컬럼으로 읽기 때문. 기본 데이터(42,021행) 기준
+# 2.08 → 1.00 MiB 이고, int32 서수 + 지연 달력으로 바꿔도 0.68 MiB 로 지점당 0.3 MiB 남짓 더 줄 뿐이다.
+
+def compact_frame(df):
+    out = {"날짜": df["날짜"], "지점": df["지점"].astype("category")}
+    for c in _TEMP_COLS:
+        v = _f64(df[c])              # 이미 float32 로 압축된 프레임도 0.1℃ 값으로 되돌려 검사 (병합 후 재압축)
+        f = v.astype(np.float32)
+        # 원본이 0.1℃ 단위이고 float32 → 0.1 반올림으로 정확히 되돌아올 때만 float32 사용
+        lossless = np.array_equal(np.round(v, 1), v) and np.array_equal(np.round(f.astype(np.float64), 1), v)
+        out[c] = f if lossless else v
+    y, m, d = _calendar(df["날짜"].to_numpy(), np.int16)
+    out["연도"], out["월"], out["일"] = y, m.astype(np.int8), d.astype(np.int8)
+    res = pd.DataFrame(out)
+    res.attrs = {**df.attrs, "compact": True}
+    return res
+
+def _f64(s):
+    # 계산·표시용 float64 — float32 로 압축된 컬럼은 0.1℃ 로 다시 반올림해 원래 값을 복원
+    v = s.to_numpy(np.float64)
+    return v if s.dtype == np.float64 else np.round(v, 1)
+
+# ═══════════════════════════════════════════════════════
+#  달력 배열 (하루 한 칸)
+# ═══════════════════════════════════════════════════════
+@dataclass(frozen=True)
+class DenseDays:
+    # 첫 날부터 마지막 날까지 하루 한 칸 — 칸 번호 = 일 서수 - first, 결측일은 NaN / present=False.
+    # 날짜 조회와 구간 자르기가 마스크 없이 오프셋 계산만으로 끝난다.
+    first:   int
+    present: np.ndarray
+    vals:    dict
+    dropped: np.ndarray   # _clean 에서 값 결측으로 제외된 날의 일 서수 (정렬)
+    csum:    dict         # 컬럼 → 앞에 0 을 붙인 누적합 (결측 0) — 여러 날 구간 합을 O(1) 로
+    count:   np.ndarray   # 앞에 0 을 붙인 관측일 누적 수
+
+    @property
+    def first_date(self):
+        return pd.Timestamp(np.datetime64(self.first, "D"))
+
+    @property
+    def last_date(self):
+        return pd.Timestamp(np.datetime64(self.first + len(self.present) - 1, "D"))
+
+    def slot(self, date):
+        return int(np.datetime64(pd.Timestamp(date).date(), "D").astype(np.int64)) - self.first
+
+    def calendar(self):
+        """칸마다 (연도, 월, 월일 슬롯 0~365)"""
+        yr, mo, dd = _calendar(np.arange(len(self.present)) + self.first, np.int64)
+        return yr, mo, _md_slot(mo, dd)
+
+    def get(self, date):
+        """해당 날짜 값 {컬럼: 값}, 없으면 None"""
+        i = self.slot(date)
+        if not (0 <= i < len(self.present)) or not self.present[i]:
+            return None
+        return {c: v[i] for c, v in self.vals.items()}
+
+    def take(self, ordinals):
+        """일 서수 배열 → (있음 여부, {컬럼: 값 배열}) — 범위 밖·결측은 NaN"""
+        i = np.asarray(ordinals) - self.first
+        ok = (i >= 0) & (i < len(self.present))
+        i = np.where(ok, i, 0)
+        ok &= self.present[i]
+        return ok, {c: np.where(ok, v[i], np.nan) for c, v in self.vals.items()}
+
+    def gaps(self):
+        """연속 결측 구간 — 시작·끝·일수와, 그중 원본에 있었지만 _clean 에서 제외된 날 수"""
+        edge = np.diff(np.r_[0, (~self.present).astype(np.int8), 0])
+        s0, s1 = np.flatnonzero(edge == 1), np.flatnonzero(edge == -1)
+        o0, o1 = s0 + self.first, s1 + self.first
+        return pd.DataFrame({
+            "시작": (o0).astype("datetime64[D]"),
+            "끝":   (o1 - 1).astype("datetime64[D]"),
+            "일수": s1 - s0,
+            "제외된 행": np.searchsorted(self.dropped, o1) - np.searchsorted(self.dropped, o0),
+        })
+
+@memo(8)
+def build_dense(version, _df):
+    days = _ordinals(_df["날짜"])
+    first = int(days[0])
+    present = np.zeros(int(days[-1]) - first + 1, dtype=bool)
+    present[days - first] = True
+    vals = {}
+    for c in _TEMP_COLS:
+        v = np.full(len(present), np.nan)
+        v[days - first] = _f64(_df[c])
+        vals[c] = v
+    # 지점 파티션이므로 attrs 의 제외일 목록은 이 지점 것뿐
+    dropped = np.unique(np.array([d for v in _df.attrs.get("dropped_days", {}).values() for d in v],
+                                 dtype=np.int64))
+    csum = {c: np.concatenate([[0.0], np.cumsum(np.nan_to_num(v))]) for c, v in vals.items()}
+    count = np.concatenate([[0], np.cumsum(present)])
+    for a in [present, dropped, count, *vals.values(), *csum.values()]:
+        a.flags.writeable = False
+    return DenseDays(first=first, present=present, vals=vals, dropped=dropped, csum=csum, count=count)
+
+# ═══════════════════════════════════════════════════════
+#  같은 월·일 인덱스 (날짜 비교 탭)
+# ═══════════════════════════════════════════════════════
+# 윤년 달력 기준 월·일 → 0~365 슬롯 (2/29 = 59), 마지막 366 은 12월 끝 경계
+_MD_OFFSET = np.array([0,31,60,91,121,152,182,213,244,274,305,335,366])
+
+def _md_slot(month, day):
+    return _MD_OFFSET[np.asarray(month) - 1] + np.asarray(day) - 1
+
+@dataclass(frozen=True)
+class DayIndex:
+    # (월일 슬롯, 연도) 순으로 정렬된 배열 — 같은 월·일은 연속 구간, 그 안에서 연도 오름차순
+    key:  np.ndarray   # 슬롯 * 10000 + 연도
+    year: np.ndarray
+    vals: dict         # 컬럼 → 값 배열
+    csum: dict         # 컬럼 → 앞에 0 을 붙인 누적합 (구간 평균을 O(1) 로)
+
+    def span(self, month, day, y_from=0, y_to=9999):
+        """같은 월·일 중 y_from <= 연도 < y_to 인 행의 [i0, i1) — 이진 탐색 두 번"""
+        base = int(_md_slot(month, day)) * 10000
+        return (int(np.searchsorted(self.key, base + y_from)),
+                int(np.searchsorted(self.key, base + y_to)))
+
+    def month_span(self, month):
+        """해당 월 전체(모든 연도)의 [i0, i1)"""
+        return (int(np.searchsorted(self.key, _MD_OFFSET[month - 1] * 10000)),
+                int(np.searchsorted(self.key, _MD_OFFSET[month] * 10000)))
+
+    def mean(self, col, i0, i1):
+        return (self.csum[col][i1] - self.csum[col][i0]) / (i1 - i0)
+
+@memo(8)
+def build_day_index(version, _df):
+    yr  = _df["연도"].to_numpy(np.int64)
+    key = _md_slot(_df["월"].to_numpy(), _df["일"].to_numpy()) * 10000 + yr
+    order = np.argsort(key, kind="stable")
+    key, yr = key[order], yr[order]
+    vals = {c: _f64(_df[c])[order] for c in _TEMP_COLS}
+    csum = {c: np.concatenate([[0.0], np.cumsum(v)]) for c, v in vals.items()}
+    for a in [key, yr, *vals.values(), *csum.values()]:
+        a.flags.writeable = False
+    return DayIndex(key=key, year=yr, vals=vals, csum=csum)
+
+@memo(32, shared=False)
+def event_anomalies(version, _df, events, n_years, normal_base=None):
+    """events: ((이름, "YYYY-MM-DD", 비고), ...) — 날짜별 관측값과 직전 n_years 년 같은 월·일 평년 대비 편차.
+    이벤트 수와 무관하게 인덱스에 대한 벡터화된 이진 탐색 한 번으로 끝난다.
+    normal_base 를 주면 직전 n_years 년 대신 그 기간의 일별 평년값(build_normals)을 평년으로 쓴다."""
+    ev = pd.DataFrame(list(events), columns=["이름","날짜","비고"])
+    dt = pd.to_datetime(ev["날짜"])
+    yr = dt.dt.year.to_numpy(np.int64)
+    base = _md_slot(dt.dt.month.to_numpy(), dt.dt.day.to_numpy()) * 10000
+
+    # 당일 관측값은 달력 배열에서 오프셋으로 바로
+    _, obs = build_dense(version, _df).take(_ordinals(dt))
+    out = ev.assign(연도=yr, **obs)
+    out["일교차"] = out["최고기온"] - out["최저기온"]
+
+    if normal_base is None:
+        didx = build_day_index(version, _df)
+        pos = np.searchsorted(didx.key, base + yr)             # 당일 위치 = 직전 연도들 구간의 끝
+        i0  = np.searchsorted(didx.key, base + yr - n_years)
+        n_ref = pos - i0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["평년"] = (didx.csum["평균기온"][pos] - didx.csum["평균기온"][i0]) / n_ref
+        out["평년"] = out["평년"].where(n_ref > 0)
+    else:
+        nm = build_normals(version, _df, normal_base)
+        slot = base // 10000
+        out["평년"], n_ref = nm.at("평균기온", slot), nm.n[slot]
+    out["평년대비"] = (out["평균기온"] - out["평년"]).round(1)
+    out["평년연수"] = n_ref
+    return out
+
+def suneung_table(version, _df, normal_base=None, n_years=30):
+    """수능일 기온과 평년 대비 편차 (학년도·시행연도·날짜·기온·평년대비·비고) — 관측이 없는 시험은 뺀다"""
+    sdf = (event_anomalies(version, _df, tuple((k, ds, note) for k, (ds, note) in SUNEUNG.items()),
+                           n_years, normal_base)
+           .rename(columns={"이름": "학년도", "연도": "시행연도"})
+           .dropna(subset=["평균기온"]))
+    sdf["시행연도"] = sdf["시행연도"].astype(int)
+    return sdf
+
+# ═══════════════════════════════════════════════════════
+#  여러 날 구간 비교 (날짜 비교 탭)
+# ═══════════════════════════════════════════════════════
+# 과거 각 해의 같은 월·일 구간을 일 서수로 한꺼번에 만들고, 평균은 달력 배열 누적합 차이로,
+# 극값은 구간 경계에서 reduceat 한 번으로 — 연도마다 df 를 다시 거르지 않는다.
+WINDOW_MAX_DAYS = 366
+WINDOW_MIN_COVER = 0.8     # 구간 일수 중 이 비율 이상 관측된 해만
+
+def _shift_years(date, years):
+    """date 의 월·일을 years 각 해로 옮긴 일 서수 — 없는 2/29 는 2/28 로"""
+    mo = (np.asarray(years) - 1970) * 12 + (date.month - 1)
+    m0 = mo.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    m1 = (mo + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    return m0 + np.minimum(date.day, m1 - m0) - 1
+
+@memo(64, shared=False)
+def window_compare(version, _df, start, end, min_cover=WINDOW_MIN_COVER):
+    """start~end(포함) 구간과 과거 모든 해의 같은 월·일 구간 — 연도별 관측일수·평균(세 기온)·최고·최저 극값.
+    해 바뀜을 넘는 구간은 끝 날짜의 연도로 표시한다. 관측이 min_cover 미만인 해는 뺀다 (선택 구간 자신은 남김)."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    dense = build_dense(version, _df)
+    n_days = (end - start).days + 1
+    if not 1 <= n_days <= WINDOW_MAX_DAYS:
+        raise ValueError(f"구간은 1~{WINDOW_MAX_DAYS}일이어야 합니다 ({n_days}일)")
+    back = np.arange(end.year - dense.first_date.year + 1)
+    o0 = _shift_years(start, start.year - back) - dense.first
+    o1 = _shift_years(end, end.year - back) - dense.first + 1           # [o0, o1)
+    n = len(dense.present)
+    i0, i1 = np.clip(o0, 0, n), np.clip(o1, 0, n)
+    cnt = dense.count[i1] - dense.count[i0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = {c: (dense.csum[c][i1] - dense.csum[c][i0]) / cnt for c in _TEMP_COLS}
+    # 구간 [i0, i1) 을 [i0₀, i1₀, i0₁, i1₁, …] 로 펼쳐 짝수 번째 reduceat 결과만 — 끝 경계용 NaN 한 칸을 붙인다
+    bounds = np.column_stack([i0, np.maximum(i1, i0 + 1)]).ravel()
+    ext = lambda f, col: f.reduceat(np.r_[dense.vals[col], np.nan], bounds)[::2]
+    out = pd.DataFrame({
+        "연도": end.year - back,
+        "시작": (o0 + dense.first).astype("datetime64[D]"),
+        "끝":   (o1 - 1 + dense.first).astype("datetime64[D]"),
+        "관측일수": cnt, **means,
+        "최고 극값": ext(np.fmax, "최고기온"),
+        "최저 극값": ext(np.fmin, "최저기온"),
+    })
+    keep = (cnt >= min_cover * n_days) | ((back == 0) & (cnt > 0))
+    return out[keep].sort_values("연도").reset_index(drop=True)
+
+def percentile_rank(ref, x):
+    """ref 중 x 보다 작은 값의 비율(같은 값은 절반) × 100 — ref 가 비면 NaN"""
+    ref = np.asarray(ref, dtype=np.float64)
+    ref = ref[~np.isnan(ref)]
+    if not len(ref):
+        return np.nan
+    return float(((ref < x).sum() + 0.5 * (ref == x).sum()) / len(ref) * 100)
+
+# ═══════════════════════════════════════════════════════
+#  시계열 다운샘플링
+# ═══════════════════════════════════════════════════════
+# 일 단위 전체 기간은 차트 폭(px) 수준의 구간으로 나눠 구간별 최소·최대만 보낸다
+TS_CHART_PX = 1600
+
+def minmax_positions(ys, n_buckets):
+    """같은 x 를 공유하는 여러 계열을 n_buckets 구간으로 나눠, 각 계열의 구간별 최소·최대 위치의
+    합집합을 돌려준다 (모든 trace 가 같은 x 를 쓰므로 fill 도 어긋나지 않음).
+    결측 구간의 첫 점도 남겨 차트의 끊김(데이터 공백)이 그대로 보이게 한다."""
+    n = len(ys[0])
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    bucket = np.arange(n) * n_buckets // n
+    keep = [np.array([0, n - 1])]
+    for y in ys:
+        valid = ~np.isnan(y)
+        pos = np.flatnonzero(valid)
+        if not pos.size:                # 전부 결측 — 남길 점이 없다 (공백 시작은 0 번, 이미 포함)
+            continue
+        order = pos[np.lexsort((y[pos], bucket[pos]))]     # 구간 → 값 순 정렬
+        b = bucket[order]
+        edge = b[1:] != b[:-1]
+        keep += [order[np.r_[True, edge]], order[np.r_[edge, True]],
+                 np.flatnonzero(~valid & np.r_[True, valid[:-1]])]
+    return np.unique(np.concatenate(keep))
+
+# ═══════════════════════════════════════════════════════
+#  연도×월 집계 큐브
+# ═══════════════════════════════════════════════════════
+@memo(8, shared=False)
+def build_rollup(version, _df):
+    """(연도, 월) 별 컬럼마다 count/sum/min/max/sq(제곱합). 탭들의 월·연 집계는 원본 일자료를
+    다시 groupby 하지 않고 이 큐브를 잘라(rollup_slice) 다시 묶는다(rollup_reduce)."""
+    keys = [_df["연도"].astype(np.int64), _df["월"].astype(np.int64)]
+    vals = pd.DataFrame({c: _f64(_df[c]) for c in _TEMP_COLS}, index=_df.index)
+    cube = vals.groupby(keys).agg(["count","sum","min","max"])
+    sq = vals.pow(2).groupby(keys).sum()
+    for c in _TEMP_COLS:
+        cube[(c, "sq")] = sq[c]
+    return cube.sort_index(axis=1)
+
+def rollup_slice(cube, yr_range, months=None):
+    yrs = cube.index.get_level_values("연도")
+    m = (yrs >= yr_range[0]) & (yrs <= yr_range[1])
+    if months:
+        m &= cube.index.get_level_values("월").isin(months)
+    return cube[m]
+
+def rollup_reduce(sub, by):
+    """by("연도" / "월" / ["연도","월"]) 기준 통계 — 컬럼마다 mean/min/max/std/n"""
+    g = sub.groupby(level=by)
+    s, mn, mx = g.sum(), g.min(), g.max()
+    out = {}
+    for c in _TEMP_COLS:
+        n = s[(c, "count")]
+        mean = s[(c, "sum")] / n
+        out[(c, "mean")] = mean
+        out[(c, "min")]  = mn[(c, "min")]
+        out[(c, "max")]  = mx[(c, "max")]
+        out[(c, "std")]  = np.sqrt(np.maximum(s[(c, "sq")] / n - mean**2, 0) * n / (n - 1))
+        out[(c, "n")]    = n
+    return pd.DataFrame(out)
+
+def rollup_mean(sub, by):
+    return rollup_reduce(sub, by).xs("mean", axis=1, level=1)
+
+# ═══════════════════════════════════════════════════════
+#  연도별 극값 지표
+# ═══════════════════════════════════════════════════════
+@dataclass(frozen=True)
+class ExtremeRules:
+    # 지표 기준값 (℃) — frozen 이라 해시 가능, 그대로 캐시 키가 된다
+    heat:     float = 33.0    # 폭염: 최고기온 ≥
+    cold:     float = -12.0   # 한파: 최저기온 ≤
+    tropical: float = 25.0    # 열대야: 최저기온 ≥
+    frost:    float = 0.0     # 서리일: 최저기온 <
+    ice:      float = 0.0     # 결빙일: 최고기온 <
+    gdd_base: float = 5.0     # 생장도일: 평균기온 - 기준 (양수만) 의 합
+
+def _longest_runs(mask, year_idx, n_years):
+    """연도별 최장 연속 True 길이 — 결측일(False)과 해가 바뀌는 날에서 끊는다. 반복문 없는 런 길이 부호화."""
+    prev = np.r_[False, mask[:-1]] & np.r_[False, year_idx[1:] == year_idx[:-1]]
+    start = mask & ~prev
+    run_id = np.cumsum(start) - 1
+    out = np.zeros(n_years, dtype=np.int64)
+    if start.any():
+        lengths = np.bincount(run_id[mask])
+        np.maximum.at(out, year_idx[start], lengths)
+    return out
+
+def extreme_indices(dense, rules, months=()):
+    """달력 배열 전체를 한 번 훑어 연도별 지표 표를 만든다. months 가 있으면 그 달만 센다
+    (빠진 달은 결측일처럼 연속 일수를 끊는다)."""
+    yr, mo, _ = dense.calendar()
+    ok = dense.present & (np.isin(mo, months) if months else True)
+    y0 = int(yr[0])
+    yi = yr - y0
+    n = int(yi[-1]) + 1
+    tmax, tmin, tavg = (np.where(ok, dense.vals[c], np.nan) for c in ["최고기온","최저기온","평균기온"])
+
+    with np.errstate(invalid="ignore"):
+        masks = {
+            "폭염일수": tmax >= rules.heat,
+            "한파일수": tmin <= rules.cold,
+            "열대야일수": tmin >= rules.tropical,
+            "서리일수": tmin < rules.frost,
+            "결빙일수": tmax < rules.ice,
+        }
+    count = lambda m: np.bincount(yi, weights=m, minlength=n).astype(np.int64)
+    out = {"유효일수": count(ok)}
+    out.update({k: count(m) for k, m in masks.items()})
+    out["생장도일"] = np.bincount(yi, weights=np.nan_to_num(np.maximum(tavg - rules.gdd_base, 0)),
+                              minlength=n).round(1)
+    for k in ["폭염일수", "한파일수", "열대야일수", "결빙일수"]:
+        out["최장 " + k.replace("일수", "") + " 연속"] = _longest_runs(masks[k], yi, n)
+    # 연 최고·최저 (TXx / TNn) — 값이 하나도 없는 해는 NaN
+    txx, tnn = np.full(n, -np.inf), np.full(n, np.inf)
+    np.fmax.at(txx, yi, tmax)
+    np.fmin.at(tnn, yi, tmin)
+    out["연 최고기온"] = np.where(np.isfinite(txx), txx, np.nan)
+    out["연 최저기온"] = np.where(np.isfinite(tnn), tnn, np.nan)
+    res = pd.DataFrame(out, index=pd.RangeIndex(y0, y0 + n, name="연도"))
+    return res[res["유효일수"] > 0]
+
+@memo(32, shared=False)
+def climate_extremes(version, _df, rules, months=()):
+    return extreme_indices(build_dense(version, _df), rules, months)
+
+# ═══════════════════════════════════════════════════════
+#  백분위 기준값 (ETCCDI 방식)
+# ═══════════════════════════════════════════════════════
+# 날짜(366 슬롯)마다 기준 기간 각 해의 같은 날 ± window//2 일 값을 모은 표본의 백분위수.
+# 슬롯별로 따로 정렬하지 않고 (366, 연수×창) 행렬을 한 번에 정렬해 행마다 보간한다.
+PCT_BASE = (1981, 2010)
+
+def _window_samples(dense, col, base, window):
+    """(366, 연수 × window) 표본 — 평년의 2/29 처럼 없는 날·결측일·자료 범위 밖은 NaN"""
+    yrs = np.arange(base[0], base[1] + 1)
+    jan1 = (yrs - 1970).astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+    leap = (yrs % 4 == 0) & ((yrs % 100 != 0) | (yrs % 400 == 0))
+    slot = np.arange(366)
+    # 윤년 달력 슬롯 → 그해 일 서수 (평년은 3/1 부터 하루씩 당겨짐)
+    day = jan1[:, None] + slot - ((~leap)[:, None] & (slot > 59))
+    half = window // 2
+    idx = (day - dense.first)[:, :, None] + np.arange(-half, half + 1)
+    ok = (leap[:, None] | (slot != 59))[:, :, None] & (idx >= 0) & (idx < len(dense.present))
+    v = np.where(ok, dense.vals[col][np.clip(idx, 0, len(dense.present) - 1)], np.nan)
+    return v.transpose(1, 0, 2).reshape(366, -1)
+
+def _row_percentile(a, pct):
+    """행마다 NaN 을 뺀 선형 보간 백분위수 (np.nanpercentile 과 같은 값) — 정렬 한 번 + 인덱싱"""
+    a = np.sort(a, axis=1)                    # NaN 은 행 끝으로
+    n = (~np.isnan(a)).sum(axis=1)
+    pos = np.maximum(n - 1, 0) * (pct / 100)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+    r = np.arange(len(a))
+    out = a[r, lo] + (a[r, hi] - a[r, lo]) * (pos - lo)
+    return np.where(n > 0, out, np.nan)
+
+@memo(32)
+def day_percentiles(version, _df, col, pct, base=PCT_BASE, window=5):
+    """366 슬롯별 col 의 pct 백분위수 (읽기 전용) — (기준 기간, 창, 백분위) 마다 한 번 계산"""
+    thr = _row_percentile(_window_samples(build_dense(version, _df), col, base, window), pct)
+    thr.flags.writeable = False
+    return thr
+
+@memo(32, shared=False)
+def pct_exceedance(version, _df, pct, base=PCT_BASE, window=5, months=()):
+    """연도별 TX{pct}p (최고기온 > 상위 백분위) · TN{100-pct}p (최저기온 < 하위 백분위) 일수"""
+    dense = build_dense(version, _df)
+    yr, mo, s = dense.calendar()
+    ok = dense.present & (np.isin(mo, months) if months else True)
+    hi = day_percentiles(version, _df, "최고기온", pct, base, window)[s]
+    lo = day_percentiles(version, _df, "최저기온", 100 - pct, base, window)[s]
+    with np.errstate(invalid="ignore"):
+        warm = ok & (dense.vals["최고기온"] > hi)
+        cold = ok & (dense.vals["최저기온"] < lo)
+    y0 = int(yr[0])
+    n = int(yr[-1]) - y0 + 1
+    count = lambda m: np.bincount(yr - y0, weights=m, minlength=n).astype(np.int64)
+    res = pd.DataFrame({"유효일수": count(ok), f"TX{pct}p": count(warm), f"TN{100 - pct}p": count(cold)},
+                       index=pd.RangeIndex(y0, y0 + n, name="연도"))
+    return res[res["유효일수"] > 0]
+
+# ═══════════════════════════════════════════════════════
+#  평년값 (일별 기후값)
+# ═══════════════════════════════════════════════════════
+# 기준 기간의 366 슬롯별 평균을 연주기 조화함수(상수 + n 차 cos/sin)로 최소제곱 평활한 값.
+# 데이터 버전·기준 기간마다 한 번 계산하고, 편차는 모두 이 배열을 슬롯으로 인덱싱해서 구한다.
+NORMAL_BASES = [(1961, 1990), (1971, 2000), (1981, 2010), (1991, 2020)]
+NORMAL_HARMONICS = 3
+
+@dataclass(frozen=True)
+class Normals:
+    base:   tuple
+    raw:    dict         # 컬럼 → 슬롯별 단순 평균 (366)
+    smooth: dict         # 컬럼 → 슬롯별 조화 평활값 (366)
+    n:      np.ndarray   # 슬롯별 표본 연수
+
+    def at(self, col, slots):
+        return self.smooth[col][slots]
+
+def _harmonic_fit(y, w, k):
+    """슬롯별 값 y 를 가중치 w(표본 수)로 상수 + k 차 조화함수에 맞춘 366 값 — 빈 슬롯도 채워진다"""
+    ang = 2 * np.pi * np.arange(366) / 366
+    X = np.column_stack([np.ones(366)] + [f(j * ang) for j in range(1, k + 1) for f in (np.cos, np.sin)])
+    ok = w > 0
+    sw = np.sqrt(w[ok])
+    coef = np.linalg.lstsq(X[ok] * sw[:, None], y[ok] * sw, rcond=None)[0]
+    return X @ coef
+
+@memo(16)
+def build_normals(version, _df, base=NORMAL_BASES[-1], harmonics=NORMAL_HARMONICS):
+    dense = build_dense(version, _df)
+    yr, _, slot = dense.calendar()
+    ok = dense.present & (yr >= base[0]) & (yr <= base[1])
+    n = np.bincount(slot[ok], minlength=366)
+    raw, smooth = {}, {}
+    for c in _TEMP_COLS:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            raw[c] = np.bincount(slot[ok], weights=dense.vals[c][ok], minlength=366) / n
+        smooth[c] = _harmonic_fit(raw[c], n, harmonics) if n.any() else np.full(366, np.nan)
+    for a in [n, *raw.values(), *smooth.values()]:
+        a.flags.writeable = False
+    return Normals(base=tuple(base), raw=raw, smooth=smooth, n=n)
+
+@memo(16)
+def daily_anomaly(version, _df, col, base=NORMAL_BASES[-1]):
+    """달력 배열과 같은 길이의 col 평년 편차 (결측일 NaN, 읽기 전용)"""
+    dense = build_dense(version, _df)
+    _, _, slot = dense.calendar()
+    out = dense.vals[col] - build_normals(version, _df, base).smooth[col][slot]
+    out.flags.writeable = False
+    return out
+
+@memo(32, shared=False)
+def yearly_anomaly(version, _df, col, base=NORMAL_BASES[-1], months=()):
+    """연도별 평균 편차 — 날마다 그날의 평년값을 빼고 평균하므로 월 필터가 있어도 계절 구성이 섞이지 않는다"""
+    dense = build_dense(version, _df)
+    yr, mo, _ = dense.calendar()
+    a = daily_anomaly(version, _df, col, base)
+    ok = dense.present & (np.isin(mo, months) if months else True)
+    y0 = int(yr[0])
+    cnt = np.bincount(yr[ok] - y0, minlength=int(yr[-1]) - y0 + 1)
+    tot = np.bincount(yr[ok] - y0, weights=a[ok], minlength=len(cnt))
+    keep = cnt > 0
+    return pd.Series(tot[keep] / cnt[keep], index=pd.Index(np.flatnonzero(keep) + y0, name="연도"), name="편차")
+
+# ═══════════════════════════════════════════════════════
+#  추세 (Sen 기울기 + Mann-Kendall)
+# ═══════════════════════════════════════════════════════
+# 짧은 계열(연 단위, 수백 점 이하)은 모든 쌍을 한 번에 — 여러 계열(12개월, 366일)을 행렬로 묶어 벡터화.
+# 긴 계열(일 단위 수만 점)은 쌍이 수억 개라, 기울기 t 보다 작은 쌍의 수를 역전 수 세기(O(n log n))로 구해
+# 중앙 순위를 찾을 때까지 t 를 좁힌다.
+TREND_ALLPAIRS_MAX = 2000
+_PAIR_CHUNK = 1 << 22      # 모든 쌍 계산 시 한 번에 만드는 (계열 × 쌍) 원소 수 상한
+
+def _mk_p(s, var):
+    """MK 통계량 S 와 분산 → 양측 p값 (연속성 보정)"""
+    s, var = np.asarray(s, np.float64), np.asarray(var, np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.nan_to_num(np.abs(s - np.sign(s)) / np.sqrt(var))
+    p = np.array([math.erfc(v / math.sqrt(2)) for v in z.ravel()]).reshape(z.shape)
+    return np.where(var > 0, p, np.nan)
+
+def _tie_term(Y):
+    """행마다 Σ t(t-1)(2t+5) — 같은 값 묶음(크기 t)에 대한 MK 분산 보정항, NaN 제외"""
+    a = np.sort(Y, axis=1)
+    valid = ~np.isnan(a)
+    start = (valid & ~np.c_[np.zeros((len(a), 1), bool), a[:, 1:] == a[:, :-1]]).ravel()
+    run = np.cumsum(start)[valid.ravel()] - 1
+    t = np.bincount(run, minlength=int(start.sum())).astype(np.float64)
+    row = np.flatnonzero(start) // a.shape[1]
+    return np.bincount(row, weights=t * (t - 1) * (2 * t + 5), minlength=len(a))
+
+def trend_batch(x, Y):
+    """x (n,) 오름차순, Y (계열, n) NaN=결측 → 계열마다 Sen 기울기·절편, MK S·p값, 표본 수 (모든 쌍)"""
+    x = np.asarray(x, np.float64)
+    Y = np.atleast_2d(np.asarray(Y, np.float64))
+    i, j = np.triu_indices(len(x), 1)
+    dx = x[j] - x[i]
+    step = max(1, _PAIR_CHUNK // max(len(i), 1))
+    n = (~np.isnan(Y)).sum(axis=1)
+    rows = np.flatnonzero(n >= 2)             # 점이 둘 이상인 계열만 — 나머지는 NaN (빈 슬라이스 경고 없이)
+    slope, s, icpt = np.full(len(Y), np.nan), np.zeros(len(Y)), np.full(len(Y), np.nan)
+    for r in range(0, len(rows), step):
+        k = rows[r:r + step, None]
+        D = Y[k, j] - Y[k, i]
+        slope[k[:, 0]] = np.nanmedian(D / dx, axis=1)
+        s[k[:, 0]] = np.nansum(np.sign(D), axis=1)
+    var = (n * (n - 1) * (2 * n + 5) - _tie_term(Y)) / 18
+    icpt[rows] = np.nanmedian(Y[rows] - slope[rows, None] * x, axis=1)
+    return {"slope": slope, "intercept": icpt, "s": s, "p": _mk_p(s, var), "n": n}
+
+def _ranks(v):
+    return np.unique(v, return_inverse=True)[1].astype(np.int64).ravel()
+
+def _inversions(r):
+    """i < j 이고 r[i] > r[j] 인 쌍의 수 — 상향식 병합 정렬. 단계마다 왼쪽 블록들은 (짝 번호, 값) 으로
+    전역 정렬돼 있으므로 오른쪽 원소들의 역전 수를 searchsorted 한 번으로 센다."""
+    n = len(r)
+    m = int(r.max()) + 1 if n else 1
+    v = np.asarray(r, np.int64)
+    idx = np.arange(n)
+    total, b = 0, 1
+    while b < n:
+        pair = idx // (2 * b)
+        left = (idx // b) % 2 == 0
+        key = pair * m + v
+        L, R, pr = key[left], key[~left], pair[~left]
+        le = np.searchsorted(L, R, side="right") - np.searchsorted(L, pr * m)
+        total += int((np.minimum(b, n - pr * 2 * b) - le).sum())
+        v = np.sort(key, kind="stable") - pair * m
+        b *= 2
+    return total
+
+def _slopes_below(x, y, t):
+    # (y_j - y_i) / (x_j - x_i) < t  ⇔  z = y - t·x 에서 z_i > z_j (x 증가)
+    return _inversions(_ranks(y - t * x))
+
+def _sen_long(x, y, tol=1e-9):
+    n = len(x)
+    k = (n * (n - 1) // 2 - 1) // 2              # 중앙 순위 (짝수 개면 아래쪽 중앙값)
+    # 무작위 2만 쌍 기울기의 45~55% 구간에서 시작, 중앙 순위를 감싸지 않으면 전체 범위로
+    i, j = np.random.default_rng(0).integers(0, n, (2, 20000))
+    i, j = np.minimum(i, j)[i != j], np.maximum(i, j)[i != j]
+    smp = np.sort((y[j] - y[i]) / (x[j] - x[i]))
+    lo, hi = smp[int(len(smp) * 0.45)], smp[int(len(smp) * 0.55)]
+    c_lo, c_hi = _slopes_below(x, y, lo), _slopes_below(x, y, hi)
+    if not c_lo <= k < c_hi:
+        lo = -(np.ptp(y) / np.diff(x).min() + 1)
+        hi, c_lo, c_hi = -lo, 0, n * (n - 1) // 2
+    # 순위 보간과 이분을 번갈아 — 보간으로 빠르게 좁히고, 이분으로 매 두 단계마다 절반 이하 보장
+    it = 0
+    while hi - lo > tol * max(1.0, abs(lo)):
+        f = min(max((k + 0.5 - c_lo) / (c_hi - c_lo), 0.02), 0.98) if it % 2 == 0 else 0.5
+        mid = lo + (hi - lo) * f
+        c = _slopes_below(x, y, mid)
+        if c <= k:
+            lo, c_lo = mid, c
+        else:
+            hi, c_hi = mid, c
+        it += 1
+    return (lo + hi) / 2
+
+def sen_mk(x, y):
+    """계열 하나의 Sen 기울기·절편, MK S·p값, 표본 수 — 길이에 따라 모든 쌍 / O(n log n) 경로"""
+    x, y = np.asarray(x, np.float64), np.asarray(y, np.float64)
+    ok = ~np.isnan(y)
+    x, y = x[ok], y[ok]
+    n = len(x)
+    if n <= TREND_ALLPAIRS_MAX:
+        return {k: v[0] for k, v in trend_batch(x, y[None]).items()}
+    slope = _sen_long(x, y)
+    r = _ranks(y)
+    disc = _inversions(r)                         # x 가 증가하므로 y 의 역전 = 불일치 쌍
+    t = np.bincount(r).astype(np.float64)
+    s = (n * (n - 1) / 2 - (t * (t - 1) / 2).sum() - disc) - disc
+    var = (n * (n - 1) * (2 * n + 5) - (t * (t - 1) * (2 * t + 5)).sum()) / 18
+    return {"slope": slope, "intercept": np.median(y - slope * x), "s": s, "p": float(_mk_p(s, var)), "n": n}
+
+@memo(16)
+def year_slot_matrix(version, _df, col):
+    """(연도 배열, (연수, 366) 행렬) — 행 = 연도, 열 = 월일 슬롯, 없는 날 NaN (읽기 전용)"""
+    dense = build_dense(version, _df)
+    yr, _, slot = dense.calendar()
+    y0 = int(yr[0])
+    M = np.full((int(yr[-1]) - y0 + 1, 366), np.nan)
+    M[yr - y0, slot] = dense.vals[col]
+    years = np.arange(y0, y0 + len(M))
+    M.flags.writeable = years.flags.writeable = False
+    return years, M
+
+@memo(16, shared=False)
+def trend_tables(version, _df, col, yr_range):
+    """yr_range 안의 월평균(12 계열)과 월일(366 계열) 연 계열 추세 — (월별 표, 월일별 표), 기울기는 ℃/10년"""
+    years, M = year_slot_matrix(version, _df, col)
+    sel = (years >= yr_range[0]) & (years <= yr_range[1])
+    years, M = years[sel], M[sel]
+    # 월평균: 슬롯을 달 경계로 묶어 평균 (그달 자료가 하나도 없으면 NaN)
+    cnt = np.add.reduceat(~np.isnan(M), _MD_OFFSET[:-1], axis=1)
+    tot = np.add.reduceat(np.nan_to_num(M), _MD_OFFSET[:-1], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        monthly = np.where(cnt > 0, tot / cnt, np.nan).T
+    tm, td = trend_batch(years, monthly), trend_batch(years, M.T)
+    slot = np.arange(366)
+    month = np.searchsorted(_MD_OFFSET, slot, side="right")
+    frame = lambda t, **idx: pd.DataFrame({**idx, "기울기": t["slope"] * 10, "p": t["p"], "n": t["n"]})
+    return (frame(tm, 월=np.arange(1, 13)),
+            frame(td, 월=month, 일=slot - _MD_OFFSET[month - 1] + 1))
+
+@memo(16, shared=False)
+def anomaly_trend(version, _df, col, base, yr_range):
+    """yr_range 의 일별 평년 편차 전체(수만 점)에 대한 Sen·MK — ℃/10년"""
+    dense = build_dense(version, _df)
+    yr, _, _ = dense.calendar()
+    sel = (yr >= yr_range[0]) & (yr <= yr_range[1])
+    t = sen_mk(np.flatnonzero(sel) / 365.25, daily_anomaly(version, _df, col, base)[sel])
+    return {"slope": t["slope"] * 10, "p": t["p"], "n": int(t["n"])}
+
+# ═══════════════════════════════════════════════════════
+#  비슷한 해 (아날로그 연도)
+# ═══════════════════════════════════════════════════════
+# 연도×366 평년 편차 행렬에서 대상 연도 행과 나머지 모든 행의 거리를 한 번에 — 연도 루프 없음.
+# 평년을 뺀 편차끼리 비교하므로 계절 주기가 아니라 "그해가 평년보다 어땠는지"의 모양이 닮은 해를 찾는다.
+ANALOG_MIN_COVER = 0.8     # 대상 연도 비교일 중 이 비율 이상이 겹치는 해만 후보
+
+@memo(16)
+def anomaly_matrix(version, _df, col, base=NORMAL_BASES[-1]):
+    """(연도 배열, (연수, 366) 평년 편차 행렬) — year_slot_matrix 에서 슬롯별 평년값을 뺀 것 (읽기 전용)"""
+    years, M = year_slot_matrix(version, _df, col)
+    A = M - build_normals(version, _df, base).smooth[col]
+    A.flags.writeable = False
+    return years, A
+
+@memo(32, shared=False)
+def analog_years(version, _df, year, cols=("평균기온",), base=NORMAL_BASES[-1], months=(), upto=365, k=5,
+                 min_cover=ANALOG_MIN_COVER):
+    """year 의 1/1 ~ 슬롯 upto(포함) 편차 궤적과 가장 가까운 k 개 연도 — 겹친 날 편차 차이의 RMSE 순.
+    cols 가 여럿이면 컬럼별 제곱합을 합쳐 하나의 RMSE 로, months 를 주면 그 달 슬롯만 비교한다.
+    표: 연도·RMSE·비교일수·편차 평균(첫 컬럼, 같은 날들) — attrs 에 대상 연도의 비교일수·편차 평균."""
+    years, _ = anomaly_matrix(version, _df, cols[0], base)
+    out = pd.DataFrame(columns=["연도", "RMSE", "비교일수", "편차 평균"])
+    if not years[0] <= year <= years[-1]:
+        return out
+    slot = np.arange(366)
+    sel = slot <= upto
+    if months:
+        sel &= np.isin(np.searchsorted(_MD_OFFSET, slot, side="right"), months)
+    sq, n, n_t = np.zeros(len(years)), np.zeros(len(years), np.int64), 0
+    for c in cols:
+        _, A = anomaly_matrix(version, _df, c, base)
+        t = A[year - years[0]]
+        m = sel & ~np.isnan(t)                 # 대상 연도에 값이 있는 비교일만
+        D = A[:, m] - t[m]
+        ok = ~np.isnan(D)
+        sq += np.where(ok, D * D, 0).sum(axis=1)
+        n += ok.sum(axis=1)
+        n_t += int(m.sum())
+        if c == cols[0]:
+            days = ok.sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(ok, A[:, m], 0).sum(axis=1) / days
+            out.attrs.update(days=int(m.sum()), mean=float(t[m].mean()) if m.any() else np.nan)
+    keep = (years != year) & (n > 0) & (n >= min_cover * n_t)
+    if not keep.any():
+        return out
+    res = pd.DataFrame({"연도": years, "RMSE": np.sqrt(sq / np.maximum(n, 1)), "비교일수": days,
+                        "편차 평균": mean})[keep]
+    res = res.sort_values(["RMSE", "연도"]).head(k).reset_index(drop=True)
+    res.attrs = out.attrs
+    return res
+
+# ═══════════════════════════════════════════════════════
+#  전역 필터 + KPI
+# ═══════════════════════════════════════════════════════
+@memo(64)
+def filter_summary(version, _df, yr_range, months):
+    """(데이터 버전, 연도 범위, 월) → 필터된 행과 KPI. 날짜순 정렬이므로 연도 범위는 이진 탐색으로
+    연속 구간이 되고, 월 조건만 그 구간 안에서 마스크로 거른다. 세션 간에 공유되며 LRU 로 개수 제한."""
+    d = _df["날짜"].to_numpy()
+    lo = np.searchsorted(d, np.datetime64(f"{yr_range[0]:04d}-01-01"))
+    hi = np.searchsorted(d, np.datetime64(f"{yr_range[1] + 1:04d}-01-01"))
+    fdf = _df.iloc[lo:hi]
+    if months:
+        fdf = fdf[fdf["월"].isin(months)]
+    if fdf.empty:
+        nan = float("nan")
+        return fdf, {"avg": nan, "hi": nan, "hi_date": None, "lo": nan, "lo_date": None,
+                     "rng": nan, "rng_date": None, "n": 0}
+    hi, lo, dates = _f64(fdf["최고기온"]), _f64(fdf["최저기온"]), fdf["날짜"].to_numpy()
+    rng = hi - lo
+    i_hi, i_lo, i_rng = hi.argmax(), lo.argmin(), rng.argmax()
+    kpi = {
+        "avg": _f64(fdf["평균기온"]).mean(),
+        "hi":  hi[i_hi],   "hi_date":  pd.Timestamp(dates[i_hi]),
+        "lo":  lo[i_lo],   "lo_date":  pd.Timestamp(dates[i_lo]),
+        "rng": rng[i_rng], "rng_date": pd.Timestamp(dates[i_rng]),
+        "n":   len(fdf),
+    }
+    return fdf, kpi
+
+# ═══════════════════════════════════════════════════════
+#  내보내기
+# ═══════════════════════════════════════════════════════
+# 다운로드 버튼에는 바이트 대신 함수를 넘겨 클릭할 때만 만든다. 프레임들을 EXPORT_CHUNK_ROWS 행씩
+# 임시 파일에 이어 쓰므로, 전체 CSV 문자열을 메모리에 통째로 만들지 않는다.
+EXPORT_CHUNK_ROWS = 100_000
+EXPORT_FORMATS = {              # 이름 → (확장자, MIME)
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+}
+if pa is not None:
+    EXPORT_FORMATS["Parquet"] = ("parquet", "application/vnd.apache.parquet")
+    EXPORT_FORMATS["Arrow"] = ("arrow", "application/vnd.apache.arrow.file")
+
+def _export_chunks(frames):
+    """프레임들 → EXPORT_CHUNK_ROWS 행 이하 조각. 압축 스키마 컬럼은 원래 dtype(float64 · 정수 지점)으로 되돌린다."""
+    for f in frames:
+        for i in range(0, len(f), EXPORT_CHUNK_ROWS):
+            c = f.iloc[i:i + EXPORT_CHUNK_ROWS]
+            yield c.assign(**{k: (_f64(c[k]) if c[k].dtype == np.float32 else
+                                  np.asarray(c[k], dtype=c[k].cat.categories.dtype))
+                              for k in c.columns
+                              if c[k].dtype == np.float32 or isinstance(c[k].dtype, pd.CategoricalDtype)})
+
+def write_export(frames, fmt, out):
+    """frames(프레임 반복자)를 fmt(EXPORT_FORMATS 이름) 형식으로 바이너리 파일 out 에 조각씩 쓴다"""
+    ext = EXPORT_FORMATS[fmt][0]
+    chunks = _export_chunks(frames)
+    if ext in ("csv", "csv.gz"):
+        dst = gzip.GzipFile(fileobj=out, mode="wb") if ext == "csv.gz" else out
+        dst.write(codecs.BOM_UTF8)
+        for i, c in enumerate(chunks):
+            dst.write(c.to_csv(index=False, header=(i == 0)).encode("utf-8"))
+        if dst is not out:
+            dst.close()
+        return
+    writer = None
+    for c in chunks:
+        t = pa.Table.from_pandas(c, preserve_index=False)
+        if writer is None:
+            writer = (pq.ParquetWriter(out, t.schema) if ext == "parquet"
+                      else pa.ipc.new_file(out, t.schema))
+        writer.write_table(t)
+    if writer is not None:
+        writer.close()
+
+def export_file(frames_fn, fmt):
+    """download_button 의 data 로 넘길 함수 — 클릭 시 frames_fn() 을 임시 파일에 써서 돌려준다"""
+    def make():
+        f = tempfile.TemporaryFile()
+        write_export(frames_fn(), fmt, f)
+        f.seek(0)
+        return f
+    return make
+
+# ═══════════════════════════════════════════════════════
+#  수집 폴더 → 데이터 버전 교체
+# ═══════════════════════════════════════════════════════
+# 원본 CSV 에 수집(드롭) 파일을 합친 결과를 불변 "데이터 버전"으로 게시한다. 버전마다 컬럼 캐시 파일 하나
+# (<원본>.store/<버전>.cache), current.json 이 현재 버전을 가리킨다. 새 버전은 캐시를 끝까지 쓴 뒤
+# 포인터를 os.replace 로 바꿔 게시하므로, 읽는 쪽은 잠금 없이 포인터만 보고 옛 버전 파일도
+# (이미 memmap 한 세션을 위해) INGEST_KEEP 개까지 남겨 둔다.
+INGEST_POLL_S = float(os.environ.get("TEMP_INGEST_POLL", 30))
+INGEST_KEEP = 3
+# 수집 파일 검증 — 기온 범위(℃)와 최저 ≤ 평균 ≤ 최고 허용 오차 (0.1℃ 반올림)
+VALID_TEMP = (-60.0, 60.0)
+_ORDER_TOL = 0.05
+SOURCE_VERSION = "source"       # 수집분 없이 원본 CSV 그대로 — 원본이 있으면 "source-<원본 해시 16자>"
+_log = logging.getLogger("tempcore.ingest")
+
+@contextlib.contextmanager
+def _file_lock(path):
+    # 같은 저장소를 여러 프로세스(대시보드 워커·배치)가 함께 쓸 때 게시를 한 번에 하나만
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _standard_frame(df):
+    # 압축 스키마 → 기본 스키마 (병합은 정수 지점·float64 기온으로 한 뒤 필요하면 다시 압축)
+    if not df.attrs.get("compact"):
+        return df
+    y, m, d = _calendar(df["날짜"].to_numpy(), np.int32)
+    out = pd.DataFrame({"날짜": df["날짜"].to_numpy(), "지점": np.asarray(df["지점"], dtype=np.int64),
+                        **{c: _f64(df[c]) for c in _TEMP_COLS}, "연도": y, "월": m, "일": d})
+    out.attrs = {k: v for k, v in df.attrs.items() if k != "compact"}
+    return out
+
+def validate_drop(df):
+    """수집 파일 검증 → 문제가 있으면 오류 메시지, 없으면 None. 한 행이라도 이상하면 파일 전체를 거부한다."""
+    if df is None or not len(df):
+        return "유효한 행이 없습니다"
+    t = {c: _f64(df[c]) for c in _TEMP_COLS}
+    problems = []
+    n = sum(int(((v < VALID_TEMP[0]) | (v > VALID_TEMP[1])).sum()) for v in t.values())
+    if n:
+        problems.append(f"기온 범위({VALID_TEMP[0]:g}~{VALID_TEMP[1]:g}℃) 밖 {n}개")
+    n = int(((t["최저기온"] > t["평균기온"] + _ORDER_TOL) | (t["평균기온"] > t["최고기온"] + _ORDER_TOL)).sum())
+    if n:
+        problems.append(f"최저 ≤ 평균 ≤ 최고 위반 {n}행")
+    n = int((df["날짜"].to_numpy() > np.datetime64("today") + np.timedelta64(1, "D")).sum())
+    if n:
+        problems.append(f"미래 날짜 {n}행")
+    n = int(df.duplicated(["지점", "날짜"]).sum())
+    if n:
+        problems.append(f"(지점, 날짜) 중복 {n}행")
+    return ", ".join(problems) or None
+
+def merge_stations(full, up, version, rule="upload"):
+    """여러 지점 프레임 full 에 up 을 지점별 merge_frames 로 합친다 (기본 스키마, (지점, 날짜) 순)"""
+    parts, dropped = [], {}
+    f_st, u_st = set(np.unique(full["지점"]).tolist()), set(np.unique(up["지점"]).tolist())
+    for s in sorted(f_st | u_st):
+        b = station_partition(full.attrs["version"], full, s) if s in f_st else None
+        u = station_partition(up.attrs["version"], up, s) if s in u_st else None
+        p = merge_frames(b, u, rule, False)[0] if b is not None and u is not None else (u if b is None else b)
+        parts.append(p)
+        dropped.update(p.attrs.get("dropped_days", {}))
+    out = pd.concat(parts, ignore_index=True)
+    out.attrs = {**full.attrs, "version": version, "dropped_days": dropped,
+                 "dropped_bad_date": full.attrs.get("dropped_bad_date", 0) + up.attrs.get("dropped_bad_date", 0)}
+    return out
+
+class DataStore:
+    """원본 CSV + 수집분의 데이터 버전 저장소. version() 으로 현재 버전 키를 얻고,
+    stations/load 에 그 키를 넘겨 읽는다 — 실행 도중 새 버전이 게시돼도 넘긴 버전을 끝까지 읽는다."""
+    def __init__(self, source, compact=COMPACT, root=None):
+        self.source = pathlib.Path(source)
+        self.root = pathlib.Path(root) if root else self.source.with_name(self.source.name + ".store")
+        self.compact = compact
+        self._ptr = (None, None)        # (포인터 mtime_ns, 내용) — 바뀌었을 때만 다시 읽는다
+        self._src = (None, None)        # ((원본 크기, mtime_ns), _source_key) — 바뀌었을 때만 해시
+        self._stale = None              # 원본이 바뀌어 무효로 본 버전 (경고는 한 번만)
+        self._lock = threading.Lock()
+
+    @property
+    def pointer(self):
+        return self.root / "current.json"
+
+    def version_path(self, version):
+        return self.root / f"{version}.cache"
+
+    def current(self):
+        """현재 버전 정보 {version, parent, created, files, rows} 또는 None"""
+        try:
+            mt = self.pointer.stat().st_mtime_ns
+        except OSError:
+            return None
+        if self._ptr[0] != mt:
+            try:
+                self._ptr = (mt, json.loads(self.pointer.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                pass
+        return self._ptr[1]
+
+    def source_key(self):
+        """원본 CSV 의 {size, mtime_ns, sha256} 또는 None — 크기·mtime 이 그대로면 해시를 다시 계산하지 않는다"""
+        try:
+            stt = self.source.stat()
+        except OSError:
+            return None
+        sig = (stt.st_size, stt.st_mtime_ns)
+        if self._src[0] != sig:
+            self._src = (sig, _source_key(self.source))
+        return self._src[1]
+
+    def _same_source(self, key):
+        # 버전을 만들 때의 원본과 지금 원본이 같은가 — 크기·mtime 이 같으면 바로, 다르면 내용 해시로
+        # (예전 포인터처럼 기록이 없으면 같다고 본다)
+        if not key:
+            return True
+        cur = self.source_key()
+        if cur is None:
+            return True             # 원본이 없으면 게시된 버전이 유일한 자료
+        if (cur["size"], cur["mtime_ns"]) == (key["size"], key["mtime_ns"]):
+            return True
+        return cur["sha256"] == key["sha256"]
+
+    def version(self):
+        """현재 데이터 버전 — 게시된 버전이 없거나, 그 뒤로 원본 CSV 가 바뀌었으면 원본 버전 (SOURCE_VERSION…).
+        원본이 바뀌면 예전 수집분은 버리고 새 원본을 쓴다 (다음 수집은 새 원본 위에 쌓인다)."""
+        cur = self.current()
+        if not cur or not self.version_path(cur["version"]).exists():
+            return self._source_version()
+        if not self._same_source(cur.get("source")):
+            if self._stale != cur["version"]:
+                self._stale = cur["version"]
+                _log.warning("원본 %s 이 바뀌어 데이터 버전 %s 을 쓰지 않음 — 원본으로 되돌림", self.source, cur["version"])
+            return self._source_version()
+        return cur["version"]
+
+    def _source_version(self):
+        # 원본 내용마다 다른 키 — 원본이 바뀌면 세션 캐시도, 그 위에 쌓는 새 버전 id 도 달라진다
+        key = self.source_key()
+        return f"{SOURCE_VERSION}-{key['sha256'][:16]}" if key else SOURCE_VERSION
+
+    def stations(self, version):
+        """(지점 목록, 오류)"""
+        if not version.startswith(SOURCE_VERSION):
+            header = _cache_header(self.version_path(version), None, None)
+            if header is not None:
+                return sorted(int(s) for s in header["partitions"]), None
+        return file_stations(self.source, self.compact)
+
+    def load(self, station, version):
+        """(지점 프레임, 오류) — 버전 파일이 정리돼 없으면 원본으로"""
+        if not version.startswith(SOURCE_VERSION):
+            with span("cache.read"):
+                df = _read_column_cache(self.version_path(version), None, station, None)
+            if df is not None:
+                return df, None
+        return load_station(self.source, station, self.compact)
+
+    def _full_frame(self, version):
+        # 현재 버전의 모든 지점 (기본 스키마) — 수집할 때만 쓰므로 전체를 메모리에 올린다
+        stations, err = self.stations(version)
+        if err:
+            raise ValueError(err)
+        parts, missing = [], []
+        for s in stations:
+            df, err = self.load(s, version)
+            if df is None:
+                missing.append(f"{s}" + (f" ({err})" if err else ""))
+            else:
+                parts.append(_standard_frame(df))
+        # 빠진 지점을 건너뛰면 새 버전에서 그 지점 자료가 조용히 사라진다 → 게시하지 않는다
+        if missing or not parts:
+            raise ValueError(f"데이터 버전 {version} 에서 지점을 읽지 못했습니다: {', '.join(missing) or '지점 없음'}")
+        full = pd.concat(parts, ignore_index=True)
+        full.attrs = {**parts[0].attrs, "version": version,
+                      "dropped_days": {k: v for p in parts for k, v in p.attrs["dropped_days"].items()}}
+        return full
+
+    def ingest(self, paths):
+        """수집 파일들을 검증해 현재 버전에 합치고 새 버전을 게시한다 → (새 버전 또는 None, [(파일, 오류 또는 None)])
+        겹치는 날짜는 수집 파일 값으로 바꾼다 (기상청 정정분이 뒤에 온다)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock, _file_lock(self.root / ".lock"):
+            parent = self.version()
+            full, results, names = None, [], []
+            for p in paths:
+                p = pathlib.Path(p)
+                try:
+                    data = p.read_bytes()
+                except OSError as e:
+                    results.append((p, f"파일을 읽지 못했습니다: {e}"))
+                    continue
+                digest = hashlib.sha256(data).hexdigest()
+                # 형식이 어긋난 파일(열 이름·값)에서 나는 예외는 그 파일만 거부한다
+                try:
+                    up, err = parse_csv(io.BytesIO(data), digest[:16], False)
+                    err = err or validate_drop(up)
+                except Exception as e:
+                    up, err = None, f"파일을 처리하지 못했습니다: {type(e).__name__}: {e}"
+                if not err:
+                    if full is None:
+                        full = self._full_frame(parent)
+                    try:
+                        with span("ingest.merge"):
+                            full = merge_stations(full, up, hashlib.sha256(
+                                f"{full.attrs['version']}:{digest}".encode()).hexdigest()[:16])
+                    except Exception as e:
+                        err = f"병합하지 못했습니다: {type(e).__name__}: {e}"
+                results.append((p, err))
+                if not err:
+                    names.append(p.name)
+            if full is None:
+                return None, results
+            ver = full.attrs["version"]
+            if self.compact:
+                full = compact_frame(full)
+            path = self.version_path(ver)
+            with span("cache.write"):
+                _write_column_cache(full, path, {"size": None, "mtime_ns": None, "sha256": ver})
+            if not path.exists():
+                raise OSError(f"데이터 버전 캐시를 쓰지 못했습니다: {path}")
+            info = {"version": ver, "parent": parent, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "files": names, "rows": len(full), "source": self.source_key()}
+            tmp = self.pointer.with_name("current.json.tmp")
+            tmp.write_text(json.dumps(info, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.pointer)          # ← 게시 — 다음 실행부터 새 버전
+            self._prune(ver)
+            _log.info("데이터 버전 %s 게시 (%s ← %s, %d행)", ver, ", ".join(names), parent, len(full))
+            return ver, results
+
+    def _prune(self, keep_version):
+        # 최근 INGEST_KEEP 개 버전만 남긴다 — 지운 파일을 memmap 중인 세션은 (POSIX 에서) 계속 읽을 수 있다
+        old = sorted(self.root.glob("*.cache"), key=lambda f: f.stat().st_mtime_ns, reverse=True)
+        for f in old[INGEST_KEEP:]:
+            if f.stem != keep_version:
+                f.unlink(missing_ok=True)
+
+class IngestWatcher(threading.Thread):
+    """수집 폴더를 INGEST_POLL_S 초마다 훑는 백그라운드 스레드. 크기·mtime 이 한 주기 동안 그대로인
+    *.csv 만 (쓰는 중인 파일 제외) processing/ 으로 옮겨 가져가고, 처리 후 done/ 또는 rejected/ 로 옮긴다.
+    워커 프로세스마다 감시자가 하나씩 돌므로, 가져가기부터 옮기기까지는 폴더 잠금(.ingest.lock)을 잡는다 —
+    잠금을 잡은 쪽이 보는 processing/ 의 파일은 멈춘 실행이 남긴 것뿐이다 (fcntl 이 없으면 감시자 하나만 가정)."""
+    def __init__(self, store, directory, interval=INGEST_POLL_S):
+        super().__init__(name="temp-ingest", daemon=True)
+        self.store, self.dir, self.interval = store, pathlib.Path(directory), interval
+        self._seen, self._stop = {}, threading.Event()
+        self.last = None            # 마지막 처리 요약 {time, version, accepted, rejected}
+        for sub in ("processing", "done", "rejected"):
+            (self.dir / sub).mkdir(parents=True, exist_ok=True)
+
+    @property
+    def lock_path(self):
+        return self.dir / ".ingest.lock"
+
+    def _move(self, f, dst):
+        # 옮기기 실패(다른 쪽이 먼저 옮김 등)는 기록만 — 이미 게시된 버전을 되돌리지 않는다
+        try:
+            os.replace(f, dst)
+            return True
+        except OSError as e:
+            _log.warning("수집 파일을 옮기지 못함 %s → %s: %s", f, dst, e)
+            return False
+
+    def _finish(self, f, stamp, err=None):
+        # 처리한 파일을 done/ 또는 (오류 메모와 함께) rejected/ 로
+        dst = self.dir / ("rejected" if err else "done") / f"{stamp}_{f.name}"
+        if self._move(f, dst) and err:
+            try:
+                dst.with_name(dst.name + ".err.txt").write_text(err + "\n", encoding="utf-8")
+            except OSError as e:
+                _log.warning("거부 사유를 쓰지 못함 %s: %s", dst, e)
+            _log.warning("수집 거부 %s: %s", f.name, err)
+
+    def recover(self):
+        """지난 실행이 처리 도중 멈춰 processing/ 에 남긴 파일을 대기열로 — 폴더 잠금 안에서만"""
+        with _file_lock(self.lock_path):
+            for f in (self.dir / "processing").glob("*.csv"):
+                if self._move(f, self.dir / f.name):
+                    _log.info("처리 중 멈춘 수집 파일을 대기열로 되돌림: %s", f.name)
+
+    def _ready(self):
+        ready, seen = [], {}
+        for f in sorted(self.dir.glob("*.csv")):
+            try:
+                stt = f.stat()
+            except OSError:
+                continue
+            seen[f] = (stt.st_size, stt.st_mtime_ns)
+            if self._seen.get(f) == seen[f]:
+                ready.append(f)
+        self._seen = seen
+        return ready
+
+    def poll_once(self):
+        """한 번 훑어 준비된 파일을 수집 → 새 버전 또는 None"""
+        ready = self._ready()
+        if not ready:
+            return None
+        with _file_lock(self.lock_path):
+            return self._process(ready)
+
+    def _process(self, ready):
+        claimed = []
+        for f in ready:
+            dst = self.dir / "processing" / f.name
+            try:
+                os.replace(f, dst)          # 다른 프로세스의 감시자와 겹쳐도 한쪽만 가져간다
+            except OSError:
+                continue
+            claimed.append(dst)
+        if not claimed:
+            return None
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        try:
+            ver, results = self.store.ingest(claimed)
+        except Exception as e:
+            # 대기열로 되돌리면 주기마다 같은 실패를 되풀이한다 → 묶음 전체를 오류와 함께 rejected/ 로
+            # (원인을 고친 뒤 파일을 수집 폴더로 다시 옮기면 된다)
+            _log.exception("수집 실패 — 파일을 rejected/ 로 옮김")
+            err = f"수집 실패: {type(e).__name__}: {e}"
+            for f in claimed:
+                self._finish(f, stamp, err)
+            self.last = {"time": time.time(), "version": None, "error": str(e)}
+            return None
+        for f, err in results:
+            self._finish(f, stamp, err)
+        self.last = {"time": time.time(), "version": ver,
+                     "accepted": [f.name for f, e in results if not e],
+                     "rejected": {f.name: e for f, e in results if e}}
+        return ver
+
+    def run(self):
+        try:
+            self.recover()
+        except Exception:
+            _log.exception("처리 중 멈춘 수집 파일 복구 오류")
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception:
+                _log.exception("수집 폴더 감시 오류")     # 감시 스레드는 죽지 않는다
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,58 @@
+"""탭을 바꿨다 돌아와도 탭 위젯 값이 남는지 — Streamlit AppTest 로 main.py 를 실제로 돌린다."""
+import datetime
+import pathlib
+import pytest
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+APP = pathlib.Path(__file__).resolve().parents[1] / "main.py"
+
+
+@pytest.fixture
+def at():
+    at = AppTest.from_file(str(APP), default_timeout=120)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def _switch(at, tab):
+    at.session_state["active_tab"] = tab
+    at.run()
+    assert not at.exception
+
+
+def test_compare_tab_values_survive_tab_switch(at):
+    at.date_input(key="compare_date").set_value(datetime.date(2000, 1, 1))
+    at.slider(key="compare_yrs").set_value(50)
+    at.run()
+    _switch(at, "📈 시계열")
+    _switch(at, "📅 날짜 비교")
+    assert at.date_input(key="compare_date").value == datetime.date(2000, 1, 1)
+    assert at.slider(key="compare_yrs").value == 50
+
+
+def test_other_tab_values_survive_tab_switch(at):
+    _switch(at, "📊 월별·연별")
+    at.radio(key="trend_col").set_value("최저기온")
+    at.slider(key="analog_k").set_value(8)
+    at.run()
+    _switch(at, "🔥 기후변화")
+    at.number_input(key="rule_heat").set_value(35.0)
+    at.radio(key="climate_mode").set_value("백분위 기준")
+    at.run()
+    _switch(at, "📅 날짜 비교")
+    _switch(at, "📊 월별·연별")
+    assert at.radio(key="trend_col").value == "최저기온"
+    assert at.slider(key="analog_k").value == 8
+    _switch(at, "🔥 기후변화")
+    assert at.number_input(key="rule_heat").value == 35.0
+    assert at.radio(key="climate_mode").value == "백분위 기준"
+
+
+def test_custom_window_near_first_observation(at):
+    at.date_input(key="compare_date").set_value(datetime.date(1907, 10, 3))
+    at.run()
+    at.radio(key="win_mode").set_value("직접 지정")
+    at.run()
+    assert not at.exception
+    assert at.date_input(key="win_range").value == (datetime.date(1907, 10, 1), datetime.date(1907, 10, 3))
@@ -0,0 +1,44 @@
+"""컬럼 캐시 — 원본의 mtime 만 바뀐 경우(복사·체크아웃) 해시는 한 번만 하고 헤더를 갱신하는지."""
+import os
+import pathlib
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import tempcore as tc
+
+CSV = "날짜,지점,평균기온(℃),최저기온(℃),최고기온(℃)\n" + "".join(
+    f"\t2030-01-{d:02d},{s},{d / 2},{d / 2 - 3},{d / 2 + 3}\n" for s in (108, 159) for d in range(1, 29))
+
+
+@pytest.fixture
+def src(tmp_path):
+    p = tmp_path / "t.csv"
+    p.write_bytes(CSV.encode("cp949"))
+    df, err = tc.parse_file(p, False)
+    assert err is None and tc.cache_path(p, False).exists()
+    return p
+
+
+@pytest.mark.parametrize("mtime_ns", [10**9, 4 * 10**18])      # 헤더가 짧아지는 / 길어지는 경우
+def test_touched_source_is_hashed_once(src, monkeypatch, mtime_ns):
+    ref, _ = tc.load_station(src, 159, False)
+    calls = []
+    real = tc._file_sha256
+    monkeypatch.setattr(tc, "_file_sha256", lambda p: calls.append(p) or real(p))
+    os.utime(src, ns=(mtime_ns, mtime_ns))
+    for _ in range(3):
+        df, err = tc.load_station(src, 159, False)
+        assert err is None
+        np.testing.assert_array_equal(df["평균기온"].to_numpy(), ref["평균기온"].to_numpy())
+    assert len(calls) == 1
+    assert tc._cache_header(tc.cache_path(src, False), src, False)["source"]["mtime_ns"] == mtime_ns
+    assert tc.file_stations(src, False) == ([108, 159], None)
+
+
+def test_changed_source_is_not_served_from_cache(src):
+    src.write_bytes(CSV.replace(",159,14.0,", ",159,99.0,").encode("cp949"))
+    os.utime(src, ns=(10**9, 10**9))
+    df, _ = tc.load_station(src, 159, False)
+    assert 99.0 in df["평균기온"].to_numpy()
@@ -0,0 +1,58 @@
+"""압축 스키마 — 압축한 프레임을 다시 압축해도(업로드 병합마다 재압축) float32 가 유지되는지."""
+import pathlib
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import tempcore as tc
+
+
+def _frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    d = pd.date_range("2000-01-01", periods=n)
+    avg = np.round(rng.normal(12, 10, n), 1)
+    df = pd.DataFrame({"날짜": d, "지점": 108, "평균기온": avg,
+                       "최저기온": np.round(avg - rng.uniform(0, 8, n), 1),
+                       "최고기온": np.round(avg + rng.uniform(0, 8, n), 1)})
+    df["연도"], df["월"], df["일"] = tc._calendar(df["날짜"].to_numpy(), np.int32)
+    return df
+
+
+def test_compact_keeps_float32_when_recompacted():
+    df = _frame()
+    once = tc.compact_frame(df)
+    twice = tc.compact_frame(once)
+    for c in tc._TEMP_COLS:
+        assert once[c].dtype == np.float32
+        assert twice[c].dtype == np.float32
+        np.testing.assert_array_equal(tc._f64(twice[c]), df[c].to_numpy())
+
+
+def test_merge_of_compact_frames_stays_compact():
+    base = tc.compact_frame(_frame(400).assign(지점=108))
+    base.attrs["version"] = "b"
+    up = tc.compact_frame(_frame(50, seed=1).assign(날짜=lambda d: d["날짜"] + pd.Timedelta(days=380)))
+    up.attrs["version"] = "u"
+    merged, _ = tc.merge_frames(base, up, "upload", True)
+    assert all(merged[c].dtype == np.float32 for c in tc._TEMP_COLS)
+
+
+def test_compact_falls_back_to_float64_off_grid():
+    df = _frame()
+    df.loc[3, "평균기온"] = 12.34
+    assert tc.compact_frame(df)["평균기온"].dtype == np.float64
+
+
+def test_merge_resolves_duplicate_dates_inside_upload_by_rule():
+    base = _frame(10)
+    base.attrs["version"] = "b"
+    up = _frame(3).assign(날짜=lambda d: d["날짜"] + pd.Timedelta(days=20))
+    # 같은 날짜가 파일 안에서 두 번 — 뒤의 행이 정정분, 하나는 값까지 같은 단순 반복
+    up = pd.concat([up, up.iloc[[0]].assign(평균기온=99.0), up.iloc[[1]]]).sort_values("날짜", kind="stable")
+    up.attrs["version"] = "u"
+    for rule, want in (("upload", 99.0), ("base", up["평균기온"].iloc[0])):
+        merged, stat = tc.merge_frames(base, up, rule, False)
+        assert merged["날짜"].is_unique and len(merged) == 13
+        assert (stat["added"], stat["upload_dups"], stat["upload_dup_conflicts"]) == (3, 2, 1)
+        assert merged.loc[merged["날짜"] == up["날짜"].iloc[0], "평균기온"].item() == want
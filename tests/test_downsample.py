@@ -0,0 +1,38 @@
+"""시계열 최소·최대 다운샘플링(minmax_positions) — 결측이 많은 계열."""
+import pathlib
+import sys
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import tempcore as tc
+
+
+def _brute(y, n_buckets, keep):
+    # 구간마다 최소·최대값이 남은 점들 안에 있어야 한다
+    bucket = np.arange(len(y)) * n_buckets // len(y)
+    for b in np.unique(bucket):
+        v = y[bucket == b]
+        if np.isnan(v).all():
+            continue
+        kept = y[keep[bucket[keep] == b]]
+        assert np.nanmin(v) in kept and np.nanmax(v) in kept
+
+
+def test_all_nan_series():
+    y = np.full(5000, np.nan)
+    other = np.sin(np.arange(5000) / 50)
+    keep = tc.minmax_positions([y, other], 100)
+    assert keep[0] == 0 and keep[-1] == 4999
+    _brute(other, 100, keep)
+    keep = tc.minmax_positions([y], 100)
+    np.testing.assert_array_equal(keep, [0, 4999])
+
+
+def test_leading_nan_block():
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=5000)
+    y[:1800] = np.nan
+    keep = tc.minmax_positions([y], 100)
+    _brute(y, 100, keep)
+    assert keep[0] == 0                        # 공백 시작 (차트에서 끊김으로 보인다)
+    assert np.isin(keep, np.arange(1, 1800)).sum() == 0
@@ -0,0 +1,52 @@
+"""O(n log n) Sen·MK 경로(_inversions, sen_mk 긴 계열)를 모든 쌍 계산과 맞춰 본다."""
+import pathlib
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import tempcore as tc
+
+N = tc.TREND_ALLPAIRS_MAX + 500      # 긴 계열 경로를 타는 길이
+
+
+def _series(seed, n=N, nan_rate=0.05):
+    """0.5℃ 단위로 반올림해 같은 값이 많고, 일부 NaN 이 섞인 추세 + 잡음 계열"""
+    rng = np.random.default_rng(seed)
+    x = np.arange(n) / 365.25
+    y = np.round((0.03 * x + rng.normal(0, 1.5, n)) * 2) / 2
+    y[rng.random(n) < nan_rate] = np.nan
+    return x, y
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_inversions_matches_brute_force(seed):
+    r = np.random.default_rng(seed).integers(0, 40, 3000)      # 같은 값 다수
+    i, j = np.triu_indices(len(r), 1)
+    assert tc._inversions(r) == int((r[i] > r[j]).sum())
+
+
+def test_inversions_edge_cases():
+    assert tc._inversions(np.array([], dtype=np.int64)) == 0
+    assert tc._inversions(np.array([3])) == 0
+    assert tc._inversions(np.arange(100)) == 0
+    assert tc._inversions(np.arange(100)[::-1]) == 100 * 99 // 2
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_sen_mk_long_matches_all_pairs(seed):
+    x, y = _series(seed)
+    got = tc.sen_mk(x, y)
+    ok = ~np.isnan(y)
+    assert got["n"] == ok.sum() > tc.TREND_ALLPAIRS_MAX
+
+    ref = tc.trend_batch(x[ok], y[ok][None])
+    assert got["s"] == ref["s"][0]
+    assert got["p"] == pytest.approx(ref["p"][0], rel=1e-9)
+
+    # 긴 경로는 짝수 개일 때 아래쪽 중앙값 — 모든 쌍 기울기의 두 중앙값 사이여야 한다
+    xo, yo = x[ok], y[ok]
+    i, j = np.triu_indices(len(xo), 1)
+    sl = np.sort((yo[j] - yo[i]) / (xo[j] - xo[i]))
+    lo, hi = sl[(len(sl) - 1) // 2], sl[len(sl) // 2]
+    assert lo - 1e-6 <= got["slope"] <= hi + 1e-6